@@ -10,6 +10,8 @@ from zeply_python_challenge.database import Base
 # add your model's MetaData object here
 # for 'autogenerate' support
 from zeply_python_challenge.wallets.models import *
+from zeply_python_challenge.wallets.partitions import DEFAULT_PARTITION
+from zeply_python_challenge.wallets.partitions import PARTITION_NAME
 
 # target_metadata = mymodel.Base.metadata
 
@@ -22,6 +24,17 @@ fileConfig(config.config_file_name)
 
 target_metadata = Base.metadata
 
+
+def include_name(name, type_, parent_names):
+    """Leave the partitions of wallets out of autogenerate."""
+    if type_ == "table":
+        return name not in (
+            "wallets_legacy",
+            DEFAULT_PARTITION,
+        ) and not PARTITION_NAME.fullmatch(name)
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -67,7 +80,9 @@ def run_migrations_online():
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
         )
 
         with context.begin_transaction():
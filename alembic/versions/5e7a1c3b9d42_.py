@@ -0,0 +1,24 @@
+"""add wallets keyset pagination index
+
+Revision ID: 5e7a1c3b9d42
+Revises: fb1c7cc20c97
+Create Date: 2026-10-18 10:12:31.418207
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5e7a1c3b9d42'
+down_revision = 'fb1c7cc20c97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_wallets_created_at_id', 'wallets', ['created_at', 'id']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_wallets_created_at_id', table_name='wallets')
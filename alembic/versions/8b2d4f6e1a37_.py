@@ -0,0 +1,49 @@
+"""add hash indexes on wallets seed and mnemonic
+
+Revision ID: 8b2d4f6e1a37
+Revises: 5e7a1c3b9d42
+Create Date: 2026-10-18 11:02:54.730614
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8b2d4f6e1a37'
+down_revision = '5e7a1c3b9d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction.
+    # Postgres hash indexes do not support UNIQUE, uniqueness of the
+    # hashed 128+ bit secrets is not enforced by the database.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_wallets_seed',
+            'wallets',
+            ['seed'],
+            postgresql_using='hash',
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_wallets_mnemonic',
+            'wallets',
+            ['mnemonic'],
+            postgresql_using='hash',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_wallets_mnemonic',
+            table_name='wallets',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_wallets_seed',
+            table_name='wallets',
+            postgresql_concurrently=True,
+        )
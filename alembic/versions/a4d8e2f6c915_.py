@@ -0,0 +1,154 @@
+"""partition wallets by month of created_at
+
+Revision ID: a4d8e2f6c915
+Revises: f3c9d2a7b4e1
+Create Date: 2026-10-18 23:05:12.519437
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8e2f6c915'
+down_revision = 'f3c9d2a7b4e1'
+branch_labels = None
+depends_on = None
+
+# monthly partitions created ahead, later ones are created by
+# zeply_python_challenge.wallets.partitions
+PARTITIONS_AHEAD = 3
+
+# (name in wallets, name in wallets_legacy)
+INDEXES = [
+    ('ix_wallets_created_at_id', 'wallets_legacy_created_at_id_idx'),
+    ('ix_wallets_seed', 'wallets_legacy_seed_idx'),
+    ('ix_wallets_mnemonic', 'wallets_legacy_mnemonic_idx'),
+]
+
+
+def _next_month(start):
+    return start.replace(
+        year=start.year + start.month // 12, month=start.month % 12 + 1
+    )
+
+
+def upgrade():
+    # The wallets stored so far are not copied, the table becomes the
+    # wallets_legacy partition of all the rows up to the end of the
+    # current month or of the latest wallet, monthly partitions follow.
+    # Its unique index and check constraint are built first without
+    # blocking writes, so attaching it needs neither an index build nor
+    # a table scan.
+    conn = op.get_bind()
+    bound = conn.execute(
+        sa.text(
+            "SELECT date_trunc('month', greatest(now(), max(created_at))) "
+            "+ interval '1 month' FROM wallets"
+        )
+    ).scalar()
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS '
+            'wallets_legacy_id_created_at_key ON wallets (id, created_at)'
+        )
+        # left behind by an interrupted upgrade
+        op.execute(
+            'ALTER TABLE wallets '
+            'DROP CONSTRAINT IF EXISTS wallets_legacy_bound'
+        )
+        op.execute(
+            'ALTER TABLE wallets ADD CONSTRAINT wallets_legacy_bound '
+            f"CHECK (created_at < '{bound}') NOT VALID"
+        )
+        op.execute(
+            'ALTER TABLE wallets VALIDATE CONSTRAINT wallets_legacy_bound'
+        )
+
+    # a foreign key to a partitioned table has to reference the whole
+    # primary key, i.e. (id, created_at) which addresses do not hold
+    op.drop_constraint(
+        'wallet_addresses_wallet_id_fkey',
+        'wallet_addresses',
+        type_='foreignkey',
+    )
+    op.rename_table('wallets', 'wallets_legacy')
+    op.execute(
+        'ALTER TABLE wallets_legacy '
+        'RENAME CONSTRAINT wallets_pkey TO wallets_legacy_pkey'
+    )
+    op.execute(
+        'ALTER TABLE wallets_legacy ADD CONSTRAINT '
+        'wallets_legacy_id_created_at_key '
+        'UNIQUE USING INDEX wallets_legacy_id_created_at_key'
+    )
+    for name, legacy_name in INDEXES:
+        op.execute(f'ALTER INDEX {name} RENAME TO {legacy_name}')
+
+    op.execute(
+        'CREATE TABLE wallets (LIKE wallets_legacy INCLUDING DEFAULTS) '
+        'PARTITION BY RANGE (created_at)'
+    )
+    op.execute('ALTER SEQUENCE wallets_id_seq OWNED BY wallets.id')
+    op.create_primary_key('wallets_pkey', 'wallets', ['id', 'created_at'])
+    op.create_index(
+        'ix_wallets_created_at_id', 'wallets', ['created_at', 'id']
+    )
+    op.create_index(
+        'ix_wallets_seed', 'wallets', ['seed'], postgresql_using='hash'
+    )
+    op.create_index(
+        'ix_wallets_mnemonic',
+        'wallets',
+        ['mnemonic'],
+        postgresql_using='hash',
+    )
+    # the existing indexes of wallets_legacy are attached to these
+    op.execute(
+        'ALTER TABLE wallets ATTACH PARTITION wallets_legacy '
+        f"FOR VALUES FROM (MINVALUE) TO ('{bound}')"
+    )
+    op.drop_constraint('wallets_legacy_bound', 'wallets_legacy')
+    # takes the wallets of months without a partition, so inserts never
+    # fail, wallets.partitions moves them out once their month is created
+    op.execute('CREATE TABLE wallets_default PARTITION OF wallets DEFAULT')
+
+    start = bound
+    for _ in range(PARTITIONS_AHEAD):
+        end = _next_month(start)
+        op.execute(
+            f'CREATE TABLE wallets_y{start.year}m{start.month:02d} '
+            f"PARTITION OF wallets FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+        start = end
+
+
+def downgrade():
+    # wallets of the other partitions are moved back to wallets_legacy
+    op.execute('ALTER TABLE wallets DETACH PARTITION wallets_legacy')
+    op.execute('INSERT INTO wallets_legacy SELECT * FROM wallets')
+    op.execute('ALTER SEQUENCE wallets_id_seq OWNED BY wallets_legacy.id')
+    op.drop_table('wallets')
+
+    op.rename_table('wallets_legacy', 'wallets')
+    for name, legacy_name in INDEXES:
+        op.execute(f'ALTER INDEX {legacy_name} RENAME TO {name}')
+    op.drop_constraint(
+        'wallets_legacy_id_created_at_key', 'wallets', type_='unique'
+    )
+    op.execute(
+        'ALTER TABLE wallets '
+        'RENAME CONSTRAINT wallets_legacy_pkey TO wallets_pkey'
+    )
+    op.execute(
+        'DELETE FROM wallet_addresses WHERE NOT EXISTS '
+        '(SELECT FROM wallets WHERE wallets.id = wallet_addresses.wallet_id)'
+    )
+    op.create_foreign_key(
+        'wallet_addresses_wallet_id_fkey',
+        'wallet_addresses',
+        'wallets',
+        ['wallet_id'],
+        ['id'],
+        ondelete='CASCADE',
+    )
@@ -0,0 +1,25 @@
+"""add wallets account xpublic keys
+
+Revision ID: c4e9a2f7b813
+Revises: 8b2d4f6e1a37
+Create Date: 2026-10-18 12:21:07.264913
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c4e9a2f7b813'
+down_revision = '8b2d4f6e1a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('wallets', sa.Column('account_xpublic_keys', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade():
+    op.drop_column('wallets', 'account_xpublic_keys')
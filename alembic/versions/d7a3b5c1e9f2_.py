@@ -0,0 +1,76 @@
+"""replace wallets seed and mnemonic hashes with blind indexes
+
+Revision ID: d7a3b5c1e9f2
+Revises: c4e9a2f7b813
+Create Date: 2026-10-18 14:05:12.518203
+
+"""
+import hashlib
+import hmac
+
+import sqlalchemy as sa
+
+from alembic import op
+from zeply_python_challenge.config import settings
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3b5c1e9f2'
+down_revision = 'c4e9a2f7b813'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+# legacy hashes are 32 hex digits of MD5, blind indexes 64 of SHA-256
+SELECT_LEGACY = sa.text(
+    'SELECT id, seed, mnemonic FROM wallets '
+    'WHERE id > :after AND length(seed) = 32 '
+    'ORDER BY id LIMIT :limit'
+)
+UPDATE_INDEXES = sa.text(
+    'UPDATE wallets SET seed = v.seed, mnemonic = v.mnemonic '
+    'FROM unnest(:ids, :seeds, :mnemonics) AS v(id, seed, mnemonic) '
+    'WHERE wallets.id = v.id'
+)
+
+
+def blind_index(legacy_hash):
+    return hmac.new(
+        settings.BLIND_INDEX_KEY.encode(),
+        legacy_hash.encode(),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def upgrade():
+    op.add_column(
+        'wallets', sa.Column('seed_verifier', sa.String(), nullable=True)
+    )
+    # every batch is updated by one statement committed on its own, so
+    # rows are not locked for the whole backfill, and an interrupted
+    # backfill resumes where it stopped as converted rows are skipped by
+    # their length
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        after = 0
+        while True:
+            rows = conn.execute(
+                SELECT_LEGACY, {'after': after, 'limit': BATCH_SIZE}
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                UPDATE_INDEXES,
+                {
+                    'ids': [row.id for row in rows],
+                    'seeds': [blind_index(row.seed) for row in rows],
+                    'mnemonics': [blind_index(row.mnemonic) for row in rows],
+                },
+            )
+            after = rows[-1][0]
+
+
+def downgrade():
+    # blind indexes can not be turned back into the legacy hashes, the
+    # wallets can only be restored once migrated up again
+    op.drop_column('wallets', 'seed_verifier')
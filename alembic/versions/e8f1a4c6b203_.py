@@ -0,0 +1,83 @@
+"""add wallet addresses table
+
+Revision ID: e8f1a4c6b203
+Revises: d7a3b5c1e9f2
+Create Date: 2026-10-18 16:40:27.903115
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e8f1a4c6b203'
+down_revision = 'd7a3b5c1e9f2'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+LAST_ID_OF_BATCH = sa.text(
+    'SELECT max(id) FROM ('
+    'SELECT id FROM wallets WHERE id > :after ORDER BY id LIMIT :limit'
+    ') AS batch'
+)
+# an address shared by several wallets points to the first one
+COPY_ADDRESSES = sa.text(
+    'INSERT INTO wallet_addresses (wallet_id, type, address) '
+    'SELECT wallets.id, a.key, a.value '
+    'FROM wallets, jsonb_each_text(wallets.addresses) AS a '
+    'WHERE wallets.id > :after AND wallets.id <= :until '
+    'AND a.value IS NOT NULL '
+    'ORDER BY wallets.id '
+    'ON CONFLICT (address) DO NOTHING'
+)
+
+
+def upgrade():
+    op.create_table(
+        'wallet_addresses',
+        sa.Column('wallet_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('address', sa.String(), nullable=False),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['wallet_id'], ['wallets.id'], ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_wallet_addresses_address',
+        'wallet_addresses',
+        ['address'],
+        unique=True,
+    )
+    op.create_index(
+        'ix_wallet_addresses_wallet_id', 'wallet_addresses', ['wallet_id']
+    )
+    # the table is created and committed first, so the app storing the
+    # addresses of new wallets can be deployed before the backfill ends.
+    # Every batch of wallets is copied by one statement committed on its
+    # own, wallets stored meanwhile are picked up by the last batches.
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        after = 0
+        while True:
+            until = conn.execute(
+                LAST_ID_OF_BATCH, {'after': after, 'limit': BATCH_SIZE}
+            ).scalar()
+            if until is None:
+                break
+            conn.execute(COPY_ADDRESSES, {'after': after, 'until': until})
+            after = until
+        conn.execute(sa.text('ANALYZE wallet_addresses'))
+
+
+def downgrade():
+    op.drop_index(
+        'ix_wallet_addresses_wallet_id', table_name='wallet_addresses'
+    )
+    op.drop_index(
+        'ix_wallet_addresses_address', table_name='wallet_addresses'
+    )
+    op.drop_table('wallet_addresses')
@@ -0,0 +1,71 @@
+"""add wallet jobs tables
+
+Revision ID: f3c9d2a7b4e1
+Revises: e8f1a4c6b203
+Create Date: 2026-10-18 21:12:45.361208
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f3c9d2a7b4e1'
+down_revision = 'e8f1a4c6b203'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'wallet_jobs',
+        sa.Column('currency', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('token_hash', sa.String(), nullable=False),
+        sa.Column('cancelled_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column(
+            'created_at',
+            sa.DateTime(),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'wallet_job_chunks',
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('start', sa.Integer(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('result', sa.LargeBinary(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['job_id'], ['wallet_jobs.id'], ondelete='CASCADE'
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_wallet_job_chunks_pending',
+        'wallet_job_chunks',
+        ['id'],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+    op.create_index(
+        'ix_wallet_job_chunks_job_id', 'wallet_job_chunks', ['job_id']
+    )
+
+
+def downgrade():
+    op.drop_index(
+        'ix_wallet_job_chunks_job_id', table_name='wallet_job_chunks'
+    )
+    op.drop_index(
+        'ix_wallet_job_chunks_pending', table_name='wallet_job_chunks'
+    )
+    op.drop_table('wallet_job_chunks')
+    op.drop_table('wallet_jobs')
@@ -0,0 +1,161 @@
+"""Helpers shared by benchmark scripts."""
+import asyncio
+import json
+import statistics
+import sys
+import threading
+import time
+from typing import Any
+from typing import Callable
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Return the pct-th percentile of the samples (nearest rank)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(
+    name: str, latencies: list[float], elapsed: float, *, errors: int = 0
+) -> dict:
+    """Return throughput and latency summary in milliseconds."""
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3)
+        if latencies
+        else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def drive(
+    client: Any,
+    name: str,
+    build_request: Callable[[int], tuple[str, str, dict[str, Any]]],
+    *,
+    requests: int,
+    concurrency: int,
+    expected_status: int = 200,
+) -> dict:
+    """Send requests through an httpx client from concurrent workers.
+
+    build_request gets the request number and returns the method, url
+    and keyword arguments of the request. Responses with a status other
+    than expected_status are counted as errors.
+    """
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in remaining:
+            method, url, kwargs = build_request(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != expected_status:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(name, latencies, elapsed, errors=errors)
+
+
+class QueryTimer:
+    """Count statements and time spent executing them on an engine.
+
+    Listeners run in whatever thread uses the engine, so the totals are
+    guarded by a lock and may be read from another thread.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.seconds = 0.0
+
+    def attach(self, engine: Any) -> None:
+        from sqlalchemy import event
+
+        sync_engine = getattr(engine, "sync_engine", engine)
+        event.listen(sync_engine, "before_cursor_execute", self._before)
+        event.listen(sync_engine, "after_cursor_execute", self._after)
+
+    def reset(self) -> tuple[int, float]:
+        """Return the totals collected so far and start over."""
+        with self._lock:
+            totals = self.queries, self.seconds
+            self.queries, self.seconds = 0, 0.0
+        return totals
+
+    def _before(self, conn: Any, *args: Any) -> None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def _after(self, conn: Any, *args: Any) -> None:
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        with self._lock:
+            self.queries += 1
+            self.seconds += elapsed
+
+
+def emit(
+    results: list[dict],
+    output: str | None = None,
+    meta: dict[str, Any] | None = None,
+) -> None:
+    """Dump results as JSON to the given file or stdout."""
+    payload = json.dumps(
+        {**({"meta": meta} if meta else {}), "results": results}, indent=2
+    )
+    if output:
+        with open(output, "w") as f:
+            f.write(payload)
+    else:
+        sys.stdout.write(payload + "\n")
+
+
+SEED_WALLETS_SQL = """
+WITH wallets AS (
+    INSERT INTO wallets (currency, addresses, seed, mnemonic, created_at)
+    SELECT
+        (ARRAY['BTC', 'ETH'])[1 + i % 2],
+        (
+            SELECT jsonb_object_agg(
+                type, encode(sha256((type || i || random())::bytea), 'hex')
+            )
+            FROM unnest(ARRAY[
+                'p2pkh', 'p2sh', 'p2wpkh', 'p2wpkh_in_p2sh', 'p2wsh',
+                'p2wsh_in_p2sh'
+            ]) AS type
+        ),
+        encode(sha256(('seed' || i || random())::bytea), 'hex'),
+        encode(sha256(('mnemonic' || i || random())::bytea), 'hex'),
+        now() - make_interval(secs => :rows - i)
+    FROM generate_series(1, :rows) AS i
+    RETURNING id, addresses
+)
+INSERT INTO wallet_addresses (wallet_id, type, address)
+SELECT wallets.id, a.key, a.value
+FROM wallets, jsonb_each_text(wallets.addresses) AS a
+"""
+
+
+async def seed_wallets(conn: Any, rows: int, batch: int = 100_000) -> None:
+    """Insert rows fake wallets in batches using an async connection."""
+    from sqlalchemy import text
+
+    for start in range(0, rows, batch):
+        await conn.execute(
+            text(SEED_WALLETS_SQL), {"rows": min(batch, rows - start)}
+        )
+        await conn.commit()
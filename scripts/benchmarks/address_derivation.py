@@ -0,0 +1,85 @@
+"""Compare deriving account addresses with HDWallet and in one batch.
+
+The HDWallet loop takes a from_index step and six address calls per
+index, the batch is derive_addresses. No database is needed:
+
+    $ python -m scripts.benchmarks.address_derivation --count 1000
+"""
+import argparse
+import time
+
+from hdwallet import HDWallet
+
+from scripts.benchmarks._common import emit
+from zeply_python_challenge.wallets.utils import derive_addresses
+from zeply_python_challenge.wallets.utils import derive_from_entropy
+from zeply_python_challenge.wallets.utils import warm_up
+
+
+def hdwallet_addresses(symbol: str, xpub: str, count: int) -> None:
+    wallet = HDWallet(symbol=symbol).from_xpublic_key(xpub)
+    wallet.from_index(0)
+    change_wallet = HDWallet(symbol=symbol).from_xpublic_key(
+        wallet.xpublic_key()
+    )
+    for index in range(count):
+        change_wallet.from_index(index)
+        change_wallet.public_key()
+        change_wallet.p2pkh_address()
+        change_wallet.p2sh_address()
+        change_wallet.p2wpkh_address()
+        change_wallet.p2wpkh_in_p2sh_address()
+        change_wallet.p2wsh_address()
+        change_wallet.p2wsh_in_p2sh_address()
+        change_wallet.clean_derivation()
+
+
+def batch_addresses(symbol: str, xpub: str, count: int) -> None:
+    derive_addresses(
+        symbol,
+        account_xpublic_key=xpub,
+        account=0,
+        change=0,
+        start=0,
+        count=count,
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    warm_up()
+    results = []
+    for symbol in args.symbols:
+        wallet_data = derive_from_entropy(
+            symbol, strength=128, language="english"
+        )
+        xpub = wallet_data["account_xpublic_keys"]["0"]
+        for name, derive, count in (
+            ("hdwallet", hdwallet_addresses, args.hdwallet_count),
+            ("batch", batch_addresses, args.count),
+        ):
+            started = time.perf_counter()
+            derive(symbol, xpub, count)
+            elapsed = time.perf_counter() - started
+            results.append(
+                {
+                    "name": f"{symbol}_{name}",
+                    "addresses": count,
+                    "elapsed_s": round(elapsed, 3),
+                    "addresses_per_s": round(count / elapsed, 1),
+                }
+            )
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--symbols", nargs="+", default=["BTC", "ETH"])
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument(
+        "--hdwallet-count",
+        type=int,
+        default=100,
+        help="the HDWallet loop is slow, time fewer addresses",
+    )
+    parser.add_argument("-o", "--output", default=None)
+    main(parser.parse_args())
@@ -0,0 +1,139 @@
+"""Compare finding wallets by address in wallet_addresses and in JSONB.
+
+Needs a migrated local postgres configured in the .env file, filled with
+e.g. scripts.benchmarks.seed. Lookups of existing and missing addresses
+are timed against the unique index of wallet_addresses and against a GIN
+index on wallets.addresses, created for the run and dropped afterwards.
+JSONB is queried by containment, which needs the address type, and by a
+JSON path matching any type, e.g.
+
+    $ python -m scripts.benchmarks.address_lookup --lookups 500
+"""
+import argparse
+import asyncio
+import json
+import secrets
+import time
+
+from sqlalchemy import cast
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import JSONPATH
+
+from scripts.benchmarks._common import emit
+from scripts.benchmarks._common import summarize
+from zeply_python_challenge.database import async_session_factory
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.database import get_async_engine
+from zeply_python_challenge.wallets.models import Wallet
+from zeply_python_challenge.wallets.models import WalletAddress
+from zeply_python_challenge.wallets.service import get_wallet_by_address
+
+GIN_INDEX = "ix_wallets_addresses_gin"
+
+
+async def time_lookups(name: str, lookup, probes: list) -> dict:
+    latencies: list[float] = []
+    async with async_session_factory()() as sess:
+        started = time.perf_counter()
+        for probe in probes:
+            lookup_started = time.perf_counter()
+            await lookup(sess, *probe)
+            latencies.append(time.perf_counter() - lookup_started)
+        elapsed = time.perf_counter() - started
+    return summarize(name, latencies, elapsed)
+
+
+async def table_lookup(sess, address_type: str, address: str) -> None:
+    await get_wallet_by_address(sess, address=address)
+
+
+async def containment_lookup(sess, address_type: str, address: str) -> None:
+    stmt = select(Wallet).where(
+        Wallet.addresses.contains({address_type: address})
+    )
+    (await sess.execute(stmt)).first()
+
+
+async def path_lookup(sess, address_type: str, address: str) -> None:
+    # any address type, the GIN index only narrows down the wallets
+    # having the value somewhere
+    path = f"$.* ? (@ == {json.dumps(address)})"
+    stmt = select(Wallet).where(
+        Wallet.addresses.op("@?")(cast(path, JSONPATH))
+    )
+    (await sess.execute(stmt)).first()
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = get_async_engine()
+    async with engine.connect() as conn:
+        rows = await conn.scalar(select(func.count(Wallet.id)))
+        stored = (
+            await conn.execute(
+                select(WalletAddress.type, WalletAddress.address)
+                .order_by(func.random())
+                .limit(args.lookups // 2)
+            )
+        ).all()
+    missing = [("p2pkh", secrets.token_hex(32))] * (args.lookups // 2)
+    probes = [*stored, *missing]
+
+    results = [await time_lookups("wallet_addresses", table_lookup, probes)]
+
+    async with engine.connect() as conn:
+        started = time.perf_counter()
+        await conn.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON wallets "
+                "USING gin (addresses jsonb_path_ops)"
+            )
+        )
+        await conn.commit()
+        gin_build_s = time.perf_counter() - started
+        sizes = (
+            await conn.execute(
+                text(
+                    "SELECT pg_relation_size(:gin), "
+                    "pg_total_relation_size('wallet_addresses')"
+                ),
+                {"gin": GIN_INDEX},
+            )
+        ).one()
+    try:
+        results.append(
+            await time_lookups(
+                "jsonb_gin_containment", containment_lookup, probes
+            )
+        )
+        results.append(
+            await time_lookups(
+                "jsonb_gin_path", path_lookup, probes[: args.path_lookups]
+            )
+        )
+    finally:
+        async with engine.connect() as conn:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {GIN_INDEX}"))
+            await conn.commit()
+    await dispose_engines()
+    meta = {
+        "rows": rows,
+        "gin_build_s": round(gin_build_s, 1),
+        "gin_index_mb": round(sizes[0] / 2**20, 1),
+        "wallet_addresses_mb": round(sizes[1] / 2**20, 1),
+    }
+    emit(results, args.output, meta=meta)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument(
+        "--path-lookups",
+        type=int,
+        default=20,
+        help="JSON path lookups can not use the index, run only a few",
+    )
+    parser.add_argument("-o", "--output", default=None)
+    asyncio.run(main(parser.parse_args()))
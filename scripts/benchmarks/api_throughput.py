@@ -0,0 +1,69 @@
+"""Measure requests/sec and latency percentiles of a running API.
+
+Start the app against a local postgres first, e.g.
+
+    $ uvicorn zeply_python_challenge.main:app --workers 1
+    $ python -m scripts.benchmarks.api_throughput --requests 2000 -c 50
+
+Run it once on the commit before and once after a change and compare
+the emitted JSON.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from scripts.benchmarks._common import drive
+from scripts.benchmarks._common import emit
+
+ROUTES = {
+    "list": ("GET", "/api/v1/wallets?limit=10", None),
+    "create": ("POST", "/api/v1/wallets", {"currency": "BTC"}),
+}
+
+
+async def run_route(
+    client: httpx.AsyncClient,
+    name: str,
+    *,
+    requests: int,
+    concurrency: int,
+) -> dict:
+    method, url, body = ROUTES[name]
+    return await drive(
+        client,
+        name,
+        lambda _: (method, url, {"json": body}),
+        requests=requests,
+        concurrency=concurrency,
+        expected_status=201 if method == "POST" else 200,
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=60
+    ) as client:
+        results = [
+            await run_route(
+                client,
+                name,
+                requests=args.requests,
+                concurrency=args.concurrency,
+            )
+            for name in args.routes
+        ]
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("-c", "--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--routes", nargs="+", choices=list(ROUTES), default=list(ROUTES)
+    )
+    parser.add_argument("-o", "--output", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""Compare restoring wallets looked up by MD5 hash and by blind index.
+
+The legacy scheme hashes the seed with salted MD5 and checks the hash
+exists, the current one looks the wallet up by its HMAC blind index and
+checks the seed against the argon2 verifier of that single wallet. Both
+derive the wallet afterwards, the restore cache is disabled. Needs a
+migrated local postgres configured in the .env file, e.g.
+
+    $ python -m scripts.benchmarks.blind_index --wallets 50 --rounds 200
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable
+from typing import Callable
+
+from scripts.benchmarks._common import emit
+from scripts.benchmarks._common import summarize
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import async_session_factory
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.utils import make_blind_index
+from zeply_python_challenge.utils import make_hash
+from zeply_python_challenge.utils import make_verifier
+from zeply_python_challenge.utils import verify
+from zeply_python_challenge.wallets.executor import get_derivation_executor
+from zeply_python_challenge.wallets.service import find_by_seed
+from zeply_python_challenge.wallets.service import generate_wallet
+from zeply_python_challenge.wallets.service import restore_from_seed
+from zeply_python_challenge.wallets.utils import derive_from_seed
+
+
+async def measure(
+    name: str, restore: Callable[[str], Awaitable[None]], seeds: list[str]
+) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for seed in seeds:
+        restore_started = time.perf_counter()
+        await restore(seed)
+        latencies.append(time.perf_counter() - restore_started)
+    return summarize(name, latencies, time.perf_counter() - started)
+
+
+def measure_hash(name: str, fn: Callable[[], object], rounds: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        hash_started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - hash_started)
+    return summarize(name, latencies, time.perf_counter() - started)
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings.RESTORE_CACHE_ENABLED = False
+    async with async_session_factory()() as sess:
+        seeds = [
+            (await generate_wallet(sess, symbol="BTC"))["seed"]
+            for _ in range(args.wallets)
+        ]
+    rounds = [seeds[i % len(seeds)] for i in range(args.rounds)]
+
+    async def md5_lookup(seed: str) -> None:
+        async with async_session_factory()() as sess:
+            # stored hashes are blind indexes now, the probe of the hash
+            # index costs the same whether it hits or not
+            await find_by_seed(sess, seed=make_hash(value=seed))
+        await get_derivation_executor().run(
+            derive_from_seed, "BTC", seed=seed
+        )
+
+    async def blind_index(seed: str) -> None:
+        async with async_session_factory()() as sess:
+            await restore_from_seed(sess, symbol="BTC", seed=seed)
+
+    verifier = make_verifier(value=seeds[0])
+    results = [
+        measure_hash("md5", lambda: make_hash(value=seeds[0]), args.rounds),
+        measure_hash(
+            "hmac", lambda: make_blind_index(value=seeds[0]), args.rounds
+        ),
+        measure_hash(
+            "argon2_verify",
+            lambda: verify(value=seeds[0], verifier=verifier),
+            min(args.rounds, 50),
+        ),
+        await measure("restore_md5_lookup", md5_lookup, rounds),
+        await measure("restore_blind_index", blind_index, rounds),
+    ]
+    await dispose_engines()
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--wallets", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("-o", "--output", default=None)
+    asyncio.run(main(parser.parse_args()))
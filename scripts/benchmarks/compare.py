@@ -0,0 +1,64 @@
+"""Compare two benchmark results and report regressions.
+
+Results are matched by name and concurrency, e.g.
+
+    $ python -m scripts.benchmarks.compare before.json after.json
+
+Exits with status 1 when the p95 latency of any result grew, or its
+throughput dropped, by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict[tuple[str, int | None], dict]:
+    with open(path) as f:
+        results = json.load(f)["results"]
+    return {(r["name"], r.get("concurrency")): r for r in results}
+
+
+def change(before: float, after: float) -> float:
+    """Return the relative change in percent."""
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare(
+    before: dict[tuple[str, int | None], dict],
+    after: dict[tuple[str, int | None], dict],
+    *,
+    threshold: float,
+) -> tuple[list[str], bool]:
+    """Return report lines and whether anything regressed."""
+    lines, regressed = [], False
+    for key in sorted(before.keys() & after.keys(), key=str):
+        old, new = before[key], after[key]
+        p95 = change(old["p95_ms"], new["p95_ms"])
+        rps = change(old["rps"], new["rps"])
+        flag = ""
+        if p95 > threshold or rps < -threshold:
+            flag, regressed = "  REGRESSION", True
+        name = key[0] if key[1] is None else f"{key[0]} c={key[1]}"
+        lines.append(
+            f"{name:<28} rps {old['rps']:>9} -> {new['rps']:>9} "
+            f"({rps:+.1f}%)  p95 {old['p95_ms']:>9} -> {new['p95_ms']:>9} "
+            f"({p95:+.1f}%){flag}"
+        )
+    for key in sorted(before.keys() ^ after.keys(), key=str):
+        lines.append(f"{key[0]} c={key[1]} is only in one of the runs")
+    return lines, regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+    report, regressed = compare(
+        load(args.before), load(args.after), threshold=args.threshold
+    )
+    print("\n".join(report))
+    sys.exit(1 if regressed else 0)
@@ -0,0 +1,102 @@
+"""Time restore requests flooding in with malformed mnemonics.
+
+Every kind of garbage is sent through restore_from_mnemonic, which now
+rejects it before the lookup, and through the unchecked path it used to
+take: the blind index of the raw input and a query. hdwallet's own check
+is timed on the same input. Needs a migrated local postgres configured
+in the .env file, e.g.
+
+    $ python -m scripts.benchmarks.mnemonic_flood --requests 2000
+"""
+import argparse
+import asyncio
+import secrets
+import time
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+
+from hdwallet.utils import is_mnemonic
+
+from scripts.benchmarks._common import emit
+from scripts.benchmarks._common import summarize
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import async_session_factory
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.utils import make_blind_index
+from zeply_python_challenge.wallets.exceptions import InvalidMnemonic
+from zeply_python_challenge.wallets.exceptions import WalletEntryDoesNotExist
+from zeply_python_challenge.wallets.mnemonics import wordlist_index
+from zeply_python_challenge.wallets.service import find_by_mnemonic
+from zeply_python_challenge.wallets.service import restore_from_mnemonic
+from zeply_python_challenge.wallets.utils import warm_up
+
+
+def garbage(kind: str) -> str:
+    words = list(wordlist_index(settings.WALLET_MNEMONIC_PHRASE_LANGUAGE))
+    if kind == "random_text":
+        return " ".join(secrets.token_urlsafe(6) for _ in range(12))
+    if kind == "bad_checksum":
+        # wordlist words, 1 in 16 pass the checksum and are looked up
+        return " ".join(secrets.choice(words) for _ in range(12))
+    return " ".join(secrets.choice(words) for _ in range(1000))
+
+
+async def time_calls(
+    name: str, call: Callable[[Any, str], Awaitable[Any]], inputs: list[str]
+) -> dict:
+    latencies = []
+    async with async_session_factory()() as sess:
+        started = time.perf_counter()
+        for mnemonic in inputs:
+            call_started = time.perf_counter()
+            await call(sess, mnemonic)
+            latencies.append(time.perf_counter() - call_started)
+        elapsed = time.perf_counter() - started
+    return summarize(name, latencies, elapsed)
+
+
+async def checked(sess: Any, mnemonic: str) -> None:
+    try:
+        await restore_from_mnemonic(sess, symbol="BTC", mnemonic=mnemonic)
+    except (InvalidMnemonic, WalletEntryDoesNotExist):
+        pass
+
+
+async def unchecked(sess: Any, mnemonic: str) -> None:
+    await find_by_mnemonic(sess, mnemonic=make_blind_index(value=mnemonic))
+
+
+async def hdwallet_check(sess: Any, mnemonic: str) -> None:
+    is_mnemonic(mnemonic)
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings.RESTORE_CACHE_ENABLED = False
+    warm_up()
+    results = []
+    for kind in ("random_text", "bad_checksum", "oversized"):
+        inputs = [garbage(kind) for _ in range(args.requests)]
+        for name, call, count in (
+            ("unchecked", unchecked, args.requests),
+            ("checked", checked, args.requests),
+            ("hdwallet", hdwallet_check, args.hdwallet_requests),
+        ):
+            results.append(
+                await time_calls(f"{kind}_{name}", call, inputs[:count])
+            )
+    await dispose_engines()
+    emit(results, args.output, meta={"requests": args.requests})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--hdwallet-requests",
+        type=int,
+        default=100,
+        help="hdwallet reads the wordlists per call, time fewer inputs",
+    )
+    parser.add_argument("-o", "--output", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""Compare deep paging through wallets with OFFSET and with a cursor.
+
+Needs a migrated local postgres configured in the .env file. The wallets
+table is filled up to --rows fake wallets first, e.g.
+
+    $ python -m scripts.benchmarks.pagination --rows 1000000
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import func
+from sqlalchemy import select
+
+from scripts.benchmarks._common import emit
+from scripts.benchmarks._common import seed_wallets
+from scripts.benchmarks._common import summarize
+from zeply_python_challenge.database import async_session_factory
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.database import get_async_engine
+from zeply_python_challenge.wallets.models import Wallet
+from zeply_python_challenge.wallets.service import get_all_wallets
+
+
+async def walk(*, pages: int, limit: int, keyset: bool, skip: int) -> dict:
+    """Fetch pages one after another and time each of them."""
+    latencies: list[float] = []
+    async with async_session_factory()() as sess:
+        offset, after = skip, None
+        if keyset and skip:
+            # position the cursor where the offset walk starts
+            wallets = await get_all_wallets(sess, limit=1, offset=skip - 1)
+            after = (wallets[0].created_at, wallets[0].id)
+        started = time.perf_counter()
+        for _ in range(pages):
+            page_started = time.perf_counter()
+            if keyset:
+                wallets = await get_all_wallets(sess, limit=limit, after=after)
+                after = (wallets[-1].created_at, wallets[-1].id)
+            else:
+                wallets = await get_all_wallets(
+                    sess, limit=limit, offset=offset
+                )
+                offset += limit
+            latencies.append(time.perf_counter() - page_started)
+            sess.expunge_all()
+        elapsed = time.perf_counter() - started
+    name = f"{'keyset' if keyset else 'offset'}@{skip}"
+    return summarize(name, latencies, elapsed)
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with get_async_engine().connect() as conn:
+        existing = await conn.scalar(select(func.count(Wallet.id)))
+        if existing < args.rows:
+            await seed_wallets(conn, args.rows - existing)
+
+    results = []
+    for depth in (0, args.rows // 2, args.rows - args.pages * args.limit):
+        for keyset in (False, True):
+            results.append(
+                await walk(
+                    pages=args.pages,
+                    limit=args.limit,
+                    keyset=keyset,
+                    skip=max(0, depth),
+                )
+            )
+    await dispose_engines()
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("-o", "--output", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,305 @@
+"""Compare wallet queries on a plain and on a monthly partitioned table.
+
+Both tables are filled with the same --rows fake wallets spread evenly
+over the last --months months, the partitioned one has a partition per
+month like wallets, see wallets.partitions. The wallets table itself is
+not touched. Timed are the first page of a month window, a keyset page
+from the middle of the history, the unwindowed first page, the export of
+a whole month, lookups by id and by seed, which can not be pruned, and
+the retention of the oldest month, rolled back afterwards. Tables are
+kept for further runs unless --drop is given. Needs a migrated local
+postgres configured in the .env file, e.g.
+
+    $ python -m scripts.benchmarks.partitioning --rows 50000000 \\
+        --months 24 -o partitioning.json
+
+Rows are about as wide as real wallets, 500 bytes, both tables of 50M
+rows take 60 GB of disk and about 15 minutes to fill and index.
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import time
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from scripts.benchmarks._common import emit
+from scripts.benchmarks._common import summarize
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.database import get_async_engine
+from zeply_python_challenge.wallets.partitions import add_months
+from zeply_python_challenge.wallets.partitions import month_start
+from zeply_python_challenge.wallets.partitions import partition_name
+
+PLAIN = "bench_wallets_plain"
+PARTITIONED = "bench_wallets_partitioned"
+PAGE = 20
+
+COLUMNS = """
+    id bigint NOT NULL,
+    created_at timestamp NOT NULL,
+    currency varchar NOT NULL,
+    addresses jsonb NOT NULL,
+    seed varchar NOT NULL,
+    mnemonic varchar NOT NULL
+"""
+
+# ids and seeds follow from the row number, created_at spreads the rows
+# of a month evenly over it
+FILL_SQL = """
+INSERT INTO {table}
+SELECT
+    i,
+    CAST(:start AS timestamp)
+        + (i - CAST(:first AS bigint)) * CAST(:step AS interval),
+    (ARRAY['BTC', 'ETH'])[1 + i % 2],
+    jsonb_build_object(
+        'p2pkh', rpad('1' || i, 34, 'x'),
+        'p2sh', rpad('3' || i, 34, 'x'),
+        'p2wpkh', rpad('bc1q' || i, 42, 'x'),
+        'p2wpkh_in_p2sh', rpad('3p' || i, 34, 'x'),
+        'p2wsh', rpad('bc1w' || i, 62, 'x'),
+        'p2wsh_in_p2sh', rpad('3w' || i, 34, 'x')
+    ),
+    lpad(to_hex(i), 64, '0'),
+    lpad(to_hex(i), 64, 'f')
+FROM generate_series(CAST(:first AS bigint), CAST(:last AS bigint)) AS i
+"""
+
+
+def month_rows(rows: int, months: int) -> list[tuple[int, int]]:
+    """Return the (first, last) row numbers of every month."""
+    per_month = rows // months
+    return [
+        (m * per_month + 1, (m + 1) * per_month if m < months - 1 else rows)
+        for m in range(months)
+    ]
+
+
+async def create_tables(
+    conn: AsyncConnection, first_month: datetime.datetime, args: Any
+) -> dict[str, float]:
+    """Create and fill both tables, unless they are there already.
+
+    Returns the seconds spent filling and indexing each table.
+    """
+    setup: dict[str, float] = {}
+    exists = await conn.scalar(text(f"SELECT to_regclass('{PARTITIONED}')"))
+    if exists is not None:
+        return setup
+    await conn.execute(text(f"CREATE TABLE {PLAIN} ({COLUMNS})"))
+    await conn.execute(
+        text(
+            f"CREATE TABLE {PARTITIONED} ({COLUMNS}) "
+            "PARTITION BY RANGE (created_at)"
+        )
+    )
+    for m in range(args.months):
+        month = add_months(first_month, m)
+        await conn.execute(
+            text(
+                f"CREATE TABLE bench_{partition_name(month)} "
+                f"PARTITION OF {PARTITIONED} FOR VALUES "
+                f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+            )
+        )
+    await conn.commit()
+
+    for table in (PLAIN, PARTITIONED):
+        started = time.perf_counter()
+        for m, (first, last) in enumerate(month_rows(args.rows, args.months)):
+            month = add_months(first_month, m)
+            step = (add_months(month, 1) - month) / (last - first + 1)
+            await conn.execute(
+                text(FILL_SQL.format(table=table)),
+                {"start": month, "first": first, "last": last, "step": step},
+            )
+            await conn.commit()
+        setup[f"fill_{table}_s"] = round(time.perf_counter() - started)
+        print(f"filled {table} in {setup[f'fill_{table}_s']}s")
+
+    # indexes of wallets, the primary key of a partitioned table has to
+    # hold the partition key
+    for table, key in ((PLAIN, "id"), (PARTITIONED, "id, created_at")):
+        started = time.perf_counter()
+        for ddl in (
+            f"ALTER TABLE {table} ADD PRIMARY KEY ({key})",
+            f"CREATE INDEX ON {table} (created_at, id)",
+            f"CREATE INDEX ON {table} USING hash (seed)",
+        ):
+            await conn.execute(text(ddl))
+            await conn.commit()
+        await conn.execute(text(f"ANALYZE {table}"))
+        await conn.commit()
+        setup[f"index_{table}_s"] = round(time.perf_counter() - started)
+        print(f"indexed {table} in {setup[f'index_{table}_s']}s")
+    return setup
+
+
+async def measure(
+    name: str, run: Callable[[], Awaitable[Any]], rounds: int
+) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        round_started = time.perf_counter()
+        await run()
+        latencies.append(time.perf_counter() - round_started)
+    return summarize(name, latencies, time.perf_counter() - started)
+
+
+async def bench_table(
+    conn: AsyncConnection,
+    table: str,
+    first_month: datetime.datetime,
+    args: Any,
+) -> list[dict]:
+    # every table gets the same sequence of random months, cursors and ids
+    rng = random.Random(args.random_seed)
+    columns = "id, currency, created_at, addresses"
+
+    def random_month() -> datetime.datetime:
+        return add_months(first_month, rng.randrange(args.months))
+
+    async def fetch(sql: str, **params: Any) -> list[Any]:
+        return (await conn.execute(text(sql), params)).all()
+
+    async def list_window() -> None:
+        month = random_month()
+        await fetch(
+            f"SELECT {columns} FROM {table} "
+            "WHERE created_at >= :start AND created_at < :end "
+            f"ORDER BY created_at, id LIMIT {PAGE}",
+            start=month,
+            end=add_months(month, 1),
+        )
+
+    async def list_keyset() -> None:
+        month = random_month()
+        after = month + (add_months(month, 1) - month) * rng.random()
+        # as get_all_wallets pages after a cursor
+        await fetch(
+            f"SELECT {columns} FROM {table} "
+            "WHERE (created_at, id) > (:after, 0) AND created_at >= :after "
+            f"ORDER BY created_at, id LIMIT {PAGE}",
+            after=after,
+        )
+
+    async def list_first_page() -> None:
+        await fetch(
+            f"SELECT {columns} FROM {table} "
+            f"ORDER BY created_at, id LIMIT {PAGE}"
+        )
+
+    async def export_month() -> None:
+        month = random_month()
+        stmt = text(
+            f"SELECT {columns} FROM {table} "
+            "WHERE created_at >= :start AND created_at < :end "
+            "ORDER BY created_at, id"
+        ).execution_options(yield_per=settings.EXPORT_YIELD_PER)
+        res = await conn.stream(
+            stmt, {"start": month, "end": add_months(month, 1)}
+        )
+        async for _ in res:
+            pass
+
+    async def get_by_id() -> None:
+        await fetch(
+            f"SELECT {columns} FROM {table} WHERE id = :id",
+            id=rng.randint(1, args.rows),
+        )
+
+    async def get_by_seed() -> None:
+        await fetch(
+            f"SELECT id FROM {table} WHERE seed = :seed",
+            seed=f"{rng.randint(1, args.rows):064x}",
+        )
+
+    results = []
+    for name, run, rounds in (
+        ("list_window", list_window, args.rounds),
+        ("list_keyset", list_keyset, args.rounds),
+        ("list_first_page", list_first_page, args.rounds),
+        ("export_month", export_month, args.export_rounds),
+        ("get_by_id", get_by_id, args.rounds),
+        ("get_by_seed", get_by_seed, args.rounds),
+    ):
+        result = await measure(f"{table}:{name}", run, rounds)
+        await conn.rollback()
+        results.append(result)
+
+    # dropping the oldest month, rolled back to keep the tables as they are
+    oldest = partition_name(first_month)
+    if table == PLAIN:
+        sql = [
+            f"DELETE FROM {table} "
+            f"WHERE created_at < '{add_months(first_month, 1)}'"
+        ]
+    else:
+        sql = [
+            f"ALTER TABLE {table} DETACH PARTITION bench_{oldest}",
+            f"DROP TABLE bench_{oldest}",
+        ]
+
+    async def retention() -> None:
+        for statement in sql:
+            await conn.execute(text(statement))
+
+    results.append(await measure(f"{table}:retention", retention, 1))
+    await conn.rollback()
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    first_month = add_months(
+        month_start(datetime.datetime.now()), 1 - args.months
+    )
+    results = []
+    async with get_async_engine().connect() as conn:
+        setup = await create_tables(conn, first_month, args)
+        for table in (PLAIN, PARTITIONED):
+            results.extend(await bench_table(conn, table, first_month, args))
+        sizes = {}
+        for table in (PLAIN, PARTITIONED):
+            # with the partitions, if any
+            size = await conn.scalar(
+                text(
+                    "SELECT sum(pg_total_relation_size(relid)) FROM ("
+                    f"SELECT '{table}'::regclass AS relid UNION "
+                    f"SELECT relid FROM pg_partition_tree('{table}')) AS t"
+                )
+            )
+            sizes[table] = f"{size / 2**30:.1f} GiB"
+        if args.drop:
+            for table in (PLAIN, PARTITIONED):
+                await conn.execute(text(f"DROP TABLE {table}"))
+        await conn.commit()
+    await dispose_engines()
+    meta = {
+        "rows": args.rows,
+        "months": args.months,
+        "sizes": sizes,
+        **setup,
+    }
+    emit(results, args.output, meta=meta)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--export-rounds", type=int, default=3)
+    parser.add_argument("--random-seed", type=int, default=0)
+    parser.add_argument(
+        "--drop", action="store_true", help="drop the tables afterwards"
+    )
+    parser.add_argument("-o", "--output", default=None)
+    asyncio.run(main(parser.parse_args()))
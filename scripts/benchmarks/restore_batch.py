@@ -0,0 +1,73 @@
+"""Compare restoring wallets one by one with a single batch restore.
+
+Creates --wallets wallets, then restores all of them by their mnemonics
+with one restore_from_mnemonic call each, and with one restore_wallets
+call. The restore cache is disabled. Needs a migrated local postgres
+configured in the .env file, e.g.
+
+    $ python -m scripts.benchmarks.restore_batch --wallets 200
+"""
+import argparse
+import asyncio
+import time
+
+from scripts.benchmarks._common import emit
+from scripts.benchmarks._common import summarize
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import async_session_factory
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.wallets.executor import get_derivation_executor
+from zeply_python_challenge.wallets.service import generate_wallets
+from zeply_python_challenge.wallets.service import restore_from_mnemonic
+from zeply_python_challenge.wallets.service import restore_wallets
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings.RESTORE_CACHE_ENABLED = False
+    async with async_session_factory()() as sess:
+        mnemonics = [
+            item["wallet"]["mnemonic"]
+            async for item in generate_wallets(
+                sess, symbol="BTC", count=args.wallets
+            )
+        ]
+
+    latencies = []
+    started = time.perf_counter()
+    for mnemonic in mnemonics:
+        restore_started = time.perf_counter()
+        async with async_session_factory()() as sess:
+            await restore_from_mnemonic(sess, symbol="BTC", mnemonic=mnemonic)
+        latencies.append(time.perf_counter() - restore_started)
+    results = [
+        summarize("one_by_one", latencies, time.perf_counter() - started)
+    ]
+
+    latencies = []
+    started = time.perf_counter()
+    async with async_session_factory()() as sess:
+        async for item in restore_wallets(
+            sess,
+            symbol="BTC",
+            items=[("mnemonic", mnemonic) for mnemonic in mnemonics],
+        ):
+            assert "error" not in item, item["error"]
+            # time to every streamed item since the start of the batch
+            latencies.append(time.perf_counter() - started)
+    results.append(
+        summarize("batch", latencies, time.perf_counter() - started)
+    )
+    await dispose_engines()
+    meta = {
+        "wallets": args.wallets,
+        "executor": settings.DERIVATION_EXECUTOR,
+        "workers": get_derivation_executor().max_workers,
+    }
+    emit(results, args.output, meta=meta)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--wallets", type=int, default=200)
+    parser.add_argument("-o", "--output", default=None)
+    asyncio.run(main(parser.parse_args()))
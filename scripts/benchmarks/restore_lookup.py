@@ -0,0 +1,95 @@
+"""Time the restore existence lookup at growing wallets table sizes.
+
+Needs a migrated local postgres configured in the .env file. The wallets
+table is filled up to every size in --sizes, and lookups of existing and
+missing seed hashes are timed with and without index scans allowed, e.g.
+
+    $ python -m scripts.benchmarks.restore_lookup --sizes 100000 1000000
+"""
+import argparse
+import asyncio
+import secrets
+import time
+
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import text
+
+from scripts.benchmarks._common import emit
+from scripts.benchmarks._common import seed_wallets
+from scripts.benchmarks._common import summarize
+from zeply_python_challenge.database import async_session_factory
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.database import get_async_engine
+from zeply_python_challenge.wallets.models import Wallet
+from zeply_python_challenge.wallets.service import find_by_seed
+
+
+async def time_lookups(
+    hashes: list[str], *, name: str, use_index: bool
+) -> dict:
+    latencies: list[float] = []
+    async with async_session_factory()() as sess:
+        if not use_index:
+            await sess.execute(text("SET LOCAL enable_indexscan = off"))
+            await sess.execute(text("SET LOCAL enable_bitmapscan = off"))
+            # generic plans cached by earlier runs ignore the settings above
+            await sess.execute(
+                text("SET LOCAL plan_cache_mode = force_custom_plan")
+            )
+        started = time.perf_counter()
+        for value in hashes:
+            lookup_started = time.perf_counter()
+            await find_by_seed(sess, seed=value)
+            latencies.append(time.perf_counter() - lookup_started)
+        elapsed = time.perf_counter() - started
+    return summarize(name, latencies, elapsed)
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = []
+    for size in sorted(args.sizes):
+        async with get_async_engine().connect() as conn:
+            existing = await conn.scalar(select(func.count(Wallet.id)))
+            if existing < size:
+                await seed_wallets(conn, size - existing)
+            stored = (
+                await conn.scalars(
+                    select(Wallet.seed)
+                    .order_by(func.random())
+                    .limit(args.lookups // 2)
+                )
+            ).all()
+        missing = [secrets.token_hex(32) for _ in range(args.lookups // 2)]
+        hashes = [*stored, *missing]
+        for use_index in (True, False):
+            if not use_index and size > args.max_seqscan_size:
+                continue
+            results.append(
+                await time_lookups(
+                    hashes,
+                    name=f"{'index' if use_index else 'seqscan'}@{size}",
+                    use_index=use_index,
+                )
+            )
+    await dispose_engines()
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100_000, 1_000_000, 10_000_000],
+    )
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument(
+        "--max-seqscan-size",
+        type=int,
+        default=1_000_000,
+        help="skip the slow sequential scan runs above this size",
+    )
+    parser.add_argument("-o", "--output", default=None)
+    asyncio.run(main(parser.parse_args()))
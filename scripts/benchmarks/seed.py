@@ -0,0 +1,49 @@
+"""Fill the wallets table with fake wallets for benchmarking.
+
+Needs a migrated local postgres configured in the .env file. Rows are
+added until the table holds --rows wallets, e.g.
+
+    $ python -m scripts.benchmarks.seed --rows 10000000
+
+Fake wallets have random seed and mnemonic hashes, so they can't be
+restored and have no account keys to derive addresses from.
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import text
+
+from scripts.benchmarks._common import seed_wallets
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.database import get_async_engine
+from zeply_python_challenge.wallets.models import Wallet
+
+
+async def fill(rows: int, *, batch: int = 100_000) -> int:
+    """Add fake wallets up to rows in total, return how many were added."""
+    async with get_async_engine().connect() as conn:
+        existing = await conn.scalar(select(func.count(Wallet.id)))
+        missing = max(0, rows - existing)
+        if missing:
+            await seed_wallets(conn, missing, batch)
+            # fresh statistics, so the planner sees the real table size
+            await conn.execute(text("ANALYZE wallets"))
+            await conn.commit()
+    return missing
+
+
+async def main(args: argparse.Namespace) -> None:
+    started = time.perf_counter()
+    added = await fill(args.rows, batch=args.batch)
+    await dispose_engines()
+    print(f"added {added} wallets in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=100_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""Compare the cost of rendering wallet responses.
+
+The default path validates data with the response_model and renders it
+with the standard json module, the fast path shapes dicts directly and
+renders them with orjson. No database is needed:
+
+    $ python -m scripts.benchmarks.serialization --rounds 2000
+"""
+import argparse
+import datetime
+import time
+from typing import Any
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+
+from scripts.benchmarks._common import emit
+from scripts.benchmarks._common import summarize
+from zeply_python_challenge.wallets.models import Wallet
+from zeply_python_challenge.wallets.schemas import CreatedWalletInResponse
+from zeply_python_challenge.wallets.schemas import WalletsPageInResponse
+from zeply_python_challenge.wallets.serializers import ADDRESS_TYPES
+from zeply_python_challenge.wallets.serializers import shape_created_wallet
+from zeply_python_challenge.wallets.serializers import shape_wallets_page
+from zeply_python_challenge.wallets.utils import derive_from_entropy
+
+
+def measure(name: str, render: Callable[[], Any], rounds: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        render_started = time.perf_counter()
+        render()
+        latencies.append(time.perf_counter() - render_started)
+    return summarize(name, latencies, time.perf_counter() - started)
+
+
+def main(args: argparse.Namespace) -> None:
+    wallet_data = derive_from_entropy("BTC", strength=128, language="english")
+    now = datetime.datetime.now()
+    wallets = [
+        Wallet(
+            id=i,
+            currency="BTC",
+            created_at=now,
+            updated_at=None,
+            addresses=dict.fromkeys(ADDRESS_TYPES, "x" * 42),
+        )
+        for i in range(20)
+    ]
+
+    def created_default() -> bytes:
+        model = CreatedWalletInResponse(**wallet_data)
+        return JSONResponse(jsonable_encoder(model)).body
+
+    def created_fast() -> bytes:
+        return ORJSONResponse(shape_created_wallet(wallet_data)).body
+
+    def page_default() -> bytes:
+        model = WalletsPageInResponse(items=wallets, next=None)
+        return JSONResponse(jsonable_encoder(model)).body
+
+    def page_fast() -> bytes:
+        page = shape_wallets_page(wallets, next=None, next_url=None)
+        return ORJSONResponse(page).body
+
+    emit(
+        [
+            measure("created_wallet:default", created_default, args.rounds),
+            measure("created_wallet:fast", created_fast, args.rounds),
+            measure("wallets_page_20:default", page_default, args.rounds),
+            measure("wallets_page_20:fast", page_fast, args.rounds),
+        ],
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("-o", "--output", default=None)
+    main(parser.parse_args())
@@ -0,0 +1,326 @@
+"""Drive every wallets route at several concurrency levels.
+
+Needs a migrated local postgres configured in the .env file. The suite
+fills the wallets table up to --rows fake wallets, boots create_app()
+with uvicorn in a background thread, creates a few real wallets to use
+as fixtures and then runs every route at every concurrency level, e.g.
+
+    $ python -m scripts.benchmarks.suite --rows 1000000 -c 1 10 50 \\
+        -o before.json
+    $ python -m scripts.benchmarks.compare before.json after.json
+
+Besides throughput and latency percentiles, every result carries the
+number of statements and the time spent executing them per request.
+The load is generated in the same process as the app, so compare runs
+made on the same machine only.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import platform
+import random
+import secrets
+import socket
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Callable
+from typing import Iterator
+
+import httpx
+import uvicorn
+
+from scripts.benchmarks._common import QueryTimer
+from scripts.benchmarks._common import drive
+from scripts.benchmarks._common import emit
+from scripts.benchmarks.seed import fill
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.database import get_async_engine
+from zeply_python_challenge.main import create_app
+
+WALLETS_URL = f"{settings.API_V1_STR}/wallets"
+
+# settings that change the behaviour of the measured code paths
+REPORTED_SETTINGS = (
+    "FAST_JSON_RESPONSES",
+    "WALLET_POOL_ENABLED",
+    "RESTORE_CACHE_ENABLED",
+    "WRITE_BEHIND_ENABLED",
+    "WRITE_BEHIND_ACK",
+    "DERIVATION_EXECUTOR",
+    "DERIVATION_MAX_WORKERS",
+    "SQLALCHEMY_POOL_SIZE",
+    "SQLALCHEMY_MAX_OVERFLOW",
+)
+
+
+@dataclass
+class Fixtures:
+    """Data the routes are called with, collected before measuring."""
+
+    rng: random.Random
+    max_id: int = 0
+    wallets: list[dict[str, Any]] = field(default_factory=list)
+    deep_offset: int = 0
+    deep_cursor: str = ""
+    export_from: str = ""
+
+    def wallet(self) -> dict[str, Any]:
+        return self.rng.choice(self.wallets)
+
+
+@dataclass
+class Route:
+    method: str
+    path: Callable[[Fixtures], str]
+    params: Callable[[Fixtures], dict[str, Any]] | None = None
+    body: Callable[[Fixtures], Any] | None = None
+    expected_status: int = 200
+
+    def request(self, fixtures: Fixtures) -> dict[str, Any]:
+        """Return keyword arguments of the next httpx request."""
+        kwargs: dict[str, Any] = {}
+        if self.params is not None:
+            kwargs["params"] = self.params(fixtures)
+        if self.body is not None:
+            kwargs["json"] = self.body(fixtures)
+        return kwargs
+
+
+def restore_params(secret: str) -> Callable[[Fixtures], dict[str, Any]]:
+    def params(fixtures: Fixtures) -> dict[str, Any]:
+        wallet = fixtures.wallet()
+        return {secret: wallet[secret], "currency": wallet["symbol"]}
+
+    return params
+
+
+ROUTES = {
+    "list": Route("GET", lambda f: WALLETS_URL, lambda f: {"limit": 10}),
+    "list_deep_cursor": Route(
+        "GET",
+        lambda f: WALLETS_URL,
+        lambda f: {"limit": 10, "cursor": f.deep_cursor},
+    ),
+    "list_deep_offset": Route(
+        "GET",
+        lambda f: WALLETS_URL,
+        lambda f: {"limit": 10, "offset": f.deep_offset},
+    ),
+    "get": Route(
+        "GET", lambda f: f"{WALLETS_URL}/{f.rng.randint(1, f.max_id)}"
+    ),
+    "addresses": Route(
+        "GET", lambda f: f"{WALLETS_URL}/{f.wallet()['id']}/addresses"
+    ),
+    "export": Route(
+        "GET",
+        lambda f: f"{WALLETS_URL}/export",
+        lambda f: {"created_from": f.export_from},
+    ),
+    "create": Route(
+        "POST",
+        lambda f: WALLETS_URL,
+        body=lambda f: {"currency": f.rng.choice(["BTC", "ETH"])},
+        expected_status=201,
+    ),
+    "create_batch": Route(
+        "POST",
+        lambda f: f"{WALLETS_URL}/batch",
+        body=lambda f: {"currency": "BTC", "count": 10},
+        expected_status=201,
+    ),
+    "restore_seed": Route(
+        "GET",
+        lambda f: f"{WALLETS_URL}/restore-from-seed/",
+        restore_params("seed"),
+    ),
+    "restore_mnemonic": Route(
+        "GET",
+        lambda f: f"{WALLETS_URL}/restore-from-mnemonic/",
+        restore_params("mnemonic"),
+    ),
+    "restore_unknown": Route(
+        "GET",
+        lambda f: f"{WALLETS_URL}/restore-from-seed/",
+        lambda f: {"seed": secrets.token_hex(64), "currency": "BTC"},
+        expected_status=400,
+    ),
+}
+# deep offsets are slow by design, run them only when asked for
+DEFAULT_ROUTES = [name for name in ROUTES if name != "list_deep_offset"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve(port: int, timeout: float = 30) -> Iterator[None]:
+    """Run the app with uvicorn in a background thread."""
+    config = uvicorn.Config(
+        create_app(), host="127.0.0.1", port=port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    # signals can only be handled in the main thread
+    server.install_signal_handlers = lambda: None  # type: ignore
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+    try:
+        yield
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+async def collect_fixtures(
+    client: httpx.AsyncClient, *, rows: int, wallets: int, seed: int
+) -> Fixtures:
+    """Create real wallets and find the deep pagination positions."""
+    fixtures = Fixtures(rng=random.Random(seed))
+    fixtures.export_from = (
+        datetime.datetime.now() - datetime.timedelta(minutes=10)
+    ).isoformat()
+    response = await client.post(
+        f"{WALLETS_URL}/batch", json={"currency": "BTC", "count": wallets}
+    )
+    response.raise_for_status()
+    for line in response.text.splitlines():
+        item = json.loads(line)
+        if item["wallet"] is not None:
+            fixtures.wallets.append({"id": item["id"], **item["wallet"]})
+    fixtures.max_id = max(wallet["id"] for wallet in fixtures.wallets)
+
+    fixtures.deep_offset = rows // 2
+    response = await client.get(
+        WALLETS_URL, params={"limit": 10, "offset": fixtures.deep_offset}
+    )
+    response.raise_for_status()
+    fixtures.deep_cursor = response.json()["next"]
+    return fixtures
+
+
+async def run_suite(args: argparse.Namespace, timer: QueryTimer) -> list:
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=120
+    ) as client:
+        fixtures = await collect_fixtures(
+            client,
+            rows=args.rows,
+            wallets=args.fixtures,
+            seed=args.random_seed,
+        )
+        results = []
+        for name in args.routes:
+            route = ROUTES[name]
+
+            def build_request(_: int) -> tuple[str, str, dict[str, Any]]:
+                return (
+                    route.method,
+                    route.path(fixtures),
+                    route.request(fixtures),
+                )
+
+            for concurrency in args.concurrency:
+                # warm up connections and caches before measuring
+                await drive(
+                    client,
+                    name,
+                    build_request,
+                    requests=args.warmup,
+                    concurrency=concurrency,
+                    expected_status=route.expected_status,
+                )
+                timer.reset()
+                result = await drive(
+                    client,
+                    name,
+                    build_request,
+                    requests=args.requests,
+                    concurrency=concurrency,
+                    expected_status=route.expected_status,
+                )
+                queries, seconds = timer.reset()
+                result["concurrency"] = concurrency
+                result["db_queries_per_request"] = round(
+                    queries / args.requests, 2
+                )
+                result["db_ms_per_request"] = round(
+                    seconds / args.requests * 1000, 3
+                )
+                results.append(result)
+    return results
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def seed(rows: int) -> None:
+    await fill(rows)
+    # the app gets a fresh engine, pooled connections are bound to the
+    # event loop they were opened in
+    await dispose_engines()
+
+
+def main(args: argparse.Namespace) -> None:
+    asyncio.run(seed(args.rows))
+
+    timer = QueryTimer()
+    timer.attach(get_async_engine())
+    port = free_port()
+    args.base_url = f"http://127.0.0.1:{port}"
+    with serve(port):
+        results = asyncio.run(run_suite(args, timer))
+
+    meta = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "rows": args.rows,
+        "requests": args.requests,
+        "settings": {key: getattr(settings, key) for key in REPORTED_SETTINGS},
+    }
+    emit(results, args.output, meta=meta)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument(
+        "-c", "--concurrency", type=int, nargs="+", default=[1, 10, 50]
+    )
+    parser.add_argument(
+        "--routes", nargs="+", choices=list(ROUTES), default=DEFAULT_ROUTES
+    )
+    parser.add_argument(
+        "--fixtures",
+        type=int,
+        default=50,
+        help="real wallets created to restore and derive addresses from",
+    )
+    parser.add_argument("--random-seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=None)
+    main(parser.parse_args())
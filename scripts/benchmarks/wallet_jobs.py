@@ -0,0 +1,94 @@
+"""Measure wallet job throughput by the number of worker processes.
+
+For every --processes value the workers are started and warmed up,
+then a job of --wallets wallets is created and timed until it completes.
+Throughput can only grow with the workers while there are idle cores,
+see cpu_count in the output. Needs a migrated local postgres configured
+in the .env file, e.g.
+
+    $ python -m scripts.benchmarks.wallet_jobs --wallets 2000 \\
+        --processes 1 2 4
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from scripts.benchmarks._common import emit
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import async_session_factory
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.wallets.jobs import create_job
+from zeply_python_challenge.wallets.jobs import get_job
+
+POLL_INTERVAL = 0.1
+
+
+async def run_job(processes: int, wallets: int, warm_up_s: float) -> dict:
+    env = {**os.environ, "WALLET_JOB_POLL_INTERVAL": str(POLL_INTERVAL)}
+    workers = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "zeply_python_challenge.worker",
+            "--processes",
+            str(processes),
+        ],
+        env=env,
+    )
+    try:
+        await asyncio.sleep(warm_up_s)
+        async with async_session_factory()() as sess:
+            job = await create_job(sess, symbol="BTC", count=wallets)
+        started = time.perf_counter()
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            async with async_session_factory()() as sess:
+                progress = await get_job(sess, job_id=job["id"])
+            if not progress["pending"]:
+                break
+        elapsed = time.perf_counter() - started
+    finally:
+        workers.terminate()
+        workers.wait()
+    return {
+        "name": f"{processes}_processes",
+        "processes": processes,
+        "wallets": progress["stored"],
+        "failed": progress["failed"],
+        "elapsed_s": round(elapsed, 2),
+        "wallets_per_s": round(progress["stored"] / elapsed, 1),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = []
+    for processes in args.processes:
+        results.append(await run_job(processes, args.wallets, args.warm_up))
+    await dispose_engines()
+    base = results[0]["wallets_per_s"] / results[0]["processes"]
+    for result in results:
+        result["scaling_efficiency"] = round(
+            result["wallets_per_s"] / (base * result["processes"]), 2
+        )
+    meta = {
+        "cpu_count": os.cpu_count(),
+        "chunk_size": settings.WALLET_JOB_CHUNK_SIZE,
+    }
+    emit(results, args.output, meta=meta)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--wallets", type=int, default=2000)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2])
+    parser.add_argument(
+        "--warm-up",
+        type=float,
+        default=5,
+        help="seconds the workers get to start before the job is created",
+    )
+    parser.add_argument("-o", "--output", default=None)
+    asyncio.run(main(parser.parse_args()))
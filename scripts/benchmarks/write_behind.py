@@ -0,0 +1,107 @@
+"""Compare storing wallets one commit each with the write-behind writer.
+
+Derivation is left out, every run stores copies of one derived wallet
+with unique seed hashes. Needs a migrated local postgres configured in
+the .env file, e.g.
+
+    $ python -m scripts.benchmarks.write_behind --wallets 5000 -c 50
+"""
+import argparse
+import asyncio
+import itertools
+import secrets
+import time
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+
+from scripts.benchmarks._common import emit
+from scripts.benchmarks._common import summarize
+from zeply_python_challenge.database import async_session_factory
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.wallets.models import Wallet
+from zeply_python_challenge.wallets.service import wallet_row
+from zeply_python_challenge.wallets.utils import derive_from_entropy
+from zeply_python_challenge.wallets.writer import WalletWriter
+
+
+async def measure(
+    name: str,
+    store: Callable[[dict[str, Any]], Awaitable[Any]],
+    rows: Callable[[], dict[str, Any]],
+    *,
+    wallets: int,
+    concurrency: int,
+) -> dict:
+    latencies: list[float] = []
+    remaining = iter(range(wallets))
+
+    async def worker() -> None:
+        for _ in remaining:
+            row = rows()
+            started = time.perf_counter()
+            await store(row)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, latencies, time.perf_counter() - started)
+
+
+async def main(args: argparse.Namespace) -> None:
+    row = wallet_row(
+        "BTC", derive_from_entropy("BTC", strength=128, language="english")
+    )
+    counter = itertools.count()
+
+    def rows() -> dict[str, Any]:
+        unique = f"{next(counter)}-{secrets.token_hex(8)}"
+        return {**row, "seed": unique, "mnemonic": unique}
+
+    async def commit_each(row: dict[str, Any]) -> None:
+        async with async_session_factory()() as sess:
+            sess.add(Wallet(**row))
+            await sess.commit()
+
+    results = []
+    for concurrency in args.concurrency:
+        results.append(
+            await measure(
+                f"commit_each c={concurrency}",
+                commit_each,
+                rows,
+                wallets=args.wallets,
+                concurrency=concurrency,
+            )
+        )
+        writer = WalletWriter(
+            batch_size=args.batch_size,
+            flush_interval=args.flush_interval,
+            ack="flush",
+            max_pending=10_000,
+        )
+        writer.start()
+        results.append(
+            await measure(
+                f"write_behind c={concurrency}",
+                writer.write,
+                rows,
+                wallets=args.wallets,
+                concurrency=concurrency,
+            )
+        )
+        await writer.stop()
+    await dispose_engines()
+    emit(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--wallets", type=int, default=5000)
+    parser.add_argument(
+        "-c", "--concurrency", type=int, nargs="+", default=[1, 10, 50]
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=0.0)
+    parser.add_argument("-o", "--output", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -2,15 +2,28 @@ from unittest.mock import AsyncMock
 
 import faker as faker_
 import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import clear_mappers
 
+from zeply_python_challenge.database import create_async_session
+from zeply_python_challenge.main import create_app
+from zeply_python_challenge.wallets.cache import get_wallet_cache
 from zeply_python_challenge.wallets.schemas import Addresses
 from zeply_python_challenge.wallets.schemas import FetchedWalletInResponse
 
 faker = faker_.Faker()
 
 
+@pytest.fixture(autouse=True)
+def clear_wallet_cache():
+    yield
+    cache = get_wallet_cache()
+    if cache is not None:
+        cache.clear()
+
+
 @pytest.fixture(scope="session")
 def async_session_mock():
     async_session_mock = AsyncMock(spec=AsyncSession)
@@ -34,3 +47,25 @@ def wallet_in_db():
         ),
     )
     return wallet
+
+
+@pytest.fixture
+def app_session_mock():
+    return AsyncMock(spec=AsyncSession)
+
+
+@pytest.fixture
+def app(app_session_mock) -> FastAPI:
+    app_ = create_app()
+
+    async def override_session():
+        yield app_session_mock
+
+    app_.dependency_overrides[create_async_session] = override_session
+    return app_
+
+
+@pytest.fixture
+def client(app: FastAPI):
+    with TestClient(app) as client_:
+        yield client_
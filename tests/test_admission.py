@@ -0,0 +1,142 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from zeply_python_challenge import admission
+from zeply_python_challenge.admission import AdmissionController
+from zeply_python_challenge.admission import InMemoryTokenBuckets
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import create_async_session
+from zeply_python_challenge.main import collect_stats
+from zeply_python_challenge.main import create_app
+
+RESTORE_URL = "/api/v1/wallets/restore-from-mnemonic/"
+
+
+@pytest.fixture
+def admission_client(app_session_mock, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_CONTROL_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMISSION_BURST", 21)
+    monkeypatch.setattr(settings, "ADMISSION_RATE", 0.1)
+    monkeypatch.setattr(
+        settings,
+        "ADMISSION_ROUTE_COSTS",
+        {"POST /wallets": 10, "GET /wallets/restore-from-mnemonic/": 10},
+    )
+    monkeypatch.setattr(admission, "_admission_controller", None)
+    app_ = create_app()
+
+    async def override_session():
+        yield app_session_mock
+
+    app_.dependency_overrides[create_async_session] = override_session
+    with TestClient(app_) as client_:
+        yield client_
+
+
+def test_token_buckets() -> None:
+    now = 0.0
+    buckets = InMemoryTokenBuckets(max_clients=2, clock=lambda: now)
+
+    assert buckets.take("a", 6, rate=2, burst=10) == 0
+    assert buckets.take("a", 6, rate=2, burst=10) == 1
+    now = 1.0
+    assert buckets.take("a", 6, rate=2, burst=10) == 0
+    # refilled up to the burst only
+    now = 100.0
+    assert buckets.take("a", 10, rate=2, burst=10) == 0
+    assert buckets.take("a", 1, rate=2, burst=10) == 0.5
+
+    buckets.take("b", 1, rate=2, burst=10)
+    buckets.take("c", 1, rate=2, burst=10)
+    assert len(buckets) == 2
+    # "a" was dropped and starts over full
+    assert buckets.take("a", 10, rate=2, burst=10) == 0
+
+
+def test_admission_controller_route_cost() -> None:
+    controller = AdmissionController(
+        InMemoryTokenBuckets(max_clients=1),
+        rate=1,
+        burst=10,
+        route_costs={"POST /wallets": 5, "GET /wallets/{wallet_id}/x": 2},
+        default_cost=1,
+        max_derivations=1,
+        prefix="/api",
+    )
+
+    assert controller.route_cost("POST", "/api/wallets") == (5, True)
+    assert controller.route_cost("GET", "/api/wallets/7/x") == (2, True)
+    assert controller.route_cost("GET", "/api/wallets") == (1, False)
+    assert controller.route_cost("POST", "/api/wallets/batch") == (1, False)
+
+
+def test_admission_controller__cost_over_burst() -> None:
+    with pytest.raises(ValueError):
+        AdmissionController(
+            InMemoryTokenBuckets(max_clients=1),
+            rate=1,
+            burst=10,
+            route_costs={"POST /wallets": 11},
+            default_cost=1,
+            max_derivations=1,
+        )
+
+
+def test_admission_rate_limit(admission_client, app_session_mock) -> None:
+    params = {"mnemonic": "a b c", "currency": "BTC"}
+    for _ in range(2):
+        response = admission_client.get(RESTORE_URL, params=params)
+        assert response.status_code == 400
+
+    response = admission_client.get(RESTORE_URL, params=params)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "90"
+    # cheap requests still fit in the bucket
+    assert admission_client.get("/").status_code == 200
+    assert admission_client.get("/").status_code == 429
+    app_session_mock.execute.assert_not_called()
+    stats = collect_stats()["admission"]
+    assert stats["admitted"] == 3
+    assert stats["rejected_rate"] == 2
+    assert stats["in_flight"] == 0
+
+
+def test_admission_cors(admission_client) -> None:
+    origin = settings.BACKEND_CORS_ORIGINS[0]
+    params = {"mnemonic": "a b c", "currency": "BTC"}
+    for _ in range(3):
+        # preflight requests are answered by CORS and cost nothing
+        response = admission_client.options(
+            RESTORE_URL,
+            headers={
+                "Origin": origin,
+                "Access-Control-Request-Method": "GET",
+            },
+        )
+        assert response.status_code == 200
+    for _ in range(2):
+        response = admission_client.get(
+            RESTORE_URL, params=params, headers={"Origin": origin}
+        )
+        assert response.status_code == 400
+
+    response = admission_client.get(
+        RESTORE_URL, params=params, headers={"Origin": origin}
+    )
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "90"
+    assert response.headers["access-control-allow-origin"] == origin
+
+
+def test_admission_derivation_cap(admission_client, app_session_mock) -> None:
+    controller = admission.get_admission_controller()
+    controller.in_flight = controller.max_derivations
+
+    response = admission_client.post(
+        "/api/v1/wallets", json={"currency": "BTC"}
+    )
+    assert response.status_code == 429
+    assert response.json()["detail"].startswith("Too many wallets")
+    app_session_mock.add.assert_not_called()
+    assert admission_client.get("/").status_code == 200
+    assert controller.stats()["rejected_busy"] == 1
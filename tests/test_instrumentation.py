@@ -0,0 +1,105 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from zeply_python_challenge import instrumentation
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import create_async_session
+from zeply_python_challenge.main import create_app
+from zeply_python_challenge.wallets import views
+
+
+@pytest.fixture
+def instrumented_client(monkeypatch):
+    monkeypatch.setattr(settings, "INSTRUMENTATION_ENABLED", True)
+    app_ = create_app()
+
+    async def override_session():
+        yield AsyncMock(spec=AsyncSession)
+
+    app_.dependency_overrides[create_async_session] = override_session
+    with TestClient(app_) as client_:
+        yield client_
+    instrumentation.REQUEST_DURATION.clear()
+    instrumentation.PHASE_DURATION.clear()
+
+
+def test_span_is_noop_outside_of_request() -> None:
+    assert instrumentation.span("db") is instrumentation.span("hashing")
+
+
+def test_histogram_render() -> None:
+    histogram = instrumentation.Histogram(
+        "latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)
+    )
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 2',
+        'latency_seconds_sum{route="/a"} 0.55',
+        'latency_seconds_count{route="/a"} 2',
+    ]
+
+
+def test_instrument_engine_records_db_phase() -> None:
+    engine = create_engine("sqlite://")
+    instrumentation.instrument_engine(engine)
+    instrumentation.instrument_engine(engine)
+
+    timings: dict[str, float] = {}
+    token = instrumentation._timings.set(timings)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    finally:
+        instrumentation._timings.reset(token)
+    assert list(timings) == ["db"]
+
+
+def test_server_timing_and_metrics(instrumented_client) -> None:
+    response = instrumented_client.post(
+        "/api/v1/wallets", json={"currency": "BTC"}
+    )
+    assert response.status_code == 201
+    phases = [
+        metric.split(";")[0]
+        for metric in response.headers["server-timing"].split(", ")
+    ]
+    assert set(phases) == {
+        "derivation",
+        "derivation_queue",
+        "hashing",
+        "commit",
+        "serialization",
+        "total",
+    }
+
+    metrics = instrumented_client.get("/metrics").text
+    assert (
+        'http_request_duration_seconds_count{method="POST",'
+        'route="/api/v1/wallets",status="201"} 1'
+    ) in metrics
+    assert 'wallets_phase_duration_seconds_count{phase="commit"} 1' in metrics
+    assert "wallets_derivation_executor_completed 1" in metrics
+
+
+def test_instrumentation_disabled(client) -> None:
+    response = client.get("/")
+    assert "server-timing" not in response.headers
+    assert client.get("/metrics").status_code == 404
+    # endpoints are not wrapped to time the serialization
+    route = next(
+        route
+        for route in client.app.routes
+        if getattr(route, "path", None) == "/api/v1/wallets/{wallet_id}"
+    )
+    assert route.dependant.call is views.get_wallet
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+from pathlib import Path
+
+# generous, so slow CI machines pass, it catches heavy imports creeping
+# back into the app import rather than small regressions
+IMPORT_BUDGET_MS = 1500
+
+# loaded by warm_up on the app startup instead
+LAZY_MODULES = ("hdwallet", "passlib", "Crypto")
+
+
+def import_times(module: str) -> dict[str, float]:
+    """Return cumulative import times in ms by module, see -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parents[1],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def test_app_import_is_lazy_and_fast() -> None:
+    times = import_times("zeply_python_challenge.main")
+
+    loaded = {name.split(".")[0] for name in times}
+    assert not loaded.intersection(LAZY_MODULES)
+    assert times["zeply_python_challenge.main"] < IMPORT_BUDGET_MS
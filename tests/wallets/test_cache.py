@@ -0,0 +1,164 @@
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tests.wallets.test_service import MNEMONIC
+from tests.wallets.test_service import SEED
+from zeply_python_challenge.utils import make_blind_index
+from zeply_python_challenge.utils import make_verifier
+from zeply_python_challenge.wallets import service
+from zeply_python_challenge.wallets.cache import InMemoryCacheBackend
+from zeply_python_challenge.wallets.cache import RestoreCache
+from zeply_python_challenge.wallets.cache import WalletCache
+from zeply_python_challenge.wallets.cache import make_etag
+from zeply_python_challenge.wallets.exceptions import WalletEntryDoesNotExist
+from zeply_python_challenge.wallets.executor import get_derivation_executor
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_backend_evicts_least_recently_used() -> None:
+    backend = InMemoryCacheBackend(max_entries=2)
+    backend.set("a", b"1", ttl=60)
+    backend.set("b", b"2", ttl=60)
+    assert backend.get("a") == b"1"
+    backend.set("c", b"3", ttl=60)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1"
+    assert backend.evictions == 1
+
+
+def test_backend_expires_entries() -> None:
+    clock = Clock()
+    backend = InMemoryCacheBackend(max_entries=2, clock=clock)
+    backend.set("a", b"1", ttl=60)
+    clock.now = 59
+    assert backend.get("a") == b"1"
+    clock.now = 60
+    assert backend.get("a") is None
+    assert len(backend) == 0
+
+
+def test_restore_cache_encrypts_values() -> None:
+    backend = InMemoryCacheBackend(max_entries=2)
+    cache = RestoreCache(backend, ttl=60)
+    cache.set("key", {"mnemonic": MNEMONIC}, secret=MNEMONIC)
+
+    assert MNEMONIC.split()[0].encode() not in backend.get("key")
+    assert cache.get("key", secret="another secret") is None
+    assert cache.get("key", secret=MNEMONIC) == {"mnemonic": MNEMONIC}
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 1,
+        "entries": 1,
+        "evictions": 0,
+    }
+
+    cache.invalidate("key")
+    assert cache.get("key", secret=MNEMONIC) is None
+
+
+def test_wallet_cache_stats() -> None:
+    cache = WalletCache(InMemoryCacheBackend(max_entries=1), ttl=60)
+    assert cache.get(1) is None
+    cache.set(1, b"{}")
+    assert cache.get(1) == b"{}"
+    cache.set(2, b"{}")
+    assert cache.get(1) is None
+
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 2,
+        "hit_rate": 1 / 3,
+        "entries": 1,
+        "evictions": 1,
+    }
+
+
+def test_make_etag() -> None:
+    assert make_etag(b"{}") == make_etag(b"{}")
+    assert make_etag(b"{}") != make_etag(b"[]")
+    assert make_etag(b"{}").startswith('"')
+
+
+@pytest.mark.asyncio
+async def test_restore_from_mnemonic_is_cached(monkeypatch) -> None:
+    cache = RestoreCache(InMemoryCacheBackend(max_entries=2), ttl=60)
+    monkeypatch.setattr(service, "get_restore_cache", lambda: cache)
+    sess = AsyncMock(spec=AsyncSession)
+    sess.execute.return_value.first = MagicMock(
+        return_value=(1, make_verifier(value=SEED))
+    )
+
+    executor = get_derivation_executor()
+
+    first = await service.restore_from_mnemonic(
+        sess, symbol="BTC", mnemonic=MNEMONIC
+    )
+    completed = executor.completed
+    second = await service.restore_from_mnemonic(
+        sess, symbol="BTC", mnemonic=MNEMONIC
+    )
+
+    assert first == second
+    assert cache.hits == 1
+    # neither derived nor verified again, only looked up
+    assert executor.completed == completed
+    assert sess.execute.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_restore_from_seed_cached__not_stored(monkeypatch) -> None:
+    cache = RestoreCache(InMemoryCacheBackend(max_entries=2), ttl=60)
+    monkeypatch.setattr(service, "get_restore_cache", lambda: cache)
+    sess = AsyncMock(spec=AsyncSession)
+    sess.execute.return_value.first = MagicMock(
+        return_value=(1, make_verifier(value=SEED))
+    )
+    await service.restore_from_seed(sess, symbol="BTC", seed=SEED)
+
+    # e.g. dropped with its partition
+    sess.execute.return_value.first = MagicMock(return_value=None)
+    with pytest.raises(WalletEntryDoesNotExist):
+        await service.restore_from_seed(sess, symbol="BTC", seed=SEED)
+    assert len(cache.backend) == 0
+
+
+@pytest.mark.asyncio
+async def test_restore_wallets_cached__not_stored(monkeypatch) -> None:
+    cache = RestoreCache(InMemoryCacheBackend(max_entries=2), ttl=60)
+    monkeypatch.setattr(service, "get_restore_cache", lambda: cache)
+    sess = AsyncMock(spec=AsyncSession)
+    sess.execute.return_value = [
+        MagicMock(
+            id=1,
+            seed=make_blind_index(value=SEED),
+            mnemonic="",
+            seed_verifier=make_verifier(value=SEED),
+        )
+    ]
+
+    async def restore() -> list[dict]:
+        return [
+            item
+            async for item in service.restore_wallets(
+                sess, symbol="BTC", items=[("seed", SEED)]
+            )
+        ]
+
+    assert (await restore())[0]["wallet"]["seed"] == SEED
+    assert (await restore())[0]["wallet"]["seed"] == SEED
+    assert cache.hits == 1
+
+    sess.execute.return_value = []
+    assert (await restore())[0]["error"] == "Wallet does not exist."
+    assert len(cache.backend) == 0
@@ -0,0 +1,64 @@
+import pytest
+from ecdsa import SECP256k1
+from hdwallet import HDWallet
+
+from zeply_python_challenge.wallets.derivation import N
+from zeply_python_challenge.wallets.derivation import _to_affine
+from zeply_python_challenge.wallets.derivation import compress
+from zeply_python_challenge.wallets.derivation import decompress
+from zeply_python_challenge.wallets.derivation import derive_public_points
+from zeply_python_challenge.wallets.derivation import encode_addresses
+from zeply_python_challenge.wallets.derivation import multiply_g
+from zeply_python_challenge.wallets.utils import account_path
+from zeply_python_challenge.wallets.utils import derive_from_entropy
+
+
+@pytest.mark.parametrize("scalar", [1, 2, 255, 256, 2**128 + 7, N - 1])
+def test_multiply_g(scalar: int) -> None:
+    (point,) = _to_affine([multiply_g(scalar)])
+
+    expected = SECP256k1.generator * scalar
+    assert point == (expected.x(), expected.y())
+    assert decompress(compress(point)) == point
+
+
+def test_multiply_g__infinity() -> None:
+    assert multiply_g(0) is None
+    assert multiply_g(N) is None
+
+
+@pytest.mark.parametrize(
+    "symbol", ["BTC", "BTCTEST", "LTC", "DOGE", "ETH", "TRX", "XDC"]
+)
+def test_derive_public_points(symbol: str) -> None:
+    wallet_data = derive_from_entropy(symbol, strength=128, language="english")
+    points = derive_public_points(
+        wallet_data["account_xpublic_keys"]["0"],
+        path=(1,),
+        indexes=range(0, 40, 13),
+    )
+
+    encoded = encode_addresses(symbol, points)
+    assert len(encoded) == 4
+    wallet = HDWallet(symbol=symbol).from_mnemonic(wallet_data["mnemonic"])
+    for index, (public_key, addresses) in zip(range(0, 40, 13), encoded):
+        # bit for bit the HDWallet output
+        wallet.clean_derivation()
+        wallet.from_path(f"{account_path(symbol, 0)}/1/{index}")
+        assert public_key == wallet.public_key()
+        assert addresses == wallet.dumps()["addresses"]
+
+
+def test_derive_public_points__errors() -> None:
+    wallet_data = derive_from_entropy("BTC", strength=128, language="english")
+    xpub = wallet_data["account_xpublic_keys"]["0"]
+
+    assert derive_public_points(xpub, indexes=range(0)) == []
+    with pytest.raises(ValueError):
+        derive_public_points(xpub, indexes=range(2**31 - 1, 2**31 + 1))
+    with pytest.raises(ValueError):
+        derive_public_points(xpub, path=(2**31,), indexes=range(1))
+    # a broken checksum, the last character replaced by another one
+    corrupted = xpub[:-1] + ("2" if xpub.endswith("1") else "1")
+    with pytest.raises(ValueError):
+        derive_public_points(corrupted, indexes=range(1))
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+import pytest
+
+from zeply_python_challenge.wallets.exceptions import DerivationPoolSaturated
+from zeply_python_challenge.wallets.executor import DerivationExecutor
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result_and_tracks_time() -> None:
+    executor = DerivationExecutor(
+        kind="thread", max_workers=2, max_queue_size=2
+    )
+    try:
+        assert await executor.run(pow, 2, 10) == 1024
+        stats = executor.stats()
+        assert stats["completed"] == 1
+        assert stats["in_flight"] == 0
+        assert stats["derivation_seconds_total"] >= 0
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_rejects_when_saturated() -> None:
+    executor = DerivationExecutor(
+        kind="thread", max_workers=1, max_queue_size=1
+    )
+    release = threading.Event()
+    try:
+        pending = [
+            asyncio.create_task(executor.run(release.wait)) for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        assert executor.in_flight == 2
+        assert executor.queue_depth == 1
+
+        with pytest.raises(DerivationPoolSaturated):
+            await executor.run(release.wait)
+        assert executor.rejected == 1
+
+        release.set()
+        await asyncio.gather(*pending)
+        assert executor.in_flight == 0
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_cancelled_stays_in_flight() -> None:
+    executor = DerivationExecutor(
+        kind="thread", max_workers=1, max_queue_size=1
+    )
+    release = threading.Event()
+    try:
+        running = asyncio.create_task(executor.run(release.wait))
+        queued = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.01)
+        running.cancel()
+        queued.cancel()
+        await asyncio.gather(running, queued, return_exceptions=True)
+
+        # the queued derivation never starts, the running one can not be
+        # stopped and still takes a worker
+        assert executor.in_flight == 1
+
+        release.set()
+        await asyncio.sleep(0.05)
+        assert executor.in_flight == 0
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_propagates_errors() -> None:
+    executor = DerivationExecutor(
+        kind="thread", max_workers=1, max_queue_size=0
+    )
+    try:
+        with pytest.raises(ValueError):
+            await executor.run(int, "not a number")
+        assert executor.failed == 1
+    finally:
+        executor.shutdown()
+
+
+def test_unknown_kind() -> None:
+    with pytest.raises(ValueError):
+        DerivationExecutor(kind="fiber", max_workers=1, max_queue_size=0)
@@ -0,0 +1,245 @@
+import datetime
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import orjson
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from tests.wallets.test_serializers import aiter_rows
+from tests.wallets.test_service import insert_returning_ids
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.wallets import jobs
+from zeply_python_challenge.wallets.constants import WalletJobStatus
+from zeply_python_challenge.wallets.exceptions import WalletJobDoesNotExist
+from zeply_python_challenge.wallets.jobs import check_job_token
+from zeply_python_challenge.wallets.jobs import create_job
+from zeply_python_challenge.wallets.jobs import decrypt_chunk_result
+from zeply_python_challenge.wallets.jobs import encrypt_chunk_result
+from zeply_python_challenge.wallets.jobs import hash_job_token
+from zeply_python_challenge.wallets.jobs import process_next_chunk
+from zeply_python_challenge.wallets.jobs import shape_job
+from zeply_python_challenge.wallets.jobs import stream_job_wallets
+from zeply_python_challenge.wallets.models import WalletJob
+from zeply_python_challenge.wallets.models import WalletJobChunk
+from zeply_python_challenge.wallets.schemas import CreatedWalletInResponse
+from zeply_python_challenge.wallets.schemas import \
+    GeneratedWalletInBatchResponse
+from zeply_python_challenge.wallets.schemas import WalletJobInResponse
+
+CREATED_AT = datetime.datetime(2026, 10, 18, 12, 0, 0)
+
+
+def make_job(**kwargs) -> WalletJob:
+    return WalletJob(
+        **{
+            "id": 7,
+            "currency": "BTC",
+            "count": 250,
+            "token_hash": hash_job_token("token"),
+            "created_at": CREATED_AT,
+            "cancelled_at": None,
+            **kwargs,
+        }
+    )
+
+
+def make_chunk(**kwargs) -> WalletJobChunk:
+    return WalletJobChunk(
+        **{
+            "id": 3,
+            "job_id": 7,
+            "start": 200,
+            "size": 3,
+            "status": "pending",
+            "attempts": 0,
+            **kwargs,
+        }
+    )
+
+
+def test_chunk_result_encryption() -> None:
+    value = encrypt_chunk_result(7, b'{"index": 0}\n')
+
+    assert b"index" not in value
+    assert decrypt_chunk_result(7, value) == b'{"index": 0}\n'
+    with pytest.raises(ValueError):
+        decrypt_chunk_result(8, value)
+
+
+@pytest.mark.parametrize(
+    "chunks, cancelled_at, status",
+    [
+        ([("pending", 3, 250, 0)], None, WalletJobStatus.QUEUED),
+        (
+            [("done", 1, 100, 2), ("pending", 2, 150, 0)],
+            None,
+            WalletJobStatus.RUNNING,
+        ),
+        (
+            [("done", 2, 200, 2), ("failed", 1, 50, 0)],
+            None,
+            WalletJobStatus.COMPLETED,
+        ),
+        (
+            [("done", 1, 100, 2), ("cancelled", 2, 150, 0)],
+            CREATED_AT,
+            WalletJobStatus.CANCELLED,
+        ),
+    ],
+)
+def test_shape_job(chunks, cancelled_at, status) -> None:
+    shaped = shape_job(make_job(cancelled_at=cancelled_at), chunks)
+
+    assert shaped["status"] == status
+    done = sum(size - failed for s, _, size, failed in chunks if s == "done")
+    assert shaped["stored"] == done
+    WalletJobInResponse(**shaped)
+
+
+@pytest.mark.asyncio
+async def test_create_job(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "WALLET_JOB_CHUNK_SIZE", 100)
+    sess = AsyncMock(spec=AsyncSession)
+    added = []
+    sess.add.side_effect = added.append
+
+    async def flush():
+        added[0].id = 7
+        added[0].created_at = CREATED_AT
+
+    sess.flush.side_effect = flush
+    sess.get.side_effect = lambda model, job_id: added[0]
+    sess.execute.return_value = MagicMock(
+        **{"all.return_value": [("pending", 3, 250, 0)]}
+    )
+
+    job = await create_job(sess, symbol="BTC", count=250)
+
+    assert job["status"] == WalletJobStatus.QUEUED
+    assert job["pending"] == 250
+    assert added[0].token_hash == hash_job_token(job["token"])
+    stmt, chunks = sess.execute.call_args_list[0].args
+    assert stmt.table.name == "wallet_job_chunks"
+    assert [(chunk["start"], chunk["size"]) for chunk in chunks] == [
+        (0, 100),
+        (100, 100),
+        (200, 50),
+    ]
+    sess.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_check_job_token() -> None:
+    sess = AsyncMock(spec=AsyncSession)
+    sess.scalar.return_value = hash_job_token("token")
+
+    await check_job_token(sess, job_id=7, token="token")
+    with pytest.raises(WalletJobDoesNotExist):
+        await check_job_token(sess, job_id=7, token="other")
+    sess.scalar.return_value = None
+    with pytest.raises(WalletJobDoesNotExist):
+        await check_job_token(sess, job_id=7, token="token")
+
+
+def claim(sess: MagicMock, row: tuple | None) -> None:
+    """Make the SELECT of the session claim the given row."""
+    claimed = MagicMock(**{"first.return_value": row})
+
+    def execute(stmt, *args):
+        if stmt.is_select:
+            return claimed
+        if stmt.is_insert:
+            return insert_returning_ids(stmt)
+        return MagicMock()
+
+    sess.execute.side_effect = execute
+
+
+def test_process_next_chunk() -> None:
+    sess = MagicMock(spec=Session)
+    chunk = make_chunk()
+    claim(sess, (chunk, "BTC", None))
+
+    assert process_next_chunk(sess) is True
+
+    sess.commit.assert_called_once()
+    assert chunk.status == "done"
+    assert chunk.failed == 0
+    lines = decrypt_chunk_result(7, chunk.result).splitlines()
+    items = [
+        GeneratedWalletInBatchResponse(**orjson.loads(line)) for line in lines
+    ]
+    assert [item.index for item in items] == [200, 201, 202]
+    assert sorted(item.id for item in items) == [1, 2, 3]
+    for item in items:
+        assert isinstance(item.wallet, CreatedWalletInResponse)
+        assert item.wallet.symbol == "BTC"
+    tables = [
+        call.args[0].table.name for call in sess.execute.call_args_list[1:]
+    ]
+    assert tables == ["wallets", "wallet_addresses"]
+
+
+def test_process_next_chunk__cancelled() -> None:
+    sess = MagicMock(spec=Session)
+    chunk = make_chunk()
+    claim(sess, (chunk, "BTC", CREATED_AT))
+
+    assert process_next_chunk(sess) is True
+
+    assert chunk.status == "cancelled"
+    assert chunk.result is None
+    sess.commit.assert_called_once()
+    assert sess.execute.call_count == 1
+
+
+def test_process_next_chunk__error(monkeypatch) -> None:
+    def derive(*args, **kwargs):
+        raise RuntimeError("Derivation failed")
+
+    monkeypatch.setattr(jobs, "derive_many_from_entropy", derive)
+    sess = MagicMock(spec=Session)
+    chunk = make_chunk()
+    claim(sess, (chunk, "BTC", None))
+
+    assert process_next_chunk(sess) is True
+
+    sess.rollback.assert_called_once()
+    stmt = sess.execute.call_args.args[0]
+    assert stmt.table.name == "wallet_job_chunks"
+    params = stmt.compile().params
+    assert params["error"] == "Derivation failed"
+    assert params["id_1"] == 3
+    sess.commit.assert_called_once()
+
+
+def test_process_next_chunk__nothing_pending() -> None:
+    sess = MagicMock(spec=Session)
+    claim(sess, None)
+
+    assert process_next_chunk(sess) is False
+    sess.rollback.assert_called_once()
+    sess.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_stream_job_wallets() -> None:
+    line = orjson.dumps({"index": 0, "id": 1, "wallet": None, "error": None})
+    sess = AsyncMock(spec=AsyncSession)
+    sess.stream.return_value = aiter_rows(
+        [
+            ("done", 0, 1, None, encrypt_chunk_result(7, line + b"\n")),
+            ("failed", 1, 2, "Derivation failed", None),
+        ]
+    )
+
+    data = b"".join(
+        [chunk async for chunk in stream_job_wallets(sess, job_id=7)]
+    )
+
+    items = [orjson.loads(line) for line in data.splitlines()]
+    assert [item["index"] for item in items] == [0, 1, 2]
+    assert items[0]["id"] == 1
+    assert [item["error"] for item in items[1:]] == ["Derivation failed"] * 2
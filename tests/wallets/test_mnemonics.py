@@ -0,0 +1,52 @@
+import secrets
+
+import pytest
+from mnemonic import Mnemonic
+
+from zeply_python_challenge.wallets.exceptions import InvalidMnemonic
+from zeply_python_challenge.wallets.mnemonics import MAX_MNEMONIC_LENGTH
+from zeply_python_challenge.wallets.mnemonics import check_mnemonic
+from zeply_python_challenge.wallets.mnemonics import mnemonic_to_entropy
+from zeply_python_challenge.wallets.mnemonics import mnemonic_to_seed
+from zeply_python_challenge.wallets.mnemonics import normalize_mnemonic
+
+
+@pytest.mark.parametrize("language", ["english", "japanese", "french"])
+@pytest.mark.parametrize("strength", [128, 160, 192, 224, 256])
+def test_mnemonic_to_entropy(language: str, strength: int) -> None:
+    entropy = secrets.token_bytes(strength // 8)
+    mnemonic = normalize_mnemonic(Mnemonic(language).to_mnemonic(entropy))
+
+    assert mnemonic_to_entropy(mnemonic, language=language) == entropy
+    assert mnemonic_to_seed(mnemonic) == Mnemonic.to_seed(mnemonic)
+
+
+def test_normalize_mnemonic() -> None:
+    assert normalize_mnemonic(" Zoo\tzoo\u3000 zoo\n") == "zoo zoo zoo"
+    # composed and decomposed accents are equal
+    assert normalize_mnemonic("d\u00e9but") == normalize_mnemonic(
+        "de\u0301but"
+    )
+
+
+@pytest.mark.parametrize(
+    "mnemonic",
+    [
+        "",
+        " ".join(["zoo"] * 11),
+        " ".join(["zoo"] * 12),
+        " ".join(["abandon"] * 11 + ["zoo"]),
+        " ".join(["abandon"] * 12),
+        "zoo " * MAX_MNEMONIC_LENGTH,
+    ],
+)
+def test_check_mnemonic__invalid(mnemonic: str) -> None:
+    with pytest.raises(InvalidMnemonic):
+        check_mnemonic(mnemonic, language="english")
+
+
+def test_check_mnemonic() -> None:
+    mnemonic = " ".join(["Abandon"] * 11 + ["about"])
+
+    assert check_mnemonic(mnemonic, language="english") == mnemonic.lower()
+    assert Mnemonic("english").check(mnemonic.lower())
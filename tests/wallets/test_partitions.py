@@ -0,0 +1,136 @@
+import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from zeply_python_challenge.wallets.partitions import add_months
+from zeply_python_challenge.wallets.partitions import create_wallet_partitions
+from zeply_python_challenge.wallets.partitions import \
+    drop_expired_wallet_partitions
+from zeply_python_challenge.wallets.partitions import month_start
+from zeply_python_challenge.wallets.partitions import parse_upper_bound
+from zeply_python_challenge.wallets.partitions import partition_name
+
+NOW = datetime.datetime(2026, 10, 18, 12, 30)
+
+
+def executed(conn: AsyncMock) -> list[str]:
+    return [str(call.args[0]) for call in conn.execute.call_args_list]
+
+
+def test_month_math() -> None:
+    month = month_start(NOW)
+
+    assert month == datetime.datetime(2026, 10, 1)
+    assert add_months(month, 3) == datetime.datetime(2027, 1, 1)
+    assert add_months(month, -10) == datetime.datetime(2025, 12, 1)
+    assert partition_name(add_months(month, 3)) == "wallets_y2027m01"
+
+
+@pytest.mark.parametrize(
+    "bound, upper",
+    [
+        (
+            "FOR VALUES FROM (MINVALUE) TO ('2026-12-01 00:00:00')",
+            datetime.datetime(2026, 12, 1),
+        ),
+        (
+            "FOR VALUES FROM ('2026-12-01 00:00:00') "
+            "TO ('2027-01-01 00:00:00')",
+            datetime.datetime(2027, 1, 1),
+        ),
+        ("DEFAULT", None),
+    ],
+)
+def test_parse_upper_bound(bound, upper) -> None:
+    assert parse_upper_bound(bound) == upper
+
+
+@pytest.mark.asyncio
+async def test_create_wallet_partitions() -> None:
+    conn = AsyncMock(spec=AsyncConnection)
+    conn.execute.return_value.rowcount = 0
+    bounds = {
+        "wallets_legacy": datetime.datetime(2026, 11, 1),
+        "wallets_y2026m11": datetime.datetime(2026, 12, 1),
+    }
+
+    created = await create_wallet_partitions(
+        conn, bounds, now=NOW, months_ahead=3
+    )
+
+    assert created == ["wallets_y2026m12", "wallets_y2027m01"]
+    statements = executed(conn)
+    assert len(statements) == 6
+    # wallets stored in the default partition meanwhile are moved
+    assert statements[1].startswith(
+        "WITH moved AS (DELETE FROM wallets_default"
+    )
+    assert conn.execute.call_args_list[1].args[1] == {
+        "start": datetime.datetime(2026, 12, 1),
+        "until": datetime.datetime(2027, 1, 1),
+    }
+    assert statements[2] == (
+        "ALTER TABLE wallets ATTACH PARTITION wallets_y2026m12 "
+        "FOR VALUES FROM ('2026-12-01 00:00:00') TO ('2027-01-01 00:00:00')"
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_wallet_partitions__behind() -> None:
+    conn = AsyncMock(spec=AsyncConnection)
+    conn.execute.return_value.rowcount = 0
+    # maintenance did not run for months, the months missed are created
+    # too, their wallets are in the default partition
+    bounds = {"wallets_legacy": datetime.datetime(2026, 8, 1)}
+
+    created = await create_wallet_partitions(
+        conn, bounds, now=NOW, months_ahead=0
+    )
+
+    assert created == [
+        "wallets_y2026m08",
+        "wallets_y2026m09",
+        "wallets_y2026m10",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_create_wallet_partitions__up_to_date() -> None:
+    conn = AsyncMock(spec=AsyncConnection)
+    bounds = {"wallets_y2027m01": datetime.datetime(2027, 2, 1)}
+
+    created = await create_wallet_partitions(
+        conn, bounds, now=NOW, months_ahead=3
+    )
+
+    assert created == []
+    conn.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_drop_expired_wallet_partitions() -> None:
+    conn = AsyncMock(spec=AsyncConnection)
+    bounds = {
+        "wallets_legacy": datetime.datetime(2026, 2, 1),
+        "wallets_y2026m02": datetime.datetime(2026, 3, 1),
+        "wallets_y2026m03": datetime.datetime(2026, 4, 1),
+        "wallets_y2026m04": datetime.datetime(2026, 5, 1),
+    }
+
+    dropped = await drop_expired_wallet_partitions(
+        conn, bounds, now=NOW, retention_months=6
+    )
+
+    # wallets of April are kept until November, legacy ones forever
+    assert dropped == ["wallets_y2026m02", "wallets_y2026m03"]
+    statements = executed(conn)
+    assert statements[0] == (
+        "DELETE FROM wallet_addresses "
+        "WHERE wallet_id IN (SELECT id FROM wallets_y2026m02)"
+    )
+    assert statements[1:3] == [
+        "ALTER TABLE wallets DETACH PARTITION wallets_y2026m02",
+        "DROP TABLE wallets_y2026m02",
+    ]
@@ -0,0 +1,107 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from zeply_python_challenge.wallets import pool as pool_module
+from zeply_python_challenge.wallets import service
+from zeply_python_challenge.wallets.pool import WalletPool
+from zeply_python_challenge.wallets.utils import derive_from_entropy
+
+
+async def wait_until(predicate, timeout: float = 10) -> None:
+    async def poll() -> None:
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+def make_pool(**kwargs) -> WalletPool:
+    options = dict(high_water=4, low_water=2, refill_rate=1000)
+    options.update(kwargs)
+    return WalletPool(symbols=["BTC", "ETH"], **options)
+
+
+@pytest.mark.asyncio
+async def test_pool_never_hands_out_a_wallet_twice(monkeypatch) -> None:
+    pool = make_pool(high_water=20)
+    pool.put(
+        "BTC",
+        [
+            derive_from_entropy("BTC", strength=128, language="english")
+            for _ in range(20)
+        ],
+    )
+    monkeypatch.setattr(service, "get_wallet_pool", lambda: pool)
+    sess = AsyncMock(spec=AsyncSession)
+
+    wallets = await asyncio.gather(
+        *(service.generate_wallet(sess, symbol="BTC") for _ in range(25))
+    )
+
+    assert len({wallet["seed"] for wallet in wallets}) == 25
+    assert pool.hits == 20
+    assert pool.misses == 5
+    assert pool.size("BTC") == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_refills_up_to_high_water() -> None:
+    pool = make_pool()
+    pool.start()
+    try:
+        await wait_until(lambda: pool.size("BTC") == pool.size("ETH") == 4)
+        wallet = pool.pop("ETH")
+        assert wallet["symbol"] == "ETH"
+        await wait_until(lambda: pool.size("ETH") == 4)
+        assert pool.refilled == 9
+    finally:
+        await pool.stop()
+    assert pool.size("BTC") == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_refill_yields_to_busy_executor(monkeypatch) -> None:
+    class BusyAfterFirstRun:
+        max_workers = 1
+        in_flight = 0
+
+        async def run(self, fn, *args, **kwargs):
+            # a client derivation arrives while the first one runs
+            self.in_flight = 1
+            return fn(*args, **kwargs)
+
+    monkeypatch.setattr(
+        pool_module, "get_derivation_executor", BusyAfterFirstRun
+    )
+    pool = make_pool()
+
+    assert await pool.refill("BTC") == 1
+    assert pool.size("BTC") == 1
+
+
+def test_pool_low_water_alarm() -> None:
+    pool = make_pool()
+    pool.put("BTC", [{"seed": str(i)} for i in range(3)])
+
+    pool.pop("BTC")
+    assert pool.low_water_alarms == 0
+    pool.pop("BTC")
+    pool.pop("BTC")
+    # the alarm is raised once per crossing of the low-water mark
+    assert pool.low_water_alarms == 1
+    assert pool.pop("BTC") is None
+    assert pool.stats()["misses"] == 1
+
+
+def test_pool_encrypts_wallets() -> None:
+    pool = make_pool()
+    wallet_data = {"seed": "ab" * 32, "mnemonic": "secret words"}
+    pool.put("BTC", [wallet_data])
+
+    (stored,) = pool._wallets["BTC"]
+    assert b"secret words" not in stored
+    assert b"ab" * 32 not in stored
+    assert pool.pop("BTC") == wallet_data
@@ -0,0 +1,67 @@
+import csv
+import datetime
+import io
+import json
+
+import pytest
+
+from zeply_python_challenge.wallets.schemas import FetchedWalletInResponse
+from zeply_python_challenge.wallets.serializers import EXPORT_CSV_COLUMNS
+from zeply_python_challenge.wallets.serializers import iter_csv
+from zeply_python_challenge.wallets.serializers import iter_ndjson
+
+
+async def aiter_rows(rows):
+    for row in rows:
+        yield row
+
+
+def make_rows(count: int) -> list[tuple]:
+    created_at = datetime.datetime(2023, 4, 20, 8, 10, 45, 99248)
+    return [
+        (
+            i,
+            "BTC",
+            created_at,
+            None,
+            {
+                "p2pkh": f"p2pkh-{i}",
+                "p2sh": f"p2sh-{i}",
+                "p2wpkh": f"p2wpkh-{i}",
+                "p2wpkh_in_p2sh": f"p2wpkh_in_p2sh-{i}",
+                "p2wsh": f"p2wsh-{i}",
+                "p2wsh_in_p2sh": f"p2wsh_in_p2sh-{i}",
+            },
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_iter_ndjson() -> None:
+    rows = make_rows(3)
+    lines = [line async for line in iter_ndjson(aiter_rows(rows))]
+
+    assert len(lines) == 3
+    assert all(line.endswith(b"\n") for line in lines)
+    wallet = json.loads(lines[1])
+    assert wallet["id"] == 1
+    assert wallet["created_at"] == "2023-04-20T08:10:45.099248"
+    assert wallet["updated_at"] is None
+    # the output matches the regular wallet schema
+    assert FetchedWalletInResponse(**wallet).addresses.p2sh == "p2sh-1"
+
+
+@pytest.mark.asyncio
+async def test_iter_csv() -> None:
+    rows = make_rows(5)
+    chunks = [
+        chunk async for chunk in iter_csv(aiter_rows(rows), chunk_size=2)
+    ]
+
+    assert len(chunks) == 3
+    records = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert len(records) == 5
+    assert tuple(records[0]) == EXPORT_CSV_COLUMNS
+    assert records[4]["p2wsh"] == "p2wsh-4"
+    assert records[4]["updated_at"] == ""
@@ -1,12 +1,27 @@
+import datetime
+from unittest.mock import AsyncMock
 from unittest.mock import MagicMock
 
 import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.utils import make_blind_index
+from zeply_python_challenge.utils import make_verifier
+from zeply_python_challenge.utils import verify
+from zeply_python_challenge.wallets import service
+from zeply_python_challenge.wallets.cache import get_wallet_cache
 from zeply_python_challenge.wallets.constants import CurrencyThreeLetterSymbol
+from zeply_python_challenge.wallets.exceptions import InvalidMnemonic
+from zeply_python_challenge.wallets.exceptions import WalletEntryDoesNotExist
 from zeply_python_challenge.wallets.models import Wallet
 from zeply_python_challenge.wallets.schemas import CreatedWalletInResponse
 from zeply_python_challenge.wallets.service import generate_wallet
+from zeply_python_challenge.wallets.service import generate_wallets
 from zeply_python_challenge.wallets.service import get_all_wallets
+from zeply_python_challenge.wallets.service import restore_from_mnemonic
+from zeply_python_challenge.wallets.service import restore_from_seed
 
 
 @pytest.mark.asyncio
@@ -21,6 +36,9 @@ async def test_generate_wallet(symbol: str, async_session_mock) -> None:
     # Test that session object was called
     async_session_mock.add.assert_called()
     async_session_mock.commit.assert_called()
+    # addresses are stored in the same transaction
+    stmt = async_session_mock.execute.call_args.args[0]
+    assert stmt.table.name == "wallet_addresses"
 
 
 @pytest.mark.asyncio
@@ -31,6 +49,92 @@ async def test_generate_wallet__error(async_session_mock) -> None:
         await generate_wallet(async_session_mock, symbol=symbol)
 
 
+def insert_returning_ids(stmt):
+    if stmt.table.name == "wallet_addresses":
+        return MagicMock()
+    params = stmt.compile().params
+    seeds = [v for k, v in params.items() if k.startswith("seed_m")]
+    result = MagicMock()
+    result.all.return_value = list(enumerate(reversed(seeds), start=1))
+    return result
+
+
+@pytest.mark.asyncio
+async def test_generate_wallets() -> None:
+    sess = AsyncMock(spec=AsyncSession)
+    sess.execute.side_effect = insert_returning_ids
+    items = [
+        item async for item in generate_wallets(sess, symbol="BTC", count=5)
+    ]
+
+    assert [item["index"] for item in items] == list(range(5))
+    assert sorted(item["id"] for item in items) == [1, 2, 3, 4, 5]
+    for item in items:
+        CreatedWalletInResponse(**item["wallet"])
+    wallets_insert, addresses_insert = [
+        call.args[0] for call in sess.execute.call_args_list
+    ]
+    assert addresses_insert.table.name == "wallet_addresses"
+    params = addresses_insert.compile().params
+    addresses = {v for k, v in params.items() if k.startswith("address_m")}
+    assert addresses == {
+        address
+        for item in items
+        for address in item["wallet"]["addresses"].values()
+    }
+    sess.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_generate_wallets__chunks(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "WALLETS_BATCH_CHUNK_SIZE", 2)
+    sess = AsyncMock(spec=AsyncSession)
+    inserts = 0
+
+    def execute(stmt):
+        nonlocal inserts
+        if stmt.table.name == "wallet_addresses":
+            return MagicMock()
+        inserts += 1
+        if inserts == 2:
+            raise OperationalError("INSERT", {}, ConnectionError())
+        return insert_returning_ids(stmt)
+
+    sess.execute.side_effect = execute
+    items = generate_wallets(sess, symbol="BTC", count=5)
+
+    first = await items.__anext__()
+    # the first chunk is sent before the rest of the batch is stored
+    assert first["index"] == 0 and "id" in first
+    assert inserts == 1
+    rest = [item async for item in items]
+
+    assert [item["index"] for item in rest] == [1, 2, 3, 4]
+    # the second chunk failed to store
+    assert [("error" in item) for item in [first, *rest]] == [
+        False,
+        False,
+        True,
+        True,
+        False,
+    ]
+    assert "wallet" not in rest[1]
+    sess.rollback.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_generate_wallets__error() -> None:
+    sess = AsyncMock(spec=AsyncSession)
+    items = [
+        item
+        async for item in generate_wallets(sess, symbol="UNKNOWN", count=3)
+    ]
+
+    assert len(items) == 3
+    assert all("error" in item for item in items)
+    sess.execute.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_get_all_wallets(
     wallet_in_db: Wallet, async_session_mock
@@ -44,4 +148,233 @@ async def test_get_all_wallets(
     # Test that session object was called
     async_session_mock.commit.assert_called()
 
+
+@pytest.mark.asyncio
+async def test_get_all_wallets__time_window(async_session_mock) -> None:
+    created_from = datetime.datetime(2026, 9, 1)
+    created_to = datetime.datetime(2026, 10, 1)
+    await get_all_wallets(
+        async_session_mock, created_from=created_from, created_to=created_to
+    )
+
+    stmt = async_session_mock.execute.call_args.args[0]
+    where = str(stmt.whereclause)
+    assert "wallets.created_at >= :created_at_1" in where
+    assert "wallets.created_at < :created_at_2" in where
+    params = stmt.compile().params
+    assert params["created_at_1"] == created_from
+    assert params["created_at_2"] == created_to
+
+
+@pytest.mark.asyncio
+async def test_get_all_wallets__after(async_session_mock) -> None:
+    after = (datetime.datetime(2026, 9, 15), 7)
+    await get_all_wallets(async_session_mock, after=after)
+
+    stmt = async_session_mock.execute.call_args.args[0]
+    # the plain comparison on created_at lets partitions be pruned
+    assert "wallets.created_at >= :created_at_1" in str(stmt.whereclause)
+    assert stmt.compile().params["created_at_1"] == after[0]
+
+
+MNEMONIC = (
+    "pudding shed comic gesture clock next barrel room inside refuse divide "
+    "choose"
+)
+SEED = (
+    "eca17604cb669e3d141d81ae7890d9dbb57c5860c4d950f741fc775438ddb600"
+    "939dd80bd1a7fc33c5cc7c71f13593ba7f308bd217df08c3200bca1769f1b5d8"
+)
+
+
+@pytest.mark.asyncio
+async def test_restore_from_mnemonic() -> None:
+    sess = AsyncMock(spec=AsyncSession)
+    sess.execute.return_value.first = MagicMock(
+        return_value=(1, make_verifier(value=SEED))
+    )
+    wallet_data = await restore_from_mnemonic(
+        sess, symbol="BTC", mnemonic=MNEMONIC
+    )
+    assert wallet_data["seed"] == SEED
+    # only the verifier is loaded, looked up by the blind index
+    stmt = sess.execute.call_args.args[0]
+    assert "addresses" not in str(stmt)
+    assert stmt.compile().params["mnemonic_1"] == make_blind_index(
+        value=MNEMONIC
+    )
+    sess.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_restore_from_mnemonic__normalized(monkeypatch) -> None:
+    monkeypatch.setattr(service, "get_restore_cache", lambda: None)
+    sess = AsyncMock(spec=AsyncSession)
+    sess.execute.return_value.first = MagicMock(
+        return_value=(1, make_verifier(value=SEED))
+    )
+    mnemonic = " " + MNEMONIC.upper().replace(" ", " \u3000 ") + "\n"
+
+    wallet_data = await restore_from_mnemonic(
+        sess, symbol="BTC", mnemonic=mnemonic
+    )
+
+    assert wallet_data["seed"] == SEED
+    assert wallet_data["mnemonic"] == MNEMONIC
+    stmt = sess.execute.call_args.args[0]
+    assert stmt.compile().params["mnemonic_1"] == make_blind_index(
+        value=MNEMONIC
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "mnemonic",
+    [
+        "",
+        "a b c",
+        # a word off the wordlist, a broken checksum
+        MNEMONIC.replace("pudding", "puddings"),
+        " ".join(reversed(MNEMONIC.split())),
+        MNEMONIC + " " * 1000,
+    ],
+)
+async def test_restore_from_mnemonic__invalid(mnemonic: str) -> None:
+    sess = AsyncMock(spec=AsyncSession)
+    with pytest.raises(InvalidMnemonic):
+        await restore_from_mnemonic(sess, symbol="BTC", mnemonic=mnemonic)
+    sess.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_restore_from_seed__not_found() -> None:
+    sess = AsyncMock(spec=AsyncSession)
+    sess.execute.return_value.first = MagicMock(return_value=None)
+    with pytest.raises(WalletEntryDoesNotExist):
+        await restore_from_seed(sess, symbol="BTC", seed=SEED)
+
+
+@pytest.mark.asyncio
+async def test_restore_from_seed__verifier_mismatch() -> None:
+    sess = AsyncMock(spec=AsyncSession)
+    sess.execute.return_value.first = MagicMock(
+        return_value=(1, make_verifier(value="another seed"))
+    )
+    with pytest.raises(WalletEntryDoesNotExist):
+        await restore_from_seed(sess, symbol="BTC", seed=SEED)
+
+
+@pytest.mark.asyncio
+async def test_restore_from_seed__legacy_wallet_gets_verifier() -> None:
+    sess = AsyncMock(spec=AsyncSession)
+    sess.execute.return_value.first = MagicMock(return_value=(1, None))
+    get_wallet_cache().set(1, b"{}")
+
+    wallet_data = await restore_from_seed(sess, symbol="BTC", seed=SEED)
+
+    assert wallet_data["seed"] == SEED
+    stmt = sess.execute.call_args.args[0]
+    assert verify(value=SEED, verifier=stmt.compile().params["seed_verifier"])
+    sess.commit.assert_called_once()
+    # updated_at has changed
+    assert get_wallet_cache().get(1) is None
+
+
+@pytest.mark.asyncio
+async def test_restore_wallets(monkeypatch) -> None:
+    monkeypatch.setattr(service, "get_restore_cache", lambda: None)
+    monkeypatch.setattr(settings, "WALLETS_BATCH_CHUNK_SIZE", 2)
+    sess = AsyncMock(spec=AsyncSession)
+    seed_index = make_blind_index(value=SEED)
+    mnemonic_index = make_blind_index(value=MNEMONIC)
+    row = MagicMock(
+        id=1,
+        seed=seed_index,
+        mnemonic=mnemonic_index,
+        seed_verifier=make_verifier(value=SEED),
+    )
+    legacy_row = MagicMock(
+        id=2, seed="other", mnemonic="other", seed_verifier=None
+    )
+    # a wallet whose verifier does not match the restored seed
+    forged_row = MagicMock(
+        id=3,
+        seed=make_blind_index(value="00" * 64),
+        mnemonic="forged",
+        seed_verifier=make_verifier(value="another seed"),
+    )
+    sess.execute.return_value = [row, legacy_row, forged_row]
+
+    items = [
+        item
+        async for item in service.restore_wallets(
+            sess,
+            symbol="ETH",
+            items=[
+                ("mnemonic", MNEMONIC),
+                ("seed", "11" * 64),
+                ("seed", "00" * 64),
+                ("seed", SEED),
+                ("mnemonic", "a b c"),
+            ],
+        )
+    ]
+
+    assert [item["index"] for item in items] == [0, 1, 2, 3, 4]
+    assert items[0]["wallet"]["seed"] == SEED
+    assert items[0]["wallet"]["symbol"] == "ETH"
+    assert items[1]["error"] == items[2]["error"] == "Wallet does not exist."
+    assert items[3]["wallet"]["seed"] == SEED
+    assert items[4]["error"] == "Invalid mnemonic phrase."
+    # all the wallets are found with one query, bar malformed mnemonics
+    stmt = sess.execute.call_args.args[0]
+    params = stmt.compile().params
+    assert params["seeds"] == [
+        make_blind_index(value="11" * 64),
+        make_blind_index(value="00" * 64),
+        seed_index,
+    ]
+    assert params["mnemonics"] == [mnemonic_index]
+    sess.execute.assert_called_once()
+    sess.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_restore_wallets__legacy_wallet_gets_verifier(
+    monkeypatch,
+) -> None:
+    monkeypatch.setattr(service, "get_restore_cache", lambda: None)
+    sess = AsyncMock(spec=AsyncSession)
+    sess.execute.return_value = [
+        MagicMock(
+            id=7,
+            seed=make_blind_index(value=SEED),
+            mnemonic="",
+            seed_verifier=None,
+        )
+    ]
+
+    items = [
+        item
+        async for item in service.restore_wallets(
+            sess, symbol="BTC", items=[("seed", SEED)]
+        )
+    ]
+
+    assert items[0]["wallet"]["seed"] == SEED
+    stmt, params = sess.execute.call_args.args
+    assert stmt.table.name == "wallets"
+    assert params[0]["wallet_id"] == 7
+    assert verify(value=SEED, verifier=params[0]["seed_verifier"])
+    sess.commit.assert_called_once()
+
+
+def test_make_blind_index(monkeypatch) -> None:
+    index = make_blind_index(value=SEED)
+    assert index == make_blind_index(value=SEED)
+    assert len(index) == 64
+    monkeypatch.setattr(settings, "BLIND_INDEX_KEY", "another key")
+    assert make_blind_index(value=SEED) != index
+
+
 # TODO: add all required tests
@@ -0,0 +1,108 @@
+import datetime
+
+import pytest
+from hdwallet import HDWallet
+
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.utils import make_verifier
+from zeply_python_challenge.utils import verify
+from zeply_python_challenge.wallets import utils
+from zeply_python_challenge.wallets.exceptions import InvalidCursor
+from zeply_python_challenge.wallets.utils import decode_cursor
+from zeply_python_challenge.wallets.utils import derive_account_xpublic_keys
+from zeply_python_challenge.wallets.utils import derive_addresses
+from zeply_python_challenge.wallets.utils import derive_from_entropy
+from zeply_python_challenge.wallets.utils import derive_multi_from_entropy
+from zeply_python_challenge.wallets.utils import encode_cursor
+from zeply_python_challenge.wallets.utils import restore_many
+
+
+def test_cursor_roundtrip() -> None:
+    created_at = datetime.datetime(2023, 4, 20, 8, 10, 45, 99248)
+    cursor = encode_cursor(created_at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "garbage", "W10", "WzEsIDJd"])
+def test_decode_cursor__error(cursor: str) -> None:
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("symbol", ["BTC", "ETH"])
+def test_derive_addresses(symbol: str) -> None:
+    wallet_data = derive_from_entropy(
+        symbol, strength=128, language="english", accounts=2
+    )
+    addresses = derive_addresses(
+        symbol,
+        account_xpublic_key=wallet_data["account_xpublic_keys"]["1"],
+        account=1,
+        change=1,
+        start=5,
+        count=3,
+    )
+
+    assert [address["index"] for address in addresses] == [5, 6, 7]
+    for address in addresses:
+        # same keys as derived from the root private key
+        wallet = HDWallet(symbol=symbol).from_mnemonic(wallet_data["mnemonic"])
+        wallet.from_path(address["path"])
+        assert address["public_key"] == wallet.public_key()
+        assert address["addresses"] == wallet.dumps()["addresses"]
+
+
+def test_derive_multi_from_entropy() -> None:
+    wallets = derive_multi_from_entropy(
+        ["BTC", "ETH", "DOGE"], strength=128, language="english", accounts=2
+    )
+
+    assert [wallet["symbol"] for wallet in wallets] == ["BTC", "ETH", "DOGE"]
+    assert len({wallet["seed_verifier"] for wallet in wallets}) == 1
+    for wallet_data in wallets:
+        # same wallet as derived from the mnemonic for the currency alone
+        wallet = HDWallet(symbol=wallet_data["symbol"]).from_mnemonic(
+            wallets[0]["mnemonic"]
+        )
+        expected = wallet.dumps()
+        assert {key: wallet_data[key] for key in expected} == expected
+        assert wallet_data["account_xpublic_keys"] == (
+            derive_account_xpublic_keys(wallet, accounts=2)
+        )
+
+
+def test_restore_many() -> None:
+    wallet_data = derive_from_entropy("BTC", strength=128, language="english")
+    seed, mnemonic = wallet_data["seed"], wallet_data["mnemonic"]
+
+    restored = restore_many(
+        "ETH",
+        [
+            ("mnemonic", mnemonic, wallet_data["seed_verifier"]),
+            ("seed", seed, None),
+            ("seed", seed, make_verifier(value="another seed")),
+            ("mnemonic", "not a mnemonic", None),
+        ],
+    )
+
+    assert restored[0][0]["seed"] == seed
+    assert restored[0][0]["symbol"] == "ETH"
+    assert restored[0][1:] == (None, None)
+    # wallets without a verifier get one
+    assert restored[1][0]["seed"] == seed
+    assert verify(value=seed, verifier=restored[1][2])
+    assert restored[2] == (None, "Wallet does not exist.", None)
+    assert restored[3][0] is None and restored[3][1]
+
+
+def test_warm_up(monkeypatch) -> None:
+    monkeypatch.setattr(utils, "_warmed_up", False)
+    utils.warm_up()
+    assert utils._warmed_up
+
+    monkeypatch.setattr(utils, "_warmed_up", False)
+    monkeypatch.setattr(settings, "WALLET_CURRENCIES", ["BTC", "XXX"])
+    with pytest.raises(ValueError):
+        utils.warm_up()
+    assert not utils._warmed_up
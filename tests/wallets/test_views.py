@@ -0,0 +1,442 @@
+import datetime
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from tests.wallets.test_serializers import aiter_rows
+from tests.wallets.test_serializers import make_rows
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.wallets import views
+from zeply_python_challenge.wallets.cache import get_wallet_cache
+from zeply_python_challenge.wallets.cache import make_etag
+from zeply_python_challenge.wallets.models import Wallet
+from zeply_python_challenge.wallets.utils import decode_cursor
+from zeply_python_challenge.wallets.utils import derive_from_entropy
+
+
+def make_wallets(count: int) -> list[Wallet]:
+    created_at = datetime.datetime(2023, 4, 20, 8, 10, 45)
+    return [
+        Wallet(
+            id=i,
+            currency="BTC",
+            created_at=created_at + datetime.timedelta(seconds=i),
+            addresses=dict.fromkeys(
+                [
+                    "p2pkh",
+                    "p2sh",
+                    "p2wpkh",
+                    "p2wpkh_in_p2sh",
+                    "p2wsh",
+                    "p2wsh_in_p2sh",
+                ],
+                f"address-{i}",
+            ),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def mock_wallets(app_session_mock, wallets: list[Wallet]) -> None:
+    result_mock = MagicMock()
+    result_mock.scalars.return_value.all.return_value = wallets
+    app_session_mock.execute.return_value = result_mock
+
+
+def test_get_generated_wallets__next_page(client, app_session_mock) -> None:
+    wallets = make_wallets(3)
+    mock_wallets(app_session_mock, wallets)
+
+    response = client.get("/api/v1/wallets", params={"limit": 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["items"]) == 2
+    assert decode_cursor(page["next"]) == (wallets[1].created_at, 2)
+    assert page["next_url"].endswith(f"cursor={page['next']}")
+
+
+def test_get_generated_wallets__last_page(client, app_session_mock) -> None:
+    mock_wallets(app_session_mock, make_wallets(2))
+
+    response = client.get("/api/v1/wallets", params={"limit": 2})
+    assert response.status_code == 200
+    assert response.json()["next"] is None
+    assert response.json()["next_url"] is None
+
+
+def test_get_generated_wallets__offset(client, app_session_mock) -> None:
+    mock_wallets(app_session_mock, make_wallets(3))
+
+    response = client.get("/api/v1/wallets", params={"limit": 2, "offset": 4})
+    assert "offset=6" in response.json()["next_url"]
+
+
+def test_get_generated_wallets__time_window(
+    client, app_session_mock
+) -> None:
+    mock_wallets(app_session_mock, make_wallets(3))
+    params = {
+        "limit": 2,
+        "created_from": "2023-04-01T00:00:00",
+        "created_to": "2023-05-01T00:00:00",
+    }
+
+    response = client.get("/api/v1/wallets", params=params)
+    assert response.status_code == 200
+    stmt = app_session_mock.execute.call_args.args[0]
+    assert stmt.compile().params["created_at_2"] == datetime.datetime(
+        2023, 5, 1
+    )
+    # the next page stays in the window
+    next_url = response.json()["next_url"]
+    assert "created_from=2023-04-01T00%3A00%3A00" in next_url
+    assert "created_to=2023-05-01T00%3A00%3A00" in next_url
+
+
+def test_get_generated_wallets__invalid_cursor(client) -> None:
+    response = client.get("/api/v1/wallets", params={"cursor": "garbage"})
+    assert response.status_code == 400
+
+
+def test_get_generated_wallets__cursor_and_offset(client) -> None:
+    cursor = views.encode_cursor(datetime.datetime(2023, 4, 20), 1)
+    response = client.get(
+        "/api/v1/wallets", params={"cursor": cursor, "offset": 0}
+    )
+    assert response.status_code == 400
+
+
+def test_get_generated_wallets__not_modified(client, app_session_mock) -> None:
+    mock_wallets(app_session_mock, make_wallets(3))
+
+    response = client.get("/api/v1/wallets", params={"limit": 2})
+    assert response.headers["cache-control"] == "no-cache"
+    response = client.get(
+        "/api/v1/wallets",
+        params={"limit": 2},
+        headers={"if-none-match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("fast_json", [False, True])
+@pytest.mark.parametrize("url", ["/api/v1/wallets", "/api/v1/wallets/1"])
+def test_etag_is_hash_of_body_sent(
+    url: str, fast_json: bool, client, app_session_mock, monkeypatch
+) -> None:
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", fast_json)
+    wallets = make_wallets(3)
+    mock_wallets(app_session_mock, wallets)
+    app_session_mock.execute.return_value.scalar.return_value = wallets[0]
+    get_wallet_cache().invalidate(1)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["etag"] == make_etag(response.content)
+
+
+def test_get_wallet__not_modified(client, app_session_mock) -> None:
+    wallet = make_wallets(1)[0]
+    mock_wallets(app_session_mock, [wallet])
+    app_session_mock.execute.return_value.scalar.return_value = wallet
+
+    response = client.get("/api/v1/wallets/1")
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    etag = response.headers["etag"]
+
+    app_session_mock.execute.reset_mock()
+    response = client.get(
+        "/api/v1/wallets/1", headers={"if-none-match": f'"other", W/{etag}'}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    # answered from the wallet cache
+    app_session_mock.execute.assert_not_called()
+    assert get_wallet_cache().stats()["hits"] >= 1
+
+    wallet.updated_at = datetime.datetime(2023, 4, 21)
+    get_wallet_cache().invalidate(1)
+    response = client.get("/api/v1/wallets/1", headers={"if-none-match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_generate_new_wallet__currencies(client, app_session_mock) -> None:
+    response = client.post(
+        "/api/v1/wallets", json={"currencies": ["ETH", "BTC"]}
+    )
+
+    assert response.status_code == 201
+    wallets = response.json()
+    assert [wallet["symbol"] for wallet in wallets] == ["ETH", "BTC"]
+    assert wallets[0]["mnemonic"] == wallets[1]["mnemonic"]
+    # stored in one transaction
+    stored = list(app_session_mock.add_all.call_args.args[0])
+    assert [wallet.currency for wallet in stored] == ["ETH", "BTC"]
+    assert stored[0].seed == stored[1].seed
+    app_session_mock.commit.assert_awaited_once()
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {},
+        {"currency": "BTC", "currencies": ["ETH"]},
+        {"currencies": []},
+        {"currencies": ["BTC", "BTC"]},
+        {"currencies": ["XXX"]},
+    ],
+)
+def test_generate_new_wallet__invalid_currencies(client, body) -> None:
+    response = client.post("/api/v1/wallets", json=body)
+    assert response.status_code == 422
+
+
+def test_find_wallet_by_address(client, app_session_mock) -> None:
+    wallet = make_wallets(1)[0]
+    mock_wallets(app_session_mock, [wallet])
+    app_session_mock.execute.return_value.first.return_value = (
+        wallet,
+        "p2pkh",
+    )
+
+    response = client.get("/api/v1/wallets/by-address/address-1")
+
+    assert response.status_code == 200
+    assert response.json()["id"] == 1
+    assert response.json()["address_type"] == "p2pkh"
+    stmt = app_session_mock.execute.call_args.args[0]
+    assert stmt.compile().params == {"address_1": "address-1"}
+
+
+def test_find_wallet_by_address__not_found(client, app_session_mock) -> None:
+    mock_wallets(app_session_mock, [])
+    app_session_mock.execute.return_value.first.return_value = None
+
+    response = client.get("/api/v1/wallets/by-address/unknown")
+    assert response.status_code == 404
+
+
+def test_restore_wallets_batch(client, monkeypatch) -> None:
+    async def restore_wallets(sess, *, symbol, items):
+        assert symbol == "BTC"
+        assert items == [("seed", "00"), ("mnemonic", "a b c")]
+        yield {"index": 0, "error": "Wallet does not exist."}
+        yield {"index": 1, "error": "Wallet does not exist."}
+
+    monkeypatch.setattr(views, "restore_wallets", restore_wallets)
+    response = client.post(
+        "/api/v1/wallets/restore/batch",
+        json={
+            "currency": "BTC",
+            "items": [{"seed": "00"}, {"mnemonic": "a b c"}],
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1]
+
+
+@pytest.mark.parametrize(
+    "items", [[], [{}], [{"seed": "00", "mnemonic": "a b c"}]]
+)
+def test_restore_wallets_batch__invalid(client, items) -> None:
+    response = client.post(
+        "/api/v1/wallets/restore/batch",
+        json={"currency": "BTC", "items": items},
+    )
+    assert response.status_code == 422
+
+
+def test_restore_wallet_from_mnemonic__invalid(
+    client, app_session_mock
+) -> None:
+    response = client.get(
+        "/api/v1/wallets/restore-from-mnemonic/",
+        params={"mnemonic": "a b c", "currency": "BTC"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid mnemonic phrase"
+    app_session_mock.execute.assert_not_called()
+
+
+def test_export_wallets__ndjson(client, app_session_mock) -> None:
+    app_session_mock.stream.return_value = aiter_rows(make_rows(3))
+
+    response = client.get("/api/v1/wallets/export", params={"currency": "BTC"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert len(response.text.splitlines()) == 3
+    stmt = str(app_session_mock.stream.call_args.args[0])
+    assert "WHERE wallets.currency" in stmt
+
+
+def test_export_wallets__csv(client, app_session_mock) -> None:
+    app_session_mock.stream.return_value = aiter_rows(make_rows(3))
+
+    response = client.get("/api/v1/wallets/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert len(response.text.splitlines()) == 4
+
+
+def test_get_wallet_addresses(client, app_session_mock) -> None:
+    wallet_data = derive_from_entropy("BTC", strength=128, language="english")
+    result_mock = MagicMock()
+    result_mock.first.return_value = (
+        "BTC",
+        wallet_data["account_xpublic_keys"],
+    )
+    app_session_mock.execute.return_value = result_mock
+
+    response = client.get(
+        "/api/v1/wallets/1001/addresses",
+        params={"from": 10, "count": 3, "change": 1},
+    )
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["path"] for line in lines] == [
+        "m/44'/0'/0'/1/10",
+        "m/44'/0'/0'/1/11",
+        "m/44'/0'/0'/1/12",
+    ]
+
+
+def test_get_wallet_addresses__not_derivable(client, app_session_mock) -> None:
+    result_mock = MagicMock()
+    result_mock.first.return_value = ("BTC", None)
+    app_session_mock.execute.return_value = result_mock
+
+    response = client.get("/api/v1/wallets/1002/addresses")
+    assert response.status_code == 404
+
+
+@pytest.fixture(scope="module")
+def derived_wallet() -> dict:
+    return derive_from_entropy("ETH", strength=128, language="english")
+
+
+@pytest.mark.parametrize(
+    "method, url",
+    [
+        ("GET", "/api/v1/wallets?limit=2"),
+        ("GET", "/api/v1/wallets/1"),
+        ("GET", "/api/v1/wallets/by-address/address-1"),
+        ("POST", "/api/v1/wallets"),
+        ("GET", "/api/v1/wallets/restore-from-seed/?seed=00&currency=ETH"),
+        (
+            "GET",
+            "/api/v1/wallets/restore-from-mnemonic/?mnemonic=a&currency=ETH",
+        ),
+    ],
+)
+def test_fast_json_responses_are_identical(
+    method: str,
+    url: str,
+    derived_wallet: dict,
+    client,
+    app_session_mock,
+    monkeypatch,
+) -> None:
+    wallets = make_wallets(3)
+    wallets[0].updated_at = datetime.datetime(2023, 4, 21, 0, 0, 0, 5)
+    wallets[1].currency = "ЕТН"
+    mock_wallets(app_session_mock, wallets)
+    app_session_mock.execute.return_value.scalar.return_value = wallets[0]
+    app_session_mock.execute.return_value.first.return_value = (
+        wallets[0],
+        "p2wpkh",
+    )
+
+    async def derive(*args, **kwargs) -> dict:
+        return derived_wallet
+
+    for name in (
+        "generate_wallet",
+        "restore_from_seed",
+        "restore_from_mnemonic",
+    ):
+        monkeypatch.setattr(views, name, derive)
+
+    json_body = {"currency": "ETH"} if method == "POST" else None
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", False)
+    expected = client.request(method, url, json=json_body)
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+    response = client.request(method, url, json=json_body)
+
+    assert expected.status_code < 300
+    assert response.status_code == expected.status_code
+    assert response.headers["content-type"] == expected.headers["content-type"]
+    assert response.content == expected.content
+
+
+def make_job_response(**kwargs) -> dict:
+    return {
+        "id": 7,
+        "currency": "BTC",
+        "count": 250,
+        "status": "queued",
+        "stored": 0,
+        "failed": 0,
+        "pending": 250,
+        "created_at": datetime.datetime(2026, 10, 18, 12, 0, 0),
+        "cancelled_at": None,
+        **kwargs,
+    }
+
+
+def test_create_wallet_job(client, monkeypatch) -> None:
+    async def create_job(sess, *, symbol, count):
+        assert (symbol, count) == ("BTC", 250)
+        return make_job_response(token="token")
+
+    monkeypatch.setattr(views, "create_job", create_job)
+    response = client.post(
+        "/api/v1/wallets/jobs", json={"currency": "BTC", "count": 250}
+    )
+
+    assert response.status_code == 202
+    assert response.json()["token"] == "token"
+    assert response.json()["status"] == "queued"
+
+
+def test_create_wallet_job__too_many_wallets(client) -> None:
+    response = client.post(
+        "/api/v1/wallets/jobs",
+        json={"currency": "BTC", "count": settings.MAX_WALLETS_PER_JOB + 1},
+    )
+    assert response.status_code == 422
+
+
+def test_get_wallet_job__not_found(client, app_session_mock) -> None:
+    app_session_mock.get.return_value = None
+
+    response = client.get("/api/v1/wallets/jobs/7")
+    assert response.status_code == 404
+
+
+def test_get_wallet_job_wallets(client, monkeypatch) -> None:
+    async def check_job_token(sess, *, job_id, token):
+        if token != "token":
+            raise views.WalletJobDoesNotExist
+
+    async def stream_job_wallets(sess, *, job_id):
+        yield b'{"index":0,"id":1,"wallet":null,"error":null}\n'
+
+    monkeypatch.setattr(views, "check_job_token", check_job_token)
+    monkeypatch.setattr(views, "stream_job_wallets", stream_job_wallets)
+    url = "/api/v1/wallets/jobs/7/wallets"
+
+    response = client.get(url, headers={"X-Job-Token": "token"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert json.loads(response.text)["id"] == 1
+    response = client.get(url, headers={"X-Job-Token": "other"})
+    assert response.status_code == 404
+    response = client.get(url)
+    assert response.status_code == 422
@@ -0,0 +1,194 @@
+import asyncio
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from zeply_python_challenge.wallets import service
+from zeply_python_challenge.wallets.writer import WalletWriter
+
+
+class FakeDatabase:
+    """Keeps inserted wallet rows, fails the first `failures` inserts."""
+
+    def __init__(self, failures: int = 0) -> None:
+        self.rows: list[dict] = []
+        self.inserts = 0
+        self.failures = failures
+
+    def session(self) -> "FakeSession":
+        return FakeSession(self)
+
+
+class FakeSession:
+    def __init__(self, db: FakeDatabase) -> None:
+        self.db = db
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def execute(self, stmt):
+        if self.db.failures:
+            self.db.failures -= 1
+            raise ConnectionError("database is gone")
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        seeds = [v for k, v in params.items() if k.startswith("seed_m")]
+        self.db.inserts += 1
+        result = []
+        for seed in seeds:
+            self.db.rows.append({"seed": seed})
+            result.append((len(self.db.rows), seed))
+        res = MagicMock()
+        res.all.return_value = result
+        return res
+
+    async def scalars(self, stmt):
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        stored = {row["seed"] for row in self.db.rows}
+        res = MagicMock()
+        res.all.return_value = [
+            seed for seed in params["seed_1"] if seed in stored
+        ]
+        return res
+
+    async def commit(self) -> None:
+        pass
+
+
+def make_row(i: int) -> dict:
+    return dict(
+        addresses={},
+        currency="BTC",
+        mnemonic=f"mnemonic-{i}",
+        seed=f"seed-{i}",
+        account_xpublic_keys=None,
+    )
+
+
+def make_writer(db: FakeDatabase, **kwargs) -> WalletWriter:
+    options = dict(batch_size=3, flush_interval=0.01, ack="flush")
+    options.update(kwargs)
+    writer = WalletWriter(
+        max_pending=100, session_factory=db.session, **options
+    )
+    writer.retry_delay = 0
+    return writer
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_full_batches() -> None:
+    db = FakeDatabase()
+    writer = make_writer(db)
+    writer.start()
+
+    ids = await asyncio.gather(*(writer.write(make_row(i)) for i in range(7)))
+    await writer.stop()
+
+    assert sorted(ids) == list(range(1, 8))
+    assert [row["seed"] for row in db.rows] == [f"seed-{i}" for i in range(7)]
+    # two full batches and what was left when the interval passed
+    assert db.inserts == 3
+    assert writer.stats()["flushed"] == 7
+
+
+@pytest.mark.asyncio
+async def test_writer_acknowledged_on_enqueue_drains_on_stop(
+    tmp_path,
+) -> None:
+    db = FakeDatabase()
+    writer = make_writer(
+        db,
+        ack="enqueue",
+        batch_size=100,
+        flush_interval=60,
+        journal_dir=tmp_path,
+    )
+    writer.start()
+
+    assert await writer.write(make_row(0)) is None
+    assert db.rows == []
+    # stop flushes right away instead of waiting out the interval
+    await asyncio.wait_for(writer.stop(), 1)
+
+    assert len(db.rows) == 1
+    assert list(tmp_path.iterdir()) == []
+    with pytest.raises(RuntimeError):
+        await writer.write(make_row(1))
+
+
+@pytest.mark.asyncio
+async def test_writer_retries_failed_flush() -> None:
+    db = FakeDatabase(failures=2)
+    writer = make_writer(db, batch_size=1, max_retries=2)
+    writer.start()
+
+    assert await writer.write(make_row(0)) == 1
+    await writer.stop()
+    assert writer.retries == 2
+
+
+@pytest.mark.asyncio
+async def test_writer_recovers_journaled_rows(tmp_path) -> None:
+    db = FakeDatabase(failures=1)
+    writer = make_writer(db, batch_size=2, max_retries=0, journal_dir=tmp_path)
+    writer.start()
+
+    with pytest.raises(ConnectionError):
+        await writer.write(make_row(0))
+    assert [await writer.write(make_row(i)) for i in (1, 2)] == [1, 2]
+    await writer.stop()
+    # the first segment holds a row which failed to flush
+    assert len(list(tmp_path.iterdir())) == 1
+
+    recovering = make_writer(db, journal_dir=tmp_path)
+    assert await recovering.recover() == 1
+    assert sorted(row["seed"] for row in db.rows) == [
+        "seed-0",
+        "seed-1",
+        "seed-2",
+    ]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_writer_refuses_enqueue_ack_without_journal() -> None:
+    with pytest.raises(ValueError):
+        make_writer(FakeDatabase(), ack="enqueue")
+
+
+@pytest.mark.asyncio
+async def test_writer_survives_unexpected_flush_errors(monkeypatch) -> None:
+    db = FakeDatabase()
+    writer = make_writer(db, batch_size=1)
+
+    async def insert(rows):
+        return {}
+
+    monkeypatch.setattr(writer, "_insert", insert)
+    writer.start()
+
+    with pytest.raises(KeyError):
+        await asyncio.wait_for(writer.write(make_row(0)), 1)
+    monkeypatch.undo()
+    assert await asyncio.wait_for(writer.write(make_row(1)), 1) == 1
+    await asyncio.wait_for(writer.stop(), 1)
+
+
+@pytest.mark.asyncio
+async def test_generate_wallet_with_write_behind(monkeypatch) -> None:
+    db = FakeDatabase()
+    writer = make_writer(db, batch_size=1)
+    writer.start()
+    monkeypatch.setattr(service, "get_wallet_writer", lambda: writer)
+    sess = AsyncMock(spec=AsyncSession)
+
+    wallet = await service.generate_wallet(sess, symbol="BTC")
+    await writer.stop()
+
+    seed_index = service.make_blind_index(value=wallet["seed"])
+    assert db.rows == [{"seed": seed_index}]
+    sess.commit.assert_not_awaited()
@@ -0,0 +1,204 @@
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Callable
+from typing import Protocol
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.routing import compile_path
+from starlette.types import ASGIApp
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from zeply_python_challenge.config import settings
+
+
+class RateLimitBackend(Protocol):
+    """Storage of the token buckets of the clients.
+
+    Any shared store, e.g. redis with a script refilling and taking tokens
+    atomically, can be plugged in by implementing this interface, so that
+    clients are limited across all the app processes.
+    """
+
+    def take(  # noqa: D102
+        self, key: str, cost: float, *, rate: float, burst: float
+    ) -> float:
+        ...
+
+
+class InMemoryTokenBuckets:
+    """Process local token buckets, the least recently used are dropped.
+
+    A dropped bucket starts over full, which only errs on the side of
+    admitting a client idle for long.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_clients: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_clients = max_clients
+        self._clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(
+        self, key: str, cost: float, *, rate: float, burst: float
+    ) -> float:
+        """Take cost tokens of the bucket refilled by rate per second.
+
+        Returns: 0 when the tokens were taken, otherwise the seconds until
+        the bucket holds enough of them
+        """
+        now = self._clock()
+        tokens, updated_at = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionController:
+    """Admit requests by their cost and the derivation work in progress.
+
+    Every request takes its route cost from the token bucket of its
+    client. Requests of the routes with a listed cost derive wallets and
+    also take one of max_derivations slots while they are being served.
+    """
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        *,
+        rate: float,
+        burst: float,
+        route_costs: dict[str, float],
+        default_cost: float,
+        max_derivations: int,
+        prefix: str = "",
+    ) -> None:
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.default_cost = default_cost
+        self.max_derivations = max_derivations
+        if max([default_cost, *route_costs.values()]) > burst:
+            raise ValueError("Request costs can not exceed the burst")
+        self._routes: list[tuple[str, re.Pattern[str], float]] = []
+        for route, cost in route_costs.items():
+            method, path = route.split(" ", 1)
+            regex, _, _ = compile_path(prefix + path)
+            self._routes.append((method.upper(), regex, cost))
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_busy = 0
+
+    def route_cost(self, method: str, path: str) -> tuple[float, bool]:
+        """Return the cost of the request and whether it derives wallets."""
+        for route_method, regex, cost in self._routes:
+            if route_method == method and regex.match(path):
+                return cost, True
+        return self.default_cost, False
+
+    def stats(self) -> dict[str, Any]:
+        """Return admission counters and the derivations in progress."""
+        return {
+            "in_flight": self.in_flight,
+            "max_derivations": self.max_derivations,
+            "admitted": self.admitted,
+            "rejected_rate": self.rejected_rate,
+            "rejected_busy": self.rejected_busy,
+        }
+
+
+_admission_controller: AdmissionController | None = None
+
+
+def get_admission_controller() -> AdmissionController | None:
+    """Return the process-wide admission controller, None if disabled."""
+    global _admission_controller
+    if settings.ADMISSION_CONTROL_ENABLED and _admission_controller is None:
+        _admission_controller = AdmissionController(
+            InMemoryTokenBuckets(max_clients=settings.ADMISSION_MAX_CLIENTS),
+            rate=settings.ADMISSION_RATE,
+            burst=settings.ADMISSION_BURST,
+            route_costs=settings.ADMISSION_ROUTE_COSTS,
+            default_cost=settings.ADMISSION_DEFAULT_COST,
+            max_derivations=settings.ADMISSION_MAX_DERIVATIONS,
+            prefix=settings.API_V1_STR,
+        )
+    return _admission_controller
+
+
+class AdmissionMiddleware:
+    """Reject requests over their client's rate or the derivation cap.
+
+    Rejected requests get a 429 with Retry-After before the body is read,
+    the route resolved or a database session opened. Clients are told
+    apart by their address, run uvicorn with --proxy-headers behind a
+    proxy.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        controller = get_admission_controller()
+        if scope["type"] != "http" or controller is None:
+            await self.app(scope, receive, send)
+            return
+
+        cost, derives = controller.route_cost(scope["method"], scope["path"])
+        if derives and controller.in_flight >= controller.max_derivations:
+            controller.rejected_busy += 1
+            await _reject("Too many wallets are being derived", 1)(
+                scope, receive, send
+            )
+            return
+        client = scope.get("client")
+        wait = controller.backend.take(
+            client[0] if client else "",
+            cost,
+            rate=controller.rate,
+            burst=controller.burst,
+        )
+        if wait:
+            controller.rejected_rate += 1
+            await _reject("Too many requests", wait)(scope, receive, send)
+            return
+
+        controller.admitted += 1
+        if not derives:
+            await self.app(scope, receive, send)
+            return
+        controller.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.in_flight -= 1
+
+
+def _reject(detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": f"{detail}, try again later"},
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
@@ -1,3 +1,8 @@
+import asyncio
+import itertools
+import logging
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
 from typing import Any
 from typing import AsyncIterator
 from typing import Iterator
@@ -7,15 +12,32 @@ from sqlalchemy import DateTime
 from sqlalchemy import Integer
 from sqlalchemy import create_engine
 from sqlalchemy import func
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import as_declarative
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import Select
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
 
 from zeply_python_challenge.config import settings
 
+logger = logging.getLogger(__name__)
+
+# set for requests of clients which wrote something recently, sends all
+# their statements to the primary
+_use_primary: ContextVar[bool] = ContextVar("use_primary", default=False)
+
+READ_PRIMARY_COOKIE = "read_primary"
+
 
 @as_declarative()
 class Base:  # noqa: D101
@@ -36,48 +58,297 @@ class TimeTrackMixin:
     )
 
 
+class ReplicaSet:
+    """Read-only replica engines, picked round-robin.
+
+    Replicas which failed the last health check are skipped until they
+    pass one again, see ``check``.
+    """
+
+    def __init__(self, engines: list[AsyncEngine]) -> None:
+        self.engines = engines
+        self.healthy = [True] * len(engines)
+        self._next = itertools.count()
+        self.reads = [0] * len(engines)
+        self.failed_checks = 0
+
+    def choose(self) -> AsyncEngine | None:
+        """Return the next healthy replica, None when there is none."""
+        for _ in range(len(self.engines)):
+            i = next(self._next) % len(self.engines)
+            if self.healthy[i]:
+                self.reads[i] += 1
+                return self.engines[i]
+        return None
+
+    async def check(self) -> None:
+        """Mark replicas healthy or not by whether they run a query."""
+        for i, engine in enumerate(self.engines):
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            except Exception:
+                self.failed_checks += 1
+                if self.healthy[i]:
+                    logger.exception("Replica %d is unhealthy", i)
+                self.healthy[i] = False
+            else:
+                if not self.healthy[i]:
+                    logger.warning("Replica %d is healthy again", i)
+                self.healthy[i] = True
+
+    async def run_checks(self, interval: float) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict[str, Any]:
+        """Return replica metrics."""
+        return {
+            "healthy": {str(i): int(h) for i, h in enumerate(self.healthy)},
+            "reads": {str(i): reads for i, reads in enumerate(self.reads)},
+            "failed_checks": self.failed_checks,
+        }
+
+
+class RoutingSession(Session):
+    """Session sending plain SELECTs to replicas, anything else to primary.
+
+    Flushes, other statements and SELECT ... FOR UPDATE go to the
+    primary, as well as all statements of sessions created with
+    ``info={"primary": True}`` and of clients which wrote recently, see
+    ReadYourWritesMiddleware.
+    """
+
+    def get_bind(
+        self, mapper: Any = None, clause: Any = None, **kw: Any
+    ) -> Any:
+        replicas = get_replica_set()
+        if (
+            replicas is not None
+            and not self._flushing
+            and not self.info.get("primary")
+            and not _use_primary.get()
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+        ):
+            replica = replicas.choose()
+            if replica is not None:
+                return replica.sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+_sync_engine: Engine | None = None
+_async_engine: AsyncEngine | None = None
+_sync_session_factory: sessionmaker[Any] | None = None
+_async_session_factory: sessionmaker[Any] | None = None
+_primary_session_factory: sessionmaker[Any] | None = None
+_replicas: ReplicaSet | None = None
+_replica_checks: asyncio.Task[None] | None = None
+
+
+def _engine_options() -> dict[str, Any]:
+    """Return connection pool options shared by sync and async engines."""
+    return dict(
+        echo=settings.SQLALCHEMY_ECHO,
+        pool_pre_ping=settings.SQLALCHEMY_POOL_PRE_PING,
+        pool_size=settings.SQLALCHEMY_POOL_SIZE,
+        max_overflow=settings.SQLALCHEMY_MAX_OVERFLOW,
+        pool_timeout=settings.SQLALCHEMY_POOL_TIMEOUT,
+        pool_recycle=settings.SQLALCHEMY_POOL_RECYCLE,
+    )
+
+
 def get_sync_engine() -> Any:
-    """Return sync engine."""
+    """Return process-wide sync engine, create it on the first call."""
+    global _sync_engine
+    if _sync_engine is not None:
+        return _sync_engine
     try:
         uri = getattr(settings, "SQLALCHEMY_DATABASE_URI")  # noqa: B009
     except AttributeError:
         raise AttributeError(
             "Please set the SQLALCHEMY_DATABASE_URI in app settings"
         )
-    return create_engine(
-        uri, echo=settings.SQLALCHEMY_ECHO, pool_pre_ping=True
+    _sync_engine = create_engine(uri, **_engine_options())
+    return _sync_engine
+
+
+def _create_async_engine(uri: str) -> AsyncEngine:
+    return create_async_engine(
+        uri,
+        connect_args={
+            "prepared_statement_cache_size": (
+                settings.SQLALCHEMY_STATEMENT_CACHE_SIZE
+            )
+        },
+        **_engine_options(),
     )
 
 
 def get_async_engine() -> Any:
-    """Return async engine."""
+    """Return process-wide async engine, create it on the first call."""
+    global _async_engine
+    if _async_engine is not None:
+        return _async_engine
     try:
         uri = getattr(settings, "SQLALCHEMY_ASYNC_DATABASE_URI")  # noqa: B009
     except AttributeError:
         raise AttributeError(
             "Please set the SQLALCHEMY_ASYNC_DATABASE_URI in app settings"
         )
-    return create_async_engine(
-        uri, echo=settings.SQLALCHEMY_ECHO, pool_pre_ping=True
-    )
+    _async_engine = _create_async_engine(uri)
+    return _async_engine
+
+
+def get_replica_set() -> ReplicaSet | None:
+    """Return process-wide replica engines, None without replicas."""
+    global _replicas
+    if _replicas is None and settings.SQLALCHEMY_REPLICA_URIS:
+        _replicas = ReplicaSet(
+            [
+                _create_async_engine(uri)
+                for uri in settings.SQLALCHEMY_REPLICA_URIS
+            ]
+        )
+    return _replicas
 
 
 def async_session_factory() -> Any:
     """Return asynchronous sqlalchemy session factory."""
-    return sessionmaker(
-        bind=get_async_engine(),
-        class_=AsyncSession,
-        autocommit=False,
-        autoflush=False,
-        expire_on_commit=False,
-    )
+    global _async_session_factory
+    if _async_session_factory is None:
+        _async_session_factory = sessionmaker(
+            bind=get_async_engine(),
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return _async_session_factory
+
+
+def primary_session_factory() -> Any:
+    """Return asynchronous session factory never reading from replicas."""
+    global _primary_session_factory
+    if _primary_session_factory is None:
+        _primary_session_factory = sessionmaker(
+            bind=get_async_engine(),
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False,
+            info={"primary": True},
+        )
+    return _primary_session_factory
 
 
 def sync_session_factory() -> Any:
     """Return synchronous sqlalchemy session factory."""
-    return sessionmaker(
-        bind=get_sync_engine(), autocommit=False, autoflush=False
-    )
+    global _sync_session_factory
+    if _sync_session_factory is None:
+        _sync_session_factory = sessionmaker(
+            bind=get_sync_engine(), autocommit=False, autoflush=False
+        )
+    return _sync_session_factory
+
+
+def init_engines() -> None:
+    """Build the async engine and its session factory.
+
+    Meant to be called once on application startup, so the first request
+    does not pay for the engine creation. The sync engine is still created
+    lazily since the web app itself does not use it.
+    """
+    async_session_factory()
+    get_replica_set()
+
+
+def start_replica_health_checks() -> None:
+    """Check the replicas health in the background, if there are any."""
+    global _replica_checks
+    replicas = get_replica_set()
+    if replicas is not None and _replica_checks is None:
+        _replica_checks = asyncio.create_task(
+            replicas.run_checks(
+                settings.SQLALCHEMY_REPLICA_HEALTH_CHECK_INTERVAL
+            )
+        )
+
+
+async def dispose_engines() -> None:
+    """Close all pooled connections and forget the process-wide engines."""
+    global _sync_engine, _async_engine, _replicas, _replica_checks
+    global _sync_session_factory, _async_session_factory
+    global _primary_session_factory
+    if _replica_checks is not None:
+        _replica_checks.cancel()
+        try:
+            await _replica_checks
+        except asyncio.CancelledError:
+            pass
+    if _replicas is not None:
+        for engine in _replicas.engines:
+            await engine.dispose()
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _sync_engine is not None:
+        _sync_engine.dispose()
+    _sync_engine = _async_engine = None
+    _replicas = _replica_checks = None
+    _sync_session_factory = _async_session_factory = None
+    _primary_session_factory = None
+
+
+class ReadYourWritesMiddleware:
+    """Send reads of clients which wrote something recently to the primary.
+
+    Successful requests with other methods than GET, HEAD and OPTIONS set
+    a cookie living READ_YOUR_WRITES_SECONDS, all statements of requests
+    carrying it go to the primary, so clients see what they just created
+    regardless of the replication lag.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cookie: SimpleCookie[str] = SimpleCookie()
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookie.load(value.decode("latin-1"))
+        token = _use_primary.set(READ_PRIMARY_COOKIE in cookie)
+        writes = scope["method"] not in ("GET", "HEAD", "OPTIONS")
+
+        async def send_with_cookie(message: Message) -> None:
+            if (
+                writes
+                and message["type"] == "http.response.start"
+                and message["status"] < 400
+            ):
+                value = (
+                    f"{READ_PRIMARY_COOKIE}=1; "
+                    f"Max-Age={settings.READ_YOUR_WRITES_SECONDS}; "
+                    f"Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", value.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _use_primary.reset(token)
 
 
 async def create_async_session() -> AsyncIterator[AsyncSession]:
@@ -0,0 +1,291 @@
+import asyncio
+import contextlib
+import functools
+import time
+from contextvars import ContextVar
+from typing import Any
+from typing import Callable
+from typing import Coroutine
+from typing import Iterator
+
+from fastapi import Request
+from fastapi import Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from zeply_python_challenge.config import settings
+
+# seconds spent in every phase of the current request, None outside of an
+# instrumented request, which makes spans no-ops
+_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "timings", default=None
+)
+
+_NULL_SPAN = contextlib.nullcontext()
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """A labelled histogram rendered in the Prometheus text format.
+
+    Observations come from the event loop thread only, so no locking is
+    needed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: tuple[str, ...],
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # label values -> (bucket counts, sum, count)
+        self._series: dict[tuple[str, ...], list[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            pairs = [
+                f'{name}="{value}"'
+                for name, value in zip(self.labelnames, labels)
+            ]
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = ",".join([*pairs, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{le}}} {bucket_count}")
+            le = ",".join([*pairs, 'le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{le}}} {count}")
+            selector = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}_sum{selector} {total}")
+            lines.append(f"{self.name}_count{selector} {count}")
+        return lines
+
+    def clear(self) -> None:
+        self._series.clear()
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to the first byte of the response.",
+    ("method", "route", "status"),
+)
+PHASE_DURATION = Histogram(
+    "wallets_phase_duration_seconds",
+    "Time spent in a phase of a request, summed per request.",
+    ("phase",),
+)
+
+
+def record(name: str, seconds: float) -> None:
+    """Add seconds to the phase of the current request, if instrumented."""
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextlib.contextmanager
+def _span(name: str, timings: dict[str, float]) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def span(name: str) -> contextlib.AbstractContextManager[None]:
+    """Time the block as the phase of the current request.
+
+    Outside of an instrumented request a shared no-op context manager is
+    returned, so spans cost a context variable lookup when disabled.
+    """
+    timings = _timings.get()
+    if timings is None:
+        return _NULL_SPAN
+    return _span(name, timings)
+
+
+def _before_cursor_execute(conn: Any, *args: Any) -> None:
+    if _timings.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Any, *args: Any) -> None:
+    started = conn.info.get("query_started")
+    if started:
+        record("db", time.perf_counter() - started.pop())
+
+
+def instrument_engine(engine: Any) -> None:
+    """Record statements executed on the engine as the "db" phase."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(
+        sync_engine, "before_cursor_execute", _before_cursor_execute
+    ):
+        event.listen(
+            sync_engine, "before_cursor_execute", _before_cursor_execute
+        )
+        event.listen(
+            sync_engine, "after_cursor_execute", _after_cursor_execute
+        )
+
+
+class InstrumentedRoute(APIRoute):
+    """Route recording the time spent after its endpoint has returned.
+
+    That is response model validation and rendering of the response,
+    recorded as the "serialization" phase. Routes are wrapped only with
+    INSTRUMENTATION_ENABLED, checked when the app includes them, like
+    TimingMiddleware is added, otherwise they are plain APIRoutes.
+    """
+
+    def get_route_handler(
+        self,
+    ) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        call = self.dependant.call
+        if not settings.INSTRUMENTATION_ENABLED:
+            return super().get_route_handler()
+        if not asyncio.iscoroutinefunction(call):
+            return super().get_route_handler()
+
+        @functools.wraps(call)
+        async def endpoint(*args: Any, **kwargs: Any) -> Any:
+            result = await call(*args, **kwargs)  # type: ignore
+            timings = _timings.get()
+            if timings is not None:
+                timings["_endpoint_returned"] = time.perf_counter()
+            return result
+
+        self.dependant.call = endpoint
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            response = await handler(request)
+            timings = _timings.get()
+            if timings is not None and "_endpoint_returned" in timings:
+                returned = timings.pop("_endpoint_returned")
+                record("serialization", time.perf_counter() - returned)
+            return response
+
+        return route_handler
+
+
+def server_timing(timings: dict[str, float], total: float) -> str:
+    """Return the Server-Timing header value, durations in milliseconds."""
+    metrics = [
+        f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items()
+    ]
+    metrics.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(metrics)
+
+
+class TimingMiddleware:
+    """Collect phase timings of every request.
+
+    Phase timings are added to the response as the Server-Timing header
+    and, along with the request duration, to the histograms exposed by
+    render_metrics. Phases of streamed responses which run after the
+    headers were sent are not accounted.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: dict[str, float] = {}
+        token = _timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - started
+                timings.pop("_endpoint_returned", None)
+                header = server_timing(timings, total).encode()
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", header),
+                ]
+                route = scope.get("route")
+                REQUEST_DURATION.observe(
+                    total,
+                    scope["method"],
+                    getattr(route, "path", "unmatched"),
+                    str(message["status"]),
+                )
+                for name, seconds in timings.items():
+                    PHASE_DURATION.observe(seconds, name)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+
+
+def render_metrics(stats: dict[str, dict[str, Any]]) -> str:
+    """Return histograms and component stats in the Prometheus format.
+
+    Every numeric value of the stats becomes a gauge named after its
+    component and key, values of nested dicts get labelled by their key.
+    """
+    lines = [*REQUEST_DURATION.render(), *PHASE_DURATION.render()]
+    for component, values in stats.items():
+        for key, value in values.items():
+            name = f"wallets_{component}_{key}"
+            if isinstance(value, dict):
+                samples = [
+                    f'{name}{{key="{label}"}} {sample}'
+                    for label, sample in value.items()
+                ]
+            elif isinstance(value, (int, float)) and not isinstance(
+                value, bool
+            ):
+                samples = [f"{name} {value}"]
+            else:
+                continue
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+    return "\n".join(lines) + "\n"
@@ -1,10 +1,90 @@
+from contextlib import asynccontextmanager
 from typing import Any
+from typing import AsyncIterator
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from starlette.middleware.cors import CORSMiddleware
 
+from zeply_python_challenge.admission import AdmissionMiddleware
+from zeply_python_challenge.admission import get_admission_controller
 from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import ReadYourWritesMiddleware
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.database import get_async_engine
+from zeply_python_challenge.database import get_replica_set
+from zeply_python_challenge.database import init_engines
+from zeply_python_challenge.database import start_replica_health_checks
+from zeply_python_challenge.instrumentation import TimingMiddleware
+from zeply_python_challenge.instrumentation import instrument_engine
+from zeply_python_challenge.instrumentation import render_metrics
+from zeply_python_challenge.wallets.cache import get_restore_cache
+from zeply_python_challenge.wallets.cache import get_wallet_cache
+from zeply_python_challenge.wallets.executor import get_derivation_executor
+from zeply_python_challenge.wallets.executor import \
+    shutdown_derivation_executor
+from zeply_python_challenge.wallets.partitions import \
+    start_partition_maintenance
+from zeply_python_challenge.wallets.partitions import \
+    stop_partition_maintenance
+from zeply_python_challenge.wallets.pool import get_wallet_pool
+from zeply_python_challenge.wallets.pool import start_wallet_pool
+from zeply_python_challenge.wallets.pool import stop_wallet_pool
+from zeply_python_challenge.wallets.utils import warm_up
 from zeply_python_challenge.wallets.views import wallets_router
+from zeply_python_challenge.wallets.writer import get_wallet_writer
+from zeply_python_challenge.wallets.writer import start_wallet_writer
+from zeply_python_challenge.wallets.writer import stop_wallet_writer
+
+
+def collect_stats() -> dict[str, dict[str, Any]]:
+    """Return stats of the process-wide wallet components."""
+    stats = {"derivation_executor": get_derivation_executor().stats()}
+    pool = get_wallet_pool()
+    if pool is not None:
+        stats["wallet_pool"] = pool.stats()
+    cache = get_restore_cache()
+    if cache is not None:
+        stats["restore_cache"] = cache.stats()
+    wallet_cache = get_wallet_cache()
+    if wallet_cache is not None:
+        stats["wallet_cache"] = wallet_cache.stats()
+    writer = get_wallet_writer()
+    if writer is not None:
+        stats["wallet_writer"] = writer.stats()
+    replicas = get_replica_set()
+    if replicas is not None:
+        stats["replicas"] = replicas.stats()
+    admission = get_admission_controller()
+    if admission is not None:
+        stats["admission"] = admission.stats()
+    return stats
+
+
+@asynccontextmanager
+async def lifespan(app_: FastAPI) -> AsyncIterator[None]:
+    """Set up process-wide resources on startup and release them on exit."""
+    warm_up()
+    get_restore_cache()
+    init_engines()
+    start_replica_health_checks()
+    if settings.INSTRUMENTATION_ENABLED:
+        instrument_engine(get_async_engine())
+        replicas = get_replica_set()
+        for engine in replicas.engines if replicas is not None else ():
+            instrument_engine(engine)
+    get_derivation_executor()
+    start_wallet_pool()
+    await start_wallet_writer()
+    start_partition_maintenance()
+    try:
+        yield
+    finally:
+        await stop_partition_maintenance()
+        await stop_wallet_pool()
+        await stop_wallet_writer()
+        shutdown_derivation_executor()
+        await dispose_engines()
 
 
 def create_app() -> FastAPI:
@@ -22,8 +102,16 @@ def create_app() -> FastAPI:
         title=settings.PROJECT_NAME,
         docs_url=f"{settings.API_V1_STR}/docs",
         openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        lifespan=lifespan,
     )
 
+    # rejects costly requests before anything else runs. Middlewares added
+    # afterwards wrap it: CORS answers preflight requests without charging
+    # them and adds its headers to the rejections, the timing middleware
+    # still records them
+    if settings.ADMISSION_CONTROL_ENABLED:
+        app_.add_middleware(AdmissionMiddleware)
+
     # Set all CORS enabled origins
     if settings.BACKEND_CORS_ORIGINS:
         app_.add_middleware(
@@ -36,6 +124,20 @@ def create_app() -> FastAPI:
             allow_headers=["*"],
         )
 
+    if settings.SQLALCHEMY_REPLICA_URIS:
+        app_.add_middleware(ReadYourWritesMiddleware)
+
+    if settings.INSTRUMENTATION_ENABLED:
+        app_.add_middleware(TimingMiddleware)
+
+        @app_.router.get("/metrics", include_in_schema=False)
+        async def metrics() -> Any:
+            """Return metrics in the Prometheus text format."""
+            return PlainTextResponse(
+                render_metrics(collect_stats()),
+                media_type="text/plain; version=0.0.4",
+            )
+
     # blueprints
     app_.include_router(wallets_router, prefix=settings.API_V1_STR)
 
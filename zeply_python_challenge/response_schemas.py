@@ -26,3 +26,9 @@ class ErrorResponseSchemas:
             "description": "(Not Found) The requested resource was not found",
         },
     }
+    SERVICE_UNAVAILABLE: dict[int | str, dict[str, Any]] = {
+        status.HTTP_503_SERVICE_UNAVAILABLE: {
+            "model": Message,
+            "description": "(Service Unavailable) The server is overloaded",
+        },
+    }
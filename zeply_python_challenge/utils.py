@@ -1,8 +1,53 @@
+import functools
 import hashlib
+import hmac
+from typing import Any
 
 from zeply_python_challenge.config import settings
+from zeply_python_challenge.instrumentation import span
+
+
+@functools.cache
+def _verifier_context() -> Any:
+    # passlib and its argon2 backend are imported on the first use, to
+    # keep them out of the app import, see wallets.utils.warm_up
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=[settings.CRYPT_SCHEMA],
+        argon2__memory_cost=settings.VERIFIER_ARGON2_MEMORY_COST,
+        argon2__rounds=settings.VERIFIER_ARGON2_TIME_COST,
+        argon2__parallelism=1,
+    )
 
 
 def make_hash(*, value: str) -> str:
     """Return hashed value of the given string."""
-    return hashlib.md5(f"{settings.HASH_SALT}{value}".encode()).hexdigest()
+    with span("hashing"):
+        value = f"{settings.HASH_SALT}{value}"
+        return hashlib.md5(value.encode()).hexdigest()
+
+
+def make_blind_index(*, value: str) -> str:
+    """Return keyed hash of the given string to look it up by.
+
+    The HMAC is taken over the legacy salted MD5 hash, so the stored
+    hashes could be turned into blind indexes without knowing the values.
+    """
+    legacy_hash = make_hash(value=value)
+    with span("hashing"):
+        return hmac.new(
+            settings.BLIND_INDEX_KEY.encode(),
+            legacy_hash.encode(),
+            hashlib.sha256,
+        ).hexdigest()
+
+
+def make_verifier(*, value: str) -> str:
+    """Return slow, salted hash of the given string, see verify."""
+    return _verifier_context().hash(value)
+
+
+def verify(*, value: str, verifier: str) -> bool:
+    """Return whether the value matches the verifier, in constant time."""
+    return _verifier_context().verify(value, verifier)
@@ -0,0 +1,235 @@
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Callable
+from typing import Protocol
+
+from zeply_python_challenge.config import settings
+
+
+class CacheBackend(Protocol):
+    """Storage of the cached values.
+
+    Any shared store, e.g. redis, can be plugged in by implementing this
+    interface. Values are opaque bytes, already encrypted.
+    """
+
+    def get(self, key: str) -> bytes | None:  # noqa: D102
+        ...
+
+    def set(self, key: str, value: bytes, *, ttl: float) -> None:  # noqa: D102
+        ...
+
+    def delete(self, key: str) -> None:  # noqa: D102
+        ...
+
+    def clear(self) -> None:  # noqa: D102
+        ...
+
+
+class InMemoryCacheBackend:
+    """Process local LRU cache with a TTL per entry."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        """Return the value, None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes, *, ttl: float) -> None:
+        """Store the value, evicting the least recently used ones."""
+        self._entries[key] = (self._clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """Remove the value if it is cached."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all values."""
+        self._entries.clear()
+
+
+class RestoreCache:
+    """Cache of wallet data derived by the restore calls.
+
+    Entries are looked up by the salted hash of the seed or mnemonic and
+    encrypted with AES-GCM under a key derived from the seed or mnemonic
+    itself, so cached private keys can only be read back by a caller who
+    already knows the secret.
+    """
+
+    def __init__(self, backend: CacheBackend, *, ttl: float) -> None:
+        # pycryptodome is imported with the first cache, created on the
+        # app startup, rather than on the module import
+        from Crypto.Cipher import AES
+
+        self._aes = AES
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _cipher(self, secret: str, nonce: bytes) -> Any:
+        key = hmac.new(
+            settings.SECRET_KEY.encode(),
+            f"restore-cache:{secret}".encode(),
+            hashlib.sha256,
+        ).digest()
+        return self._aes.new(key, self._aes.MODE_GCM, nonce=nonce)
+
+    def get(self, key: str, *, secret: str) -> dict[str, Any] | None:
+        """Return cached wallet data, None on a miss."""
+        value = self.backend.get(key)
+        if value is not None:
+            nonce, tag, ciphertext = value[:12], value[12:28], value[28:]
+            cipher = self._cipher(secret, nonce)
+            try:
+                wallet_data = json.loads(
+                    cipher.decrypt_and_verify(ciphertext, tag)
+                )
+            except ValueError:
+                # encrypted with another secret, i.e. a hash collision
+                wallet_data = None
+            if wallet_data is not None:
+                self.hits += 1
+                return wallet_data
+        self.misses += 1
+        return None
+
+    def set(
+        self, key: str, wallet_data: dict[str, Any], *, secret: str
+    ) -> None:
+        """Encrypt and cache the wallet data."""
+        cipher = self._cipher(secret, secrets.token_bytes(12))
+        ciphertext, tag = cipher.encrypt_and_digest(
+            json.dumps(wallet_data).encode()
+        )
+        self.backend.set(key, cipher.nonce + tag + ciphertext, ttl=self.ttl)
+
+    def invalidate(self, key: str) -> None:
+        """Evict one cached wallet."""
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        """Evict all cached wallets."""
+        self.backend.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache metrics."""
+        stats: dict[str, Any] = {"hits": self.hits, "misses": self.misses}
+        if isinstance(self.backend, InMemoryCacheBackend):
+            stats["entries"] = len(self.backend)
+            stats["evictions"] = self.backend.evictions
+        return stats
+
+
+def make_etag(body: bytes) -> str:
+    """Return strong ETag of the response body."""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class WalletCache:
+    """Cache of fetched wallets, rendered as JSON, by wallet id.
+
+    Wallets only change when they get a seed verifier on their first
+    restore, which invalidates the entry of the restoring process. The
+    TTL bounds how long changes made by other processes go unnoticed.
+    """
+
+    def __init__(self, backend: CacheBackend, *, ttl: float) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, wallet_id: int) -> bytes | None:
+        """Return the rendered wallet, None on a miss."""
+        body = self.backend.get(str(wallet_id))
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def set(self, wallet_id: int, body: bytes) -> None:
+        """Cache the rendered wallet."""
+        self.backend.set(str(wallet_id), body, ttl=self.ttl)
+
+    def invalidate(self, wallet_id: int) -> None:
+        """Evict one cached wallet."""
+        self.backend.delete(str(wallet_id))
+
+    def clear(self) -> None:
+        """Evict all cached wallets."""
+        self.backend.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache metrics."""
+        lookups = self.hits + self.misses
+        stats: dict[str, Any] = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+        if isinstance(self.backend, InMemoryCacheBackend):
+            stats["entries"] = len(self.backend)
+            stats["evictions"] = self.backend.evictions
+        return stats
+
+
+_restore_cache: RestoreCache | None = None
+_wallet_cache: WalletCache | None = None
+
+
+def get_restore_cache() -> RestoreCache | None:
+    """Return the process-wide restore cache, None when it is disabled."""
+    global _restore_cache
+    if settings.RESTORE_CACHE_ENABLED and _restore_cache is None:
+        _restore_cache = RestoreCache(
+            InMemoryCacheBackend(
+                max_entries=settings.RESTORE_CACHE_MAX_ENTRIES
+            ),
+            ttl=settings.RESTORE_CACHE_TTL,
+        )
+    return _restore_cache
+
+
+def get_wallet_cache() -> WalletCache | None:
+    """Return the process-wide wallet cache, None when it is disabled."""
+    global _wallet_cache
+    if settings.WALLET_CACHE_ENABLED and _wallet_cache is None:
+        _wallet_cache = WalletCache(
+            InMemoryCacheBackend(
+                max_entries=settings.WALLET_CACHE_MAX_ENTRIES
+            ),
+            ttl=settings.WALLET_CACHE_TTL,
+        )
+    return _wallet_cache
@@ -1,6 +1,32 @@
 from enum import Enum
 
+from zeply_python_challenge.config import settings
 
-class CurrencyThreeLetterSymbol(str, Enum):
-    BTC = "BTC"
-    ETH = "ETH"
+# members come from the WALLET_CURRENCIES setting, adding a currency
+# supported by hdwallet needs no code changes. Symbols unknown to
+# hdwallet fail the app start, see wallets.utils.warm_up
+CurrencyThreeLetterSymbol = Enum(  # type: ignore[misc]
+    "CurrencyThreeLetterSymbol",
+    {symbol: symbol for symbol in settings.WALLET_CURRENCIES},
+    type=str,
+)
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class WalletJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+
+
+class WalletJobChunkStatus(str, Enum):
+    PENDING = "pending"
+    DONE = "done"
+    # given up after WALLET_JOB_MAX_ATTEMPTS errors
+    FAILED = "failed"
+    CANCELLED = "cancelled"
@@ -0,0 +1,311 @@
+import functools
+import hashlib
+import hmac
+from typing import Callable
+
+# Batch derivation of BIP32 non-hardened child public keys and their
+# addresses. Points are plain (x, y) int tuples and sums are kept in
+# jacobian coordinates, so deriving a child takes a few dozen big int
+# additions against a precomputed table of generator multiples instead
+# of a double-and-add over point objects, and the coordinates of a whole
+# batch are normalized with a single modular inversion. Addresses are
+# encoded from the hashes computed once per key. The output equals the
+# HDWallet one, see tests/wallets/test_derivation.py.
+
+# secp256k1
+P = 2**256 - 2**32 - 977
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+G = (
+    0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+    0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8,
+)
+
+HARDENED_INDEX = 2**31
+
+# bits of the scalar per generator table window
+WINDOW_BITS = 8
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+Point = tuple[int, int]
+# jacobian (X, Y, Z) stands for the affine point (X / Z^2, Y / Z^3)
+JacobianPoint = tuple[int, int, int]
+
+
+def _double(point: JacobianPoint | None) -> JacobianPoint | None:
+    if point is None or point[1] == 0:
+        return None
+    x, y, z = point
+    a = x * x % P
+    b = y * y % P
+    c = b * b % P
+    d = 2 * ((x + b) ** 2 - a - c) % P
+    e = 3 * a % P
+    x3 = (e * e - 2 * d) % P
+    return x3, (e * (d - x3) - 8 * c) % P, 2 * y * z % P
+
+
+def _add_affine(point: JacobianPoint | None, other: Point) -> JacobianPoint:
+    if point is None:
+        return other[0], other[1], 1
+    x, y, z = point
+    zz = z * z % P
+    h = (other[0] * zz - x) % P
+    r = (other[1] * zz * z - y) % P
+    if h == 0:
+        # the same x, the points are equal or opposite
+        return _double(point) if r == 0 else None  # type: ignore[return-value]
+    hh = h * h % P
+    hhh = h * hh % P
+    v = x * hh % P
+    x3 = (r * r - hhh - 2 * v) % P
+    return x3, (r * (v - x3) - y * hhh) % P, z * h % P
+
+
+def _to_affine(points: list[JacobianPoint]) -> list[Point]:
+    """Return the points in affine coordinates, with one inversion."""
+    # Montgomery's trick, the inverse of every z is taken out of the
+    # inverse of the product of all of them
+    products = []
+    product = 1
+    for _, _, z in points:
+        product = product * z % P
+        products.append(product)
+    inverse = pow(product, -1, P)
+    affine = [(0, 0)] * len(points)
+    for i in range(len(points) - 1, -1, -1):
+        x, y, z = points[i]
+        z_inverse = inverse * products[i - 1] % P if i else inverse
+        inverse = inverse * z % P
+        zz = z_inverse * z_inverse % P
+        affine[i] = x * zz % P, y * zz * z_inverse % P
+    return affine
+
+
+@functools.cache
+def generator_table() -> list[list[Point]]:
+    """Return multiples j * 256^i * G of the generator, by i, then j - 1.
+
+    A scalar then takes one addition per nonzero byte, see multiply_g.
+    Built once per process, on the first use or by warm_up.
+    """
+    table = []
+    base: JacobianPoint = (*G, 1)
+    for _ in range(256 // WINDOW_BITS):
+        multiples = [base]
+        affine_base = _to_affine([base])[0]
+        for _ in range(2**WINDOW_BITS - 2):
+            multiples.append(_add_affine(multiples[-1], affine_base))
+        table.append(_to_affine(multiples))
+        base = _add_affine(multiples[-1], affine_base)
+    return table
+
+
+def multiply_g(scalar: int) -> JacobianPoint | None:
+    """Return scalar * G, None for the point at infinity."""
+    point = None
+    mask = 2**WINDOW_BITS - 1
+    for window in generator_table():
+        digit = scalar & mask
+        if digit:
+            point = _add_affine(point, window[digit - 1])
+        scalar >>= WINDOW_BITS
+    return point
+
+
+def compress(point: Point) -> bytes:
+    """Return the SEC compressed public key of the point."""
+    return bytes([2 + (point[1] & 1)]) + point[0].to_bytes(32, "big")
+
+
+def decompress(public_key: bytes) -> Point:
+    """Return the point of the SEC compressed public key."""
+    x = int.from_bytes(public_key[1:], "big")
+    y = pow((pow(x, 3, P) + 7) % P, (P + 1) // 4, P)
+    if y & 1 != public_key[0] & 1:
+        y = P - y
+    return x, y
+
+
+def _b58decode_check(value: str) -> bytes:
+    num = 0
+    for char in value:
+        num = num * 58 + BASE58_ALPHABET.index(char)
+    pad = len(value) - len(value.lstrip("1"))
+    data = b"\0" * pad + num.to_bytes((num.bit_length() + 7) // 8, "big")
+    payload, checksum = data[:-4], data[-4:]
+    if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != (
+        checksum
+    ):
+        raise ValueError("Invalid base58 checksum.")
+    return payload
+
+
+def _b58encode_check(payload: bytes) -> str:
+    data = (
+        payload + hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4]
+    )
+    num = int.from_bytes(data, "big")
+    chars = []
+    while num:
+        num, digit = divmod(num, 58)
+        chars.append(BASE58_ALPHABET[digit])
+    pad = len(data) - len(data.lstrip(b"\0"))
+    return "1" * pad + "".join(reversed(chars))
+
+
+def parse_xpublic_key(xpublic_key: str) -> tuple[bytes, bytes]:
+    """Return (chain code, compressed public key) of the xpublic key.
+
+    Raises:
+        ValueError: when the key is malformed
+    """
+    data = _b58decode_check(xpublic_key)
+    if len(data) != 78 or data[45] not in (2, 3):
+        raise ValueError("Invalid xpublic key.")
+    return data[13:45], data[45:]
+
+
+def _child_tweak(chain_code: bytes, public_key: bytes, index: int) -> bytes:
+    if not 0 <= index < HARDENED_INDEX:
+        raise ValueError(
+            "Hardened derivation path is invalid for xpublic key."
+        )
+    return hmac.digest(
+        chain_code, public_key + index.to_bytes(4, "big"), "sha512"
+    )
+
+
+def _child_point(tweak: bytes, parent: Point) -> JacobianPoint:
+    scalar = int.from_bytes(tweak[:32], "big")
+    point = _add_affine(multiply_g(scalar), parent) if scalar < N else None
+    if point is None:
+        # probability about 2^-127, BIP32 skips such an index
+        raise ValueError("Invalid child index, use the next one.")
+    return point
+
+
+def derive_public_points(
+    xpublic_key: str, *, path: tuple[int, ...] = (), indexes: range
+) -> list[Point]:
+    """Return points of the children of the xpublic key by index.
+
+    The children are those of the key derived along the path first, e.g.
+    path=(change,) of an account key gives its addresses. All the steps
+    are non-hardened.
+
+    Raises:
+        ValueError: when the key is malformed or an index is hardened
+    """
+    chain_code, public_key = parse_xpublic_key(xpublic_key)
+    for index in path:
+        tweak = _child_tweak(chain_code, public_key, index)
+        point = _child_point(tweak, decompress(public_key))
+        chain_code, public_key = tweak[32:], compress(_to_affine([point])[0])
+    if not indexes:
+        return []
+    parent = decompress(public_key)
+    return _to_affine(
+        [
+            _child_point(_child_tweak(chain_code, public_key, index), parent)
+            for index in indexes
+        ]
+    )
+
+
+@functools.cache
+def _ripemd160() -> Callable[[bytes], bytes]:
+    try:
+        hashlib.new("ripemd160")
+    except ValueError:
+        # OpenSSL 3 builds without the legacy provider lack it
+        from Crypto.Hash import RIPEMD160
+
+        return lambda data: RIPEMD160.new(data).digest()
+    return lambda data: hashlib.new("ripemd160", data).digest()
+
+
+def _version_bytes(version: int) -> bytes:
+    digits = "%x" % version
+    return bytes.fromhex(digits if len(digits) % 2 == 0 else "0" + digits)
+
+
+def _keccak_address(point: Point) -> str:
+    from Crypto.Hash import keccak
+
+    data = point[0].to_bytes(32, "big") + point[1].to_bytes(32, "big")
+    return keccak.new(data=data, digest_bits=256).hexdigest()[24:]
+
+
+def _eth_checksum(address: str) -> str:
+    from Crypto.Hash import keccak
+
+    digest = keccak.new(data=address.encode(), digest_bits=256).hexdigest()
+    return "".join(
+        char.upper() if int(nibble, 16) >= 8 else char
+        for char, nibble in zip(address, digest)
+    )
+
+
+def encode_addresses(
+    symbol: str, points: list[Point]
+) -> list[tuple[str, dict[str, str | None]]]:
+    """Return (compressed public key, addresses) of every point.
+
+    Addresses are those of HDWallet.dumps() of the symbol; hash160 of the
+    key and the witness script hash are computed once for all of them.
+    """
+    from hdwallet.cryptocurrencies import get_cryptocurrency
+    from hdwallet.libs.bech32 import bech32_encode
+    from hdwallet.libs.bech32 import convertbits
+
+    cryptocurrency = get_cryptocurrency(symbol=symbol)
+    public_version = _version_bytes(cryptocurrency.PUBLIC_KEY_ADDRESS)
+    script_version = _version_bytes(cryptocurrency.SCRIPT_ADDRESS)
+    hrp = cryptocurrency.SEGWIT_ADDRESS.HRP
+    ripemd160 = _ripemd160()
+    sha256 = hashlib.sha256
+
+    def hash160(data: bytes) -> bytes:
+        return ripemd160(sha256(data).digest())
+
+    def script_address(script: bytes) -> str:
+        return _b58encode_check(script_version + hash160(script))
+
+    def segwit_address(program: bytes) -> str:
+        return bech32_encode(hrp, [0] + convertbits(program, 8, 5))
+
+    encoded = []
+    for point in points:
+        public_key = compress(point)
+        key_hash = hash160(public_key)
+        if cryptocurrency.SYMBOL in ("ETH", "ETHTEST"):
+            p2pkh = "0x" + _eth_checksum(_keccak_address(point))
+        elif cryptocurrency.SYMBOL in ("XDC", "XDCTEST"):
+            p2pkh = "xdc" + _eth_checksum(_keccak_address(point))
+        elif cryptocurrency.SYMBOL == "TRX":
+            p2pkh = _b58encode_check(
+                public_version + bytes.fromhex(_keccak_address(point))
+            )
+        else:
+            p2pkh = _b58encode_check(public_version + key_hash)
+        addresses: dict[str, str | None] = dict(
+            p2pkh=p2pkh,
+            p2sh=script_address(b"\x76\xa9\x14" + key_hash + b"\x88\xac"),
+            p2wpkh=None,
+            p2wpkh_in_p2sh=None,
+            p2wsh=None,
+            p2wsh_in_p2sh=None,
+        )
+        if hrp is not None:
+            script_hash = sha256(
+                b"\x51\x21" + public_key + b"\x51\xae"
+            ).digest()
+            addresses.update(
+                p2wpkh=segwit_address(key_hash),
+                p2wpkh_in_p2sh=script_address(b"\x00\x14" + key_hash),
+                p2wsh=segwit_address(script_hash),
+                p2wsh_in_p2sh=script_address(b"\x00\x20" + script_hash),
+            )
+        encoded.append((public_key.hex(), addresses))
+    return encoded
@@ -1,2 +1,22 @@
 class WalletEntryDoesNotExist(Exception):
     """An error raised on failed wallet search in the database."""
+
+
+class DerivationPoolSaturated(Exception):
+    """An error raised when there is no room left for a new derivation."""
+
+
+class InvalidCursor(ValueError):
+    """An error raised when a pagination cursor can not be decoded."""
+
+
+class AccountNotDerivable(Exception):
+    """An error raised when addresses of an account can not be derived."""
+
+
+class InvalidMnemonic(ValueError):
+    """An error raised when a mnemonic phrase fails the BIP39 checks."""
+
+
+class WalletJobDoesNotExist(Exception):
+    """An error raised on failed wallet job search in the database."""
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Callable
+from typing import TypeVar
+
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.instrumentation import record
+from zeply_python_challenge.wallets.exceptions import DerivationPoolSaturated
+from zeply_python_challenge.wallets.utils import warm_up
+
+T = TypeVar("T")
+
+
+def _timed_call(
+    fn: Callable[..., T], *args: Any, **kwargs: Any
+) -> tuple[T, float]:
+    """Call fn and return its result along with the time spent.
+
+    Defined on the module level, so it can be pickled by a process pool.
+    """
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+class DerivationExecutor:
+    """Run CPU-bound key derivation outside of the event loop.
+
+    Derivations are dispatched to a thread or a process pool. At most
+    ``max_workers + max_queue_size`` derivations may be in flight, any
+    new one is rejected with ``DerivationPoolSaturated`` instead of being
+    queued without a limit.
+    """
+
+    def __init__(
+        self, *, kind: str, max_workers: int, max_queue_size: int
+    ) -> None:
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown derivation executor: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._pool: Executor = (
+            ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="derivation"
+            )
+            if kind == "thread"
+            else ProcessPoolExecutor(
+                max_workers=max_workers, initializer=warm_up
+            )
+        )
+        self._in_flight = 0
+        # guards _in_flight, released from the pool's threads
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.derivation_seconds_total = 0.0
+        self.derivation_seconds_max = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        """Return the number of derivations running or waiting."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of derivations waiting for a free worker."""
+        return max(0, self._in_flight - self.max_workers)
+
+    @property
+    def capacity(self) -> int:
+        """Return the number of derivations which may be in flight."""
+        return self.max_workers + self.max_queue_size
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn in the pool and return its result.
+
+        Raises:
+            DerivationPoolSaturated: when the pool and its queue are full
+        """
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise DerivationPoolSaturated("Derivation pool is saturated.")
+            self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            future = self._pool.submit(_timed_call, fn, *args, **kwargs)
+        except BaseException:
+            # e.g. the pool is shut down
+            self._release(None)
+            raise
+        # a derivation keeps running when its caller is cancelled, it is
+        # in flight until the pool is done with it, registered first so it
+        # is released before the caller resumes
+        future.add_done_callback(self._release)
+        try:
+            result, elapsed = await asyncio.wrap_future(future)
+        except Exception:
+            self.failed += 1
+            raise
+        record("derivation", elapsed)
+        record("derivation_queue", time.perf_counter() - started - elapsed)
+        self.completed += 1
+        self.derivation_seconds_total += elapsed
+        self.derivation_seconds_max = max(self.derivation_seconds_max, elapsed)
+        return result
+
+    def _release(self, future: Future[Any] | None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self) -> dict[str, Any]:
+        """Return executor metrics."""
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "derivation_seconds_total": self.derivation_seconds_total,
+            "derivation_seconds_max": self.derivation_seconds_max,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the underlying pool."""
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_executor: DerivationExecutor | None = None
+
+
+def get_derivation_executor() -> DerivationExecutor:
+    """Return process-wide derivation executor, create it on the first call."""
+    global _executor
+    if _executor is None:
+        _executor = DerivationExecutor(
+            kind=settings.DERIVATION_EXECUTOR,
+            max_workers=settings.DERIVATION_MAX_WORKERS,
+            max_queue_size=settings.DERIVATION_MAX_QUEUE_SIZE,
+        )
+    return _executor
+
+
+def shutdown_derivation_executor() -> None:
+    """Stop the process-wide derivation executor if it was started."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
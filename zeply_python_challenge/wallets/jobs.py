@@ -0,0 +1,366 @@
+import hashlib
+import hmac
+import logging
+import secrets
+from typing import Any
+from typing import AsyncIterator
+from typing import Iterable
+
+import orjson
+from sqlalchemy import case
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import insert
+from sqlalchemy.sql import select
+from sqlalchemy.sql import update
+
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.wallets.constants import WalletJobChunkStatus
+from zeply_python_challenge.wallets.constants import WalletJobStatus
+from zeply_python_challenge.wallets.exceptions import WalletJobDoesNotExist
+from zeply_python_challenge.wallets.models import Wallet
+from zeply_python_challenge.wallets.models import WalletJob
+from zeply_python_challenge.wallets.models import WalletJobChunk
+from zeply_python_challenge.wallets.models import insert_wallet_addresses
+from zeply_python_challenge.wallets.serializers import shape_created_wallet
+from zeply_python_challenge.wallets.service import wallet_row
+from zeply_python_challenge.wallets.utils import derive_many_from_entropy
+
+logger = logging.getLogger(__name__)
+
+# Wallet jobs generate up to MAX_WALLETS_PER_JOB wallets in the
+# background. A job is split into chunks of WALLET_JOB_CHUNK_SIZE wallets
+# when it is created. Worker processes, see worker.py, claim the first
+# pending chunk with SELECT ... FOR UPDATE SKIP LOCKED, so they never wait
+# for each other, then derive and store its wallets and mark it done in
+# the claiming transaction. A worker dying mid-chunk rolls it back, which
+# releases the chunk to the other workers with nothing of it stored.
+# Progress is counted from the chunks, workers do not update the job row.
+
+PENDING = WalletJobChunkStatus.PENDING.value
+DONE = WalletJobChunkStatus.DONE.value
+FAILED = WalletJobChunkStatus.FAILED.value
+CANCELLED = WalletJobChunkStatus.CANCELLED.value
+
+# AES-GCM nonce and tag prepended to the encrypted chunk results
+NONCE_SIZE = TAG_SIZE = 16
+
+
+def hash_job_token(token: str) -> str:
+    """Return the hash of the job token stored with the job."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _result_key(job_id: int) -> bytes:
+    return hmac.digest(
+        settings.SECRET_KEY.encode(), f"wallet-job:{job_id}".encode(), "sha256"
+    )
+
+
+def encrypt_chunk_result(job_id: int, data: bytes) -> bytes:
+    """Return the chunk result encrypted with the key of the job.
+
+    Results hold private keys and mnemonics until the client reads them,
+    so they are stored encrypted with AES-GCM under a key derived from
+    SECRET_KEY.
+    """
+    # imported on the first use, as hdwallet, see wallets.utils
+    from Crypto.Cipher import AES
+
+    cipher = AES.new(_result_key(job_id), AES.MODE_GCM)
+    ciphertext, tag = cipher.encrypt_and_digest(data)
+    return cipher.nonce + tag + ciphertext
+
+
+def decrypt_chunk_result(job_id: int, value: bytes) -> bytes:
+    """Return the chunk result encrypted by encrypt_chunk_result.
+
+    Raises:
+        ValueError: when the value was not encrypted with the job key
+    """
+    from Crypto.Cipher import AES
+
+    header = NONCE_SIZE + TAG_SIZE
+    nonce, tag = value[:NONCE_SIZE], value[NONCE_SIZE:header]
+    cipher = AES.new(_result_key(job_id), AES.MODE_GCM, nonce=nonce)
+    return cipher.decrypt_and_verify(value[header:], tag)
+
+
+def shape_job(
+    job: WalletJob, chunks: Iterable[tuple[str, int, int, int]]
+) -> dict[str, Any]:
+    """Return the job shaped as WalletJobInResponse.
+
+    Chunks are (status, chunks, wallets, failed wallets) sums by status.
+    """
+    wallets = {status: (size, failed) for status, _, size, failed in chunks}
+    done, done_failed = wallets.get(DONE, (0, 0))
+    failed = done_failed + wallets.get(FAILED, (0, 0))[0]
+    pending = wallets.get(PENDING, (0, 0))[0]
+    if job.cancelled_at is not None:
+        status = WalletJobStatus.CANCELLED
+    elif not pending:
+        status = WalletJobStatus.COMPLETED
+    elif done or failed:
+        status = WalletJobStatus.RUNNING
+    else:
+        status = WalletJobStatus.QUEUED
+    return {
+        "id": job.id,
+        "currency": job.currency,
+        "count": job.count,
+        "status": status,
+        "stored": done - done_failed,
+        "failed": failed,
+        "pending": pending,
+        "created_at": job.created_at,
+        "cancelled_at": job.cancelled_at,
+    }
+
+
+async def get_job(sess: AsyncSession, *, job_id: int) -> dict[str, Any]:
+    """Return the job and its progress, see shape_job.
+
+    Raises:
+        WalletJobDoesNotExist: when there is no such job
+    """
+    job = await sess.get(WalletJob, job_id)
+    if job is None:
+        raise WalletJobDoesNotExist
+    stmt = (
+        select(
+            WalletJobChunk.status,
+            func.count(),
+            func.sum(WalletJobChunk.size),
+            func.sum(WalletJobChunk.failed),
+        )
+        .where(WalletJobChunk.job_id == job_id)
+        .group_by(WalletJobChunk.status)
+    )
+    res = await sess.execute(stmt)
+    return shape_job(job, res.all())
+
+
+async def create_job(
+    sess: AsyncSession, *, symbol: str, count: int
+) -> dict[str, Any]:
+    """Create a job generating count wallets of the currency.
+
+    Returns: the job shaped as CreatedWalletJobInResponse, its token is
+    not stored and can not be recovered later
+    """
+    token = secrets.token_urlsafe(32)
+    job = WalletJob(
+        currency=symbol, count=count, token_hash=hash_job_token(token)
+    )
+    sess.add(job)
+    await sess.flush()
+    chunk_size = settings.WALLET_JOB_CHUNK_SIZE
+    await sess.execute(
+        insert(WalletJobChunk),
+        [
+            {
+                "job_id": job.id,
+                "start": start,
+                "size": min(chunk_size, count - start),
+            }
+            for start in range(0, count, chunk_size)
+        ],
+    )
+    await sess.commit()
+    # loads created_at set by the database
+    await sess.refresh(job)
+    return {**await get_job(sess, job_id=job.id), "token": token}
+
+
+async def cancel_job(sess: AsyncSession, *, job_id: int) -> dict[str, Any]:
+    """Cancel the job, its pending chunks are not generated anymore.
+
+    Chunks being generated at the moment are locked, they are left to be
+    stored by their workers.
+
+    Raises:
+        WalletJobDoesNotExist: when there is no such job
+    """
+    await sess.execute(
+        update(WalletJob)
+        .where(WalletJob.id == job_id, WalletJob.cancelled_at.is_(None))
+        .values(cancelled_at=func.now())
+    )
+    pending = (
+        select(WalletJobChunk.id)
+        .where(
+            WalletJobChunk.job_id == job_id, WalletJobChunk.status == PENDING
+        )
+        .with_for_update(skip_locked=True)
+    )
+    await sess.execute(
+        update(WalletJobChunk)
+        .where(WalletJobChunk.id.in_(pending))
+        .values(status=CANCELLED)
+    )
+    await sess.commit()
+    return await get_job(sess, job_id=job_id)
+
+
+async def check_job_token(
+    sess: AsyncSession, *, job_id: int, token: str
+) -> None:
+    """Check the token of the job, in constant time.
+
+    Raises:
+        WalletJobDoesNotExist: when there is no such job or the token is
+        not the job one
+    """
+    token_hash = await sess.scalar(
+        select(WalletJob.token_hash).where(WalletJob.id == job_id)
+    )
+    if token_hash is None or not hmac.compare_digest(
+        token_hash, hash_job_token(token)
+    ):
+        raise WalletJobDoesNotExist
+
+
+async def stream_job_wallets(
+    sess: AsyncSession, *, job_id: int
+) -> AsyncIterator[bytes]:
+    """Yield GeneratedWalletInBatchResponse NDJSON of the generated wallets.
+
+    Wallets come chunk by chunk, in the index order, read through a
+    server side cursor. Wallets of failed chunks carry the chunk error,
+    those of pending and cancelled chunks are left out. Check the job
+    token first, see check_job_token.
+    """
+    stmt = (
+        select(
+            WalletJobChunk.status,
+            WalletJobChunk.start,
+            WalletJobChunk.size,
+            WalletJobChunk.error,
+            WalletJobChunk.result,
+        )
+        .where(
+            WalletJobChunk.job_id == job_id,
+            WalletJobChunk.status.in_([DONE, FAILED]),
+        )
+        .order_by(WalletJobChunk.start)
+        .execution_options(yield_per=10)
+    )
+    res = await sess.stream(stmt)
+    async for status, start, size, error, result in res:
+        if status == DONE:
+            yield decrypt_chunk_result(job_id, result)
+            continue
+        yield b"".join(
+            orjson.dumps(
+                {"index": index, "id": None, "wallet": None, "error": error}
+            )
+            + b"\n"
+            for index in range(start, start + size)
+        )
+
+
+def _generate_chunk(sess: Session, chunk: WalletJobChunk, symbol: str) -> None:
+    """Derive and store the wallets of the chunk, mark it done."""
+    wallets = derive_many_from_entropy(
+        symbol,
+        count=chunk.size,
+        strength=settings.WALLET_ENTROPY_STRENGTH,
+        language=settings.WALLET_MNEMONIC_PHRASE_LANGUAGE,
+        accounts=settings.WALLET_DERIVATION_ACCOUNTS,
+    )
+    rows = {
+        index: wallet_row(symbol, wallet_data)
+        for index, (wallet_data, _) in enumerate(wallets, start=chunk.start)
+        if wallet_data is not None
+    }
+    ids: dict[str, int] = {}
+    if rows:
+        res = sess.execute(
+            insert(Wallet)
+            .values(list(rows.values()))
+            .returning(Wallet.id, Wallet.seed)
+        )
+        # matched by the seed hash, see service._store_wallets
+        ids = {seed: wallet_id for wallet_id, seed in res.all()}
+        addresses_stmt = insert_wallet_addresses(
+            {ids[row["seed"]]: row["addresses"] for row in rows.values()}
+        )
+        if addresses_stmt is not None:
+            sess.execute(addresses_stmt)
+
+    lines = []
+    for index, (wallet_data, error) in enumerate(wallets, start=chunk.start):
+        item: dict[str, Any] = {
+            "index": index,
+            "id": None,
+            "wallet": None,
+            "error": error,
+        }
+        if wallet_data is not None:
+            item["id"] = ids[rows[index]["seed"]]
+            item["wallet"] = shape_created_wallet(wallet_data)
+        lines.append(orjson.dumps(item))
+    chunk.status = DONE
+    chunk.failed = len(wallets) - len(rows)
+    chunk.error = None
+    chunk.result = encrypt_chunk_result(
+        chunk.job_id, b"\n".join(lines) + b"\n"
+    )
+
+
+def _record_chunk_error(sess: Session, chunk_id: int, error: str) -> None:
+    """Count a failed attempt of the chunk, give it up after the last one."""
+    attempts = WalletJobChunk.attempts + 1
+    sess.execute(
+        update(WalletJobChunk)
+        .where(WalletJobChunk.id == chunk_id, WalletJobChunk.status == PENDING)
+        .values(
+            attempts=attempts,
+            error=error,
+            status=case(
+                (attempts >= settings.WALLET_JOB_MAX_ATTEMPTS, FAILED),
+                else_=PENDING,
+            ),
+        )
+    )
+    sess.commit()
+
+
+def process_next_chunk(sess: Session) -> bool:
+    """Claim the first pending chunk and generate its wallets.
+
+    The chunk stays locked until its wallets are stored and it is marked
+    done, all in one transaction. Chunks of cancelled jobs are marked
+    cancelled instead. A chunk failing with an error is rolled back and
+    retried, up to WALLET_JOB_MAX_ATTEMPTS times.
+
+    Returns: False when there was no pending chunk
+    """
+    stmt = (
+        select(WalletJobChunk, WalletJob.currency, WalletJob.cancelled_at)
+        .join(WalletJob, WalletJob.id == WalletJobChunk.job_id)
+        .where(WalletJobChunk.status == PENDING)
+        .order_by(WalletJobChunk.id)
+        .limit(1)
+        .with_for_update(of=WalletJobChunk, skip_locked=True)
+    )
+    row = sess.execute(stmt).first()
+    if row is None:
+        sess.rollback()
+        return False
+    chunk, symbol, cancelled_at = row
+    chunk_id = chunk.id
+    if cancelled_at is not None:
+        chunk.status = CANCELLED
+        sess.commit()
+        return True
+    try:
+        _generate_chunk(sess, chunk, symbol)
+        sess.commit()
+    except Exception as e:
+        logger.exception("Failed to generate wallet job chunk %d", chunk_id)
+        sess.rollback()
+        _record_chunk_error(sess, chunk_id, str(e) or e.__class__.__name__)
+    return True
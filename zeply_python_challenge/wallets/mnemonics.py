@@ -0,0 +1,82 @@
+import functools
+import hashlib
+import unicodedata
+
+from zeply_python_challenge.wallets.exceptions import InvalidMnemonic
+
+# BIP39 word counts, 3 words of 11 bits carry 32 bits of entropy and 1 bit
+# of checksum
+MNEMONIC_WORD_COUNTS = (12, 15, 18, 21, 24)
+
+# longer input is rejected before it is normalized; the longest word of
+# any wordlist takes 12 characters in NFKD, the rest is room for spaces
+MAX_MNEMONIC_LENGTH = 24 * 16
+
+MNEMONIC_SEED_ROUNDS = 2048
+
+
+@functools.cache
+def wordlist_index(language: str) -> dict[str, int]:
+    """Return the word -> index dict of the BIP39 wordlist.
+
+    Built once per process, on the first use or by warm_up.
+    """
+    from mnemonic import Mnemonic
+
+    return {word: i for i, word in enumerate(Mnemonic(language).wordlist)}
+
+
+def normalize_mnemonic(mnemonic: str) -> str:
+    """Return the mnemonic as stored: NFKD, lowercase, single spaces.
+
+    Equal phrases typed differently, e.g. with ideographic or repeated
+    spaces, are then indexed and stretched into the seed alike.
+    """
+    return " ".join(unicodedata.normalize("NFKD", mnemonic).lower().split())
+
+
+def mnemonic_to_entropy(mnemonic: str, *, language: str) -> bytes:
+    """Return the entropy of the normalized mnemonic.
+
+    Every word is looked up in wordlist_index and the checksum checked,
+    which takes microseconds, see normalize_mnemonic.
+
+    Raises:
+        InvalidMnemonic: when the mnemonic is malformed
+    """
+    words = mnemonic.split(" ")
+    if len(words) not in MNEMONIC_WORD_COUNTS:
+        raise InvalidMnemonic("Invalid mnemonic words count.")
+    index = wordlist_index(language)
+    value = 0
+    try:
+        for word in words:
+            value = value << 11 | index[word]
+    except KeyError:
+        raise InvalidMnemonic("Invalid mnemonic word.") from None
+    checksum_bits = len(words) // 3
+    entropy = (value >> checksum_bits).to_bytes(checksum_bits * 4, "big")
+    checksum = hashlib.sha256(entropy).digest()[0] >> 8 - checksum_bits
+    if checksum != value & (1 << checksum_bits) - 1:
+        raise InvalidMnemonic("Invalid mnemonic checksum.")
+    return entropy
+
+
+def mnemonic_to_seed(mnemonic: str) -> bytes:
+    """Return the BIP39 seed of the normalized mnemonic, no passphrase."""
+    return hashlib.pbkdf2_hmac(
+        "sha512", mnemonic.encode(), b"mnemonic", MNEMONIC_SEED_ROUNDS
+    )
+
+
+def check_mnemonic(mnemonic: str, *, language: str) -> str:
+    """Return the normalized mnemonic if it is a valid BIP39 phrase.
+
+    Raises:
+        InvalidMnemonic: when the mnemonic is malformed
+    """
+    if len(mnemonic) > MAX_MNEMONIC_LENGTH:
+        raise InvalidMnemonic("Invalid mnemonic length.")
+    mnemonic = normalize_mnemonic(mnemonic)
+    mnemonic_to_entropy(mnemonic, language=language)
+    return mnemonic
@@ -1,15 +1,164 @@
+from typing import Any
+
 from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import LargeBinary
+from sqlalchemy import PrimaryKeyConstraint
 from sqlalchemy import String
+from sqlalchemy import func
+from sqlalchemy import text
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import Insert
+from sqlalchemy.dialects.postgresql import insert
 
 from zeply_python_challenge.database import Base
 from zeply_python_challenge.database import TimeTrackMixin
+from zeply_python_challenge.wallets.constants import WalletJobChunkStatus
 
 
 class Wallet(Base, TimeTrackMixin):
+    """A generated wallet.
+
+    The table is partitioned by month of created_at, see
+    wallets.partitions. The primary key has to hold the partition key, a
+    wallet is still identified by its id alone.
+    """
+
     __tablename__ = "wallets"
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "created_at"),
+        # supports keyset pagination ordered by (created_at, id)
+        Index("ix_wallets_created_at_id", "created_at", "id"),
+        # restore lookups are equality only, hash indexes suit them best
+        Index("ix_wallets_seed", "seed", postgresql_using="hash"),
+        Index("ix_wallets_mnemonic", "mnemonic", postgresql_using="hash"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    # serial though part of a composite primary key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(
+        DateTime, server_default=func.now(), nullable=False, primary_key=True
+    )
+    __mapper_args__ = {"primary_key": [id]}
+
     addresses = Column(JSONB, nullable=False)
     currency = Column(String, nullable=False)
 
+    # blind indexes of the seed and the mnemonic, see make_blind_index
     seed = Column(String, nullable=False)
     mnemonic = Column(String, nullable=False)
+    # checked on restore once the wallet was found by a blind index, None
+    # for wallets stored before verifiers were introduced, until their
+    # first restore
+    seed_verifier = Column(String, nullable=True)
+    # {"<account index>": "<account xpublic key>"}, used to derive more
+    # addresses of the wallet
+    account_xpublic_keys = Column(JSONB, nullable=True)
+
+
+class WalletAddress(Base):
+    """An address of a wallet, to find wallets by their addresses.
+
+    Copies of the Wallet.addresses values, written in the transaction
+    storing the wallet. There is no foreign key to the partitioned
+    wallets, it could only reference (id, created_at), addresses of
+    dropped partitions are deleted with them, see wallets.partitions.
+    """
+
+    __tablename__ = "wallet_addresses"
+    __table_args__ = (
+        Index("ix_wallet_addresses_address", "address", unique=True),
+        # addresses are deleted by wallet id, see wallets.partitions
+        Index("ix_wallet_addresses_wallet_id", "wallet_id"),
+    )
+
+    wallet_id = Column(Integer, nullable=False)
+    # key of the address in Wallet.addresses, e.g. "p2wpkh"
+    type = Column(String, nullable=False)
+    address = Column(String, nullable=False)
+
+
+class WalletJob(Base, TimeTrackMixin):
+    """An order of count wallets generated in the background.
+
+    Its wallets are generated chunk by chunk, see WalletJobChunk, the job
+    row itself is not updated by the workers, except on cancellation.
+    """
+
+    __tablename__ = "wallet_jobs"
+
+    currency = Column(String, nullable=False)
+    count = Column(Integer, nullable=False)
+    # sha256 of the token needed to read the generated wallets, the token
+    # is returned only once, when the job is created
+    token_hash = Column(String, nullable=False)
+    cancelled_at = Column(DateTime, nullable=True)
+
+
+class WalletJobChunk(Base):
+    """Wallets start to start + size - 1 of a job, the unit of work.
+
+    Workers claim pending chunks with SELECT ... FOR UPDATE SKIP LOCKED
+    and store the wallets and the chunk result in the claiming
+    transaction, see wallets.jobs.
+    """
+
+    __tablename__ = "wallet_job_chunks"
+    __table_args__ = (
+        # workers look for the first pending chunk only
+        Index(
+            "ix_wallet_job_chunks_pending",
+            "id",
+            postgresql_where=text("status = 'pending'"),
+        ),
+        Index("ix_wallet_job_chunks_job_id", "job_id"),
+    )
+
+    job_id = Column(
+        Integer,
+        ForeignKey("wallet_jobs.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    start = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)
+    status = Column(
+        String, nullable=False, default=WalletJobChunkStatus.PENDING.value
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    # message of the last error the chunk failed with
+    error = Column(String, nullable=True)
+    # wallets of the chunk which failed to derive
+    failed = Column(Integer, nullable=False, default=0)
+    # encrypted GeneratedWalletInBatchResponse NDJSON of the chunk
+    # wallets, see wallets.jobs.encrypt_chunk_result
+    result = Column(LargeBinary, nullable=True)
+
+
+def insert_wallet_addresses(
+    addresses: dict[int, dict[str, Any]]
+) -> Insert | None:
+    """Return INSERT of the addresses of wallets given by wallet id.
+
+    Wallets derived from one seed share some addresses, e.g. ETH wallets
+    repeat the BTC script addresses, an address keeps pointing to the
+    wallet stored first. None addresses are left out.
+
+    Returns: the statement, None when there are no addresses
+    """
+    rows = [
+        {"wallet_id": wallet_id, "type": type_, "address": address}
+        for wallet_id, wallet_addresses in addresses.items()
+        for type_, address in wallet_addresses.items()
+        if address is not None
+    ]
+    if not rows:
+        return None
+    return (
+        insert(WalletAddress)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["address"])
+    )
@@ -0,0 +1,258 @@
+import asyncio
+import datetime
+import logging
+import re
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import dispose_engines
+from zeply_python_challenge.database import get_async_engine
+
+logger = logging.getLogger(__name__)
+
+# The wallets table is partitioned by range of created_at, one partition per
+# month named wallets_yYYYYmMM. Wallets stored before partitioning stay in
+# the wallets_legacy partition, see the a4d8e2f6c915 migration. Partitions
+# have to exist before the first wallet of their month is stored, so the
+# next WALLET_PARTITIONS_AHEAD months are created ahead of time, either by
+# the app when WALLET_PARTITION_MAINTENANCE_ENABLED is set or by cron:
+#
+#     $ python -m zeply_python_challenge.wallets.partitions
+#
+# Wallets of months without a partition go to the wallets_default partition
+# meanwhile, they are moved to the partition of their month once it is
+# created.
+#
+# With WALLET_RETENTION_MONTHS set, monthly partitions older than that are
+# dropped, together with the addresses of their wallets. The legacy
+# partition is never dropped.
+
+PARTITION_NAME = re.compile(r"wallets_y(\d{4})m(\d{2})")
+DEFAULT_PARTITION = "wallets_default"
+# upper bound of a range partition, as returned by pg_get_expr
+UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+_maintenance: asyncio.Task[None] | None = None
+
+
+def month_start(moment: datetime.datetime) -> datetime.datetime:
+    """Return the start of the month of moment."""
+    return datetime.datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime.datetime, months: int) -> datetime.datetime:
+    """Return the start of the month months after month, or before."""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.datetime) -> str:
+    """Return the name of the partition of wallets created in month."""
+    return f"wallets_y{month.year}m{month.month:02d}"
+
+
+def parse_upper_bound(bound: str) -> datetime.datetime | None:
+    """Return the upper bound of a partition bound expression, if any."""
+    match = UPPER_BOUND.search(bound)
+    if match is None:
+        return None
+    return datetime.datetime.fromisoformat(match[1])
+
+
+async def get_upper_bounds(
+    conn: AsyncConnection,
+) -> dict[str, datetime.datetime] | None:
+    """Return the upper bounds of the wallets partitions by name.
+
+    None is returned while the wallets table is not partitioned.
+    """
+    partitioned = await conn.scalar(
+        text(
+            "SELECT relkind = 'p' FROM pg_class "
+            "WHERE oid = 'wallets'::regclass"
+        )
+    )
+    if not partitioned:
+        return None
+    rows = await conn.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'wallets'::regclass"
+        )
+    )
+    bounds = {}
+    for name, bound in rows:
+        upper = parse_upper_bound(bound)
+        if upper is not None:
+            bounds[name] = upper
+    return bounds
+
+
+async def create_wallet_partitions(
+    conn: AsyncConnection,
+    bounds: dict[str, datetime.datetime],
+    *,
+    now: datetime.datetime,
+    months_ahead: int,
+) -> list[str]:
+    """Create the missing partitions up to months_ahead months from now.
+
+    A partition is created as a table of its own and attached afterwards,
+    which unlike CREATE TABLE ... PARTITION OF does not lock wallets
+    against reads and writes. Wallets of its month stored in the default
+    partition meanwhile are moved to it first. Returns the names of the
+    created partitions.
+    """
+    start = max(bounds.values(), default=month_start(now))
+    end = add_months(month_start(now), months_ahead + 1)
+    created = []
+    while start < end:
+        name = partition_name(start)
+        until = add_months(month_start(start), 1)
+        await conn.execute(
+            text(
+                f"CREATE TABLE {name} "
+                "(LIKE wallets INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+        )
+        moved = await conn.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                "WHERE created_at >= :start AND created_at < :until "
+                f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+            ),
+            {"start": start, "until": until},
+        )
+        if moved.rowcount:
+            logger.warning(
+                "Moved %d wallets from %s to %s, partitions are not created "
+                "far enough ahead",
+                moved.rowcount,
+                DEFAULT_PARTITION,
+                name,
+            )
+        await conn.execute(
+            text(
+                f"ALTER TABLE wallets ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start}') TO ('{until}')"
+            )
+        )
+        created.append(name)
+        start = until
+    return created
+
+
+async def drop_expired_wallet_partitions(
+    conn: AsyncConnection,
+    bounds: dict[str, datetime.datetime],
+    *,
+    now: datetime.datetime,
+    retention_months: int,
+) -> list[str]:
+    """Drop the monthly partitions older than retention_months.
+
+    Addresses have no foreign key to the partitioned wallets, those of the
+    dropped wallets are deleted first. Returns the dropped partitions.
+    """
+    cutoff = add_months(month_start(now), -retention_months)
+    dropped = []
+    for name, upper in sorted(bounds.items(), key=lambda item: item[1]):
+        if upper > cutoff or not PARTITION_NAME.fullmatch(name):
+            continue
+        await conn.execute(
+            text(
+                "DELETE FROM wallet_addresses "
+                f"WHERE wallet_id IN (SELECT id FROM {name})"
+            )
+        )
+        await conn.execute(
+            text(f"ALTER TABLE wallets DETACH PARTITION {name}")
+        )
+        await conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+
+async def maintain_wallet_partitions() -> None:
+    """Create the coming partitions and drop the expired ones, if any."""
+    async with get_async_engine().begin() as conn:
+        # concurrent maintenance of several app processes waits, it
+        # finds the partitions created in the meantime
+        await conn.execute(
+            text(
+                "SELECT pg_advisory_xact_lock(hashtext('wallet_partitions'))"
+            )
+        )
+        # wallets are locked for a moment by DETACH, give up rather than
+        # queue the queries on wallets behind a long running one
+        await conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        bounds = await get_upper_bounds(conn)
+        if bounds is None:
+            logger.warning("Wallets are not partitioned, nothing to maintain")
+            return
+        # same clock as the created_at default
+        now = await conn.scalar(text("SELECT localtimestamp"))
+        created = await create_wallet_partitions(
+            conn,
+            bounds,
+            now=now,
+            months_ahead=settings.WALLET_PARTITIONS_AHEAD,
+        )
+        dropped = []
+        if settings.WALLET_RETENTION_MONTHS is not None:
+            dropped = await drop_expired_wallet_partitions(
+                conn,
+                bounds,
+                now=now,
+                retention_months=settings.WALLET_RETENTION_MONTHS,
+            )
+    if created or dropped:
+        logger.info(
+            "Created wallet partitions %s, dropped %s", created, dropped
+        )
+
+
+async def run_partition_maintenance(interval: float) -> None:
+    while True:
+        try:
+            await maintain_wallet_partitions()
+        except Exception:
+            # e.g. the lock timeout, retried after interval
+            logger.exception("Failed to maintain wallet partitions")
+        await asyncio.sleep(interval)
+
+
+def start_partition_maintenance() -> None:
+    """Maintain the wallet partitions in the background, if enabled."""
+    global _maintenance
+    if settings.WALLET_PARTITION_MAINTENANCE_ENABLED and _maintenance is None:
+        _maintenance = asyncio.create_task(
+            run_partition_maintenance(
+                settings.WALLET_PARTITION_MAINTENANCE_INTERVAL
+            )
+        )
+
+
+async def stop_partition_maintenance() -> None:
+    """Stop the background maintenance if it was started."""
+    global _maintenance
+    if _maintenance is not None:
+        _maintenance.cancel()
+        try:
+            await _maintenance
+        except asyncio.CancelledError:
+            pass
+        _maintenance = None
+
+
+async def main() -> None:
+    await maintain_wallet_partitions()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import math
+import secrets
+from collections import deque
+from typing import Any
+from typing import Iterable
+
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.wallets.constants import CurrencyThreeLetterSymbol
+from zeply_python_challenge.wallets.exceptions import DerivationPoolSaturated
+from zeply_python_challenge.wallets.executor import get_derivation_executor
+from zeply_python_challenge.wallets.utils import derive_from_entropy
+
+logger = logging.getLogger(__name__)
+
+
+class WalletPool:
+    """Keep wallets derived in advance, ready to be handed out.
+
+    A background task tops the pool up to ``high_water`` wallets per
+    symbol, deriving at most ``refill_rate`` wallets per second and only
+    when the derivation executor has idle workers, so refilling never
+    competes with derivations requested by clients.
+
+    Wallets, including their private keys, live only in the memory of
+    the current process and are dropped on shutdown. They are kept
+    encrypted with AES-GCM, like in RestoreCache, under a random key of
+    the pool which never leaves the process. ``pop`` takes a wallet out
+    of the pool synchronously, so a wallet can not be handed out twice.
+    """
+
+    # seconds to wait when the derivation executor is busy
+    busy_delay = 0.1
+
+    def __init__(
+        self,
+        *,
+        symbols: Iterable[str],
+        high_water: int,
+        low_water: int,
+        refill_rate: float,
+    ) -> None:
+        self.high_water = high_water
+        self.low_water = low_water
+        self.refill_rate = refill_rate
+        # pycryptodome is imported with the pool, created on the app
+        # startup, rather than on the module import
+        from Crypto.Cipher import AES
+
+        self._aes = AES
+        self._key = secrets.token_bytes(32)
+        # nonce, tag and ciphertext of every ready wallet
+        self._wallets: dict[str, deque[bytes]] = {
+            symbol: deque() for symbol in symbols
+        }
+        self._below_low_water = set(self._wallets)
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self.hits = 0
+        self.misses = 0
+        self.refilled = 0
+        self.low_water_alarms = 0
+
+    def size(self, symbol: str) -> int:
+        """Return the number of wallets ready for the symbol."""
+        return len(self._wallets.get(symbol, ()))
+
+    def pop(self, symbol: str) -> dict[str, Any] | None:
+        """Take a ready wallet out of the pool, None if there is none."""
+        wallets = self._wallets.get(symbol)
+        if not wallets:
+            self.misses += 1
+            self._wakeup.set()
+            return None
+        wallet_data = self._decrypt(wallets.popleft())
+        self.hits += 1
+        if len(wallets) < self.low_water:
+            self._alarm_low_water(symbol)
+        self._wakeup.set()
+        return wallet_data
+
+    def _alarm_low_water(self, symbol: str) -> None:
+        """Warn once each time the pool of the symbol runs low."""
+        if symbol in self._below_low_water:
+            return
+        self._below_low_water.add(symbol)
+        self.low_water_alarms += 1
+        logger.warning(
+            "%s wallet pool is below the low-water mark: %d < %d",
+            symbol,
+            self.size(symbol),
+            self.low_water,
+        )
+
+    def _encrypt(self, wallet_data: dict[str, Any]) -> bytes:
+        cipher = self._aes.new(
+            self._key, self._aes.MODE_GCM, nonce=secrets.token_bytes(12)
+        )
+        ciphertext, tag = cipher.encrypt_and_digest(
+            json.dumps(wallet_data).encode()
+        )
+        return cipher.nonce + tag + ciphertext
+
+    def _decrypt(self, value: bytes) -> dict[str, Any]:
+        nonce, tag, ciphertext = value[:12], value[12:28], value[28:]
+        cipher = self._aes.new(self._key, self._aes.MODE_GCM, nonce=nonce)
+        return json.loads(cipher.decrypt_and_verify(ciphertext, tag))
+
+    def put(self, symbol: str, wallets: Iterable[dict[str, Any]]) -> None:
+        """Encrypt and add derived wallets to the pool."""
+        pool = self._wallets[symbol]
+        pool.extend(self._encrypt(wallet_data) for wallet_data in wallets)
+        if len(pool) >= self.low_water:
+            self._below_low_water.discard(symbol)
+
+    async def refill(self, symbol: str) -> int:
+        """Derive up to one second worth of missing wallets for the symbol.
+
+        Wallets are derived one per derivation executor call, each only
+        when the executor has an idle worker, so a client derivation never
+        waits for more than one refill derivation.
+
+        Returns: the number of wallets added
+        """
+        executor = get_derivation_executor()
+        loop = asyncio.get_running_loop()
+        added = 0
+        for _ in range(math.ceil(self.refill_rate)):
+            if (
+                self.size(symbol) >= self.high_water
+                or executor.in_flight >= executor.max_workers
+            ):
+                break
+            started = loop.time()
+            wallet_data = await executor.run(
+                derive_from_entropy,
+                symbol,
+                strength=settings.WALLET_ENTROPY_STRENGTH,
+                language=settings.WALLET_MNEMONIC_PHRASE_LANGUAGE,
+                accounts=settings.WALLET_DERIVATION_ACCOUNTS,
+            )
+            self.put(symbol, [wallet_data])
+            self.refilled += 1
+            added += 1
+            # keep the refill rate under the limit
+            await asyncio.sleep(
+                max(0.0, 1 / self.refill_rate - (loop.time() - started))
+            )
+        return added
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            if all(
+                len(wallets) >= self.high_water
+                for wallets in self._wallets.values()
+            ):
+                await self._wakeup.wait()
+                continue
+            added = 0
+            for symbol in self._wallets:
+                try:
+                    added += await self.refill(symbol)
+                except DerivationPoolSaturated:
+                    pass
+                except Exception:
+                    logger.exception("Failed to refill %s wallet pool", symbol)
+            if not added:
+                await asyncio.sleep(self.busy_delay)
+
+    def start(self) -> None:
+        """Start refilling the pool in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop refilling and drop all ready wallets."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for wallets in self._wallets.values():
+            wallets.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return pool metrics."""
+        return {
+            "size": {symbol: len(w) for symbol, w in self._wallets.items()},
+            "hits": self.hits,
+            "misses": self.misses,
+            "refilled": self.refilled,
+            "low_water_alarms": self.low_water_alarms,
+        }
+
+
+_pool: WalletPool | None = None
+
+
+def get_wallet_pool() -> WalletPool | None:
+    """Return the process-wide wallet pool, None unless it is enabled."""
+    return _pool
+
+
+def start_wallet_pool() -> None:
+    """Create and start the process-wide wallet pool if it is enabled."""
+    global _pool
+    if settings.WALLET_POOL_ENABLED and _pool is None:
+        _pool = WalletPool(
+            symbols=[symbol.value for symbol in CurrencyThreeLetterSymbol],
+            high_water=settings.WALLET_POOL_HIGH_WATER,
+            low_water=settings.WALLET_POOL_LOW_WATER,
+            refill_rate=settings.WALLET_POOL_REFILL_RATE,
+        )
+        _pool.start()
+
+
+async def stop_wallet_pool() -> None:
+    """Stop the process-wide wallet pool if it was started."""
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
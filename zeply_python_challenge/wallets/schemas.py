@@ -1,17 +1,23 @@
 import datetime
+from typing import Any
 
 from pydantic import BaseModel
+from pydantic import Field
+from pydantic import root_validator
 
+from zeply_python_challenge.config import settings
 from zeply_python_challenge.wallets.constants import CurrencyThreeLetterSymbol
+from zeply_python_challenge.wallets.constants import WalletJobStatus
 
 
 class Addresses(BaseModel):
     p2pkh: str
     p2sh: str
-    p2wpkh: str
-    p2wpkh_in_p2sh: str
-    p2wsh: str
-    p2wsh_in_p2sh: str
+    # None for currencies without segwit, e.g. DOGE
+    p2wpkh: str | None
+    p2wpkh_in_p2sh: str | None
+    p2wsh: str | None
+    p2wsh_in_p2sh: str | None
 
 
 class CreatedWalletInResponse(BaseModel):
@@ -41,6 +47,26 @@ class CreatedWalletInResponse(BaseModel):
     addresses: Addresses
 
 
+class GeneratedWalletInBatchResponse(BaseModel):
+    index: int
+    id: int | None = None
+    wallet: CreatedWalletInResponse | None = None
+    error: str | None = None
+
+
+class RestoredWalletInBatchResponse(BaseModel):
+    index: int
+    wallet: CreatedWalletInResponse | None = None
+    error: str | None = None
+
+
+class DerivedAddressInResponse(BaseModel):
+    index: int
+    path: str
+    public_key: str
+    addresses: Addresses
+
+
 class FetchedWalletInResponse(BaseModel):
     currency: str
     created_at: datetime.datetime
@@ -51,5 +77,77 @@ class FetchedWalletInResponse(BaseModel):
         orm_mode = True
 
 
+class WalletByAddressInResponse(FetchedWalletInResponse):
+    id: int
+    # key of the address in addresses, e.g. "p2wpkh"
+    address_type: str
+
+
+class WalletsPageInResponse(BaseModel):
+    items: list[FetchedWalletInResponse]
+    next: str | None = None
+    next_url: str | None = None
+
+
 class GenerateWalletParametersInRequest(BaseModel):
+    currency: CurrencyThreeLetterSymbol | None = None
+    # derive wallets of all the currencies from a single seed
+    currencies: list[CurrencyThreeLetterSymbol] | None = Field(
+        None, min_items=1, unique_items=True
+    )
+
+    @root_validator(skip_on_failure=True)
+    def check_currency_or_currencies(
+        cls, values: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Require exactly one of currency and currencies."""
+        if (values["currency"] is None) == (values["currencies"] is None):
+            raise ValueError("Pass either currency or currencies")
+        return values
+
+
+class GenerateWalletsBatchParametersInRequest(BaseModel):
     currency: CurrencyThreeLetterSymbol
+    count: int = Field(..., gt=0, le=settings.MAX_WALLETS_PER_BATCH)
+
+
+class RestoreWalletItemInRequest(BaseModel):
+    seed: str | None = None
+    mnemonic: str | None = None
+
+    @root_validator(skip_on_failure=True)
+    def check_seed_or_mnemonic(cls, values: dict[str, Any]) -> dict[str, Any]:
+        """Require exactly one of seed and mnemonic."""
+        if (values["seed"] is None) == (values["mnemonic"] is None):
+            raise ValueError("Pass either seed or mnemonic")
+        return values
+
+
+class RestoreWalletsBatchParametersInRequest(BaseModel):
+    currency: CurrencyThreeLetterSymbol
+    items: list[RestoreWalletItemInRequest] = Field(
+        ..., min_items=1, max_items=settings.MAX_WALLETS_PER_BATCH
+    )
+
+
+class CreateWalletJobParametersInRequest(BaseModel):
+    currency: CurrencyThreeLetterSymbol
+    count: int = Field(..., gt=0, le=settings.MAX_WALLETS_PER_JOB)
+
+
+class WalletJobInResponse(BaseModel):
+    id: int
+    currency: str
+    count: int
+    status: WalletJobStatus
+    # wallets stored, failed to generate and left to be generated so far
+    stored: int
+    failed: int
+    pending: int
+    created_at: datetime.datetime
+    cancelled_at: datetime.datetime | None
+
+
+class CreatedWalletJobInResponse(WalletJobInResponse):
+    # needed to read the generated wallets, returned only once
+    token: str
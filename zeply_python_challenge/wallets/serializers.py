@@ -0,0 +1,123 @@
+import csv
+import datetime
+import io
+from typing import Any
+from typing import AsyncIterator
+from typing import Sequence
+
+import orjson
+
+from zeply_python_challenge.wallets.models import Wallet
+from zeply_python_challenge.wallets.schemas import Addresses
+from zeply_python_challenge.wallets.schemas import CreatedWalletInResponse
+
+ADDRESS_TYPES = tuple(Addresses.__fields__)
+CREATED_WALLET_FIELDS = tuple(CreatedWalletInResponse.__fields__)
+EXPORT_CSV_COLUMNS = (
+    "id",
+    "currency",
+    "created_at",
+    "updated_at",
+    *ADDRESS_TYPES,
+)
+
+
+def _isoformat(value: datetime.datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+# Fast path: shape data as the response models would, without validating
+# it again. Key order follows the schemas, so the rendered JSON is the
+# same as the one produced through response_model.
+
+
+def shape_addresses(addresses: dict[str, Any]) -> dict[str, Any]:
+    """Return addresses shaped as Addresses."""
+    return {key: addresses[key] for key in ADDRESS_TYPES}
+
+
+def shape_created_wallet(wallet_data: dict[str, Any]) -> dict[str, Any]:
+    """Return derived wallet data shaped as CreatedWalletInResponse."""
+    shaped = {key: wallet_data.get(key) for key in CREATED_WALLET_FIELDS}
+    shaped["addresses"] = shape_addresses(wallet_data["addresses"])
+    return shaped
+
+
+def shape_fetched_wallet(wallet: Wallet) -> dict[str, Any]:
+    """Return the wallet shaped as FetchedWalletInResponse."""
+    return {
+        "currency": wallet.currency,
+        "created_at": wallet.created_at,
+        "updated_at": wallet.updated_at,
+        "addresses": shape_addresses(wallet.addresses),
+    }
+
+
+def render_fetched_wallet(wallet: Wallet) -> bytes:
+    """Return JSON of the wallet shaped as FetchedWalletInResponse."""
+    return orjson.dumps(shape_fetched_wallet(wallet))
+
+
+def shape_wallets_page(
+    wallets: list[Wallet], *, next: str | None, next_url: str | None
+) -> dict[str, Any]:
+    """Return the wallets page shaped as WalletsPageInResponse."""
+    return {
+        "items": [shape_fetched_wallet(wallet) for wallet in wallets],
+        "next": next,
+        "next_url": next_url,
+    }
+
+
+def wallet_row_to_json(row: Sequence[Any]) -> bytes:
+    """Return JSON of an exported wallet row.
+
+    The row is (id, currency, created_at, updated_at, addresses), it is
+    serialized directly instead of through FetchedWalletInResponse.
+    """
+    wallet_id, currency, created_at, updated_at, addresses = row
+    return orjson.dumps(
+        {
+            "id": wallet_id,
+            "currency": currency,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "addresses": {key: addresses.get(key) for key in ADDRESS_TYPES},
+        },
+        option=orjson.OPT_APPEND_NEWLINE,
+    )
+
+
+async def iter_ndjson(
+    rows: AsyncIterator[Sequence[Any]],
+) -> AsyncIterator[bytes]:
+    """Yield wallet rows as newline delimited JSON."""
+    async for row in rows:
+        yield wallet_row_to_json(row)
+
+
+async def iter_csv(
+    rows: AsyncIterator[Sequence[Any]], *, chunk_size: int = 500
+) -> AsyncIterator[str]:
+    """Yield wallet rows as CSV with a header, chunk_size rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    written = 0
+    async for wallet_id, currency, created_at, updated_at, addresses in rows:
+        writer.writerow(
+            (
+                wallet_id,
+                currency,
+                _isoformat(created_at),
+                _isoformat(updated_at),
+                *(addresses.get(key) for key in ADDRESS_TYPES),
+            )
+        )
+        written += 1
+        if written % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
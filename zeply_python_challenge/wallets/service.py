@@ -1,50 +1,343 @@
+import asyncio
+import datetime
+import itertools
+import logging
+from collections import deque
+from contextlib import aclosing
 from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Iterable
+from typing import TypeVar
 
-from hdwallet import HDWallet
-from hdwallet.utils import generate_entropy
+from sqlalchemy import String
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import any_
+from sqlalchemy.sql import bindparam
+from sqlalchemy.sql import insert
+from sqlalchemy.sql import or_
 from sqlalchemy.sql import select
+from sqlalchemy.sql import tuple_
+from sqlalchemy.sql import update
 
 from zeply_python_challenge.config import settings
-from zeply_python_challenge.utils import make_hash
+from zeply_python_challenge.instrumentation import span
+from zeply_python_challenge.utils import make_blind_index
+from zeply_python_challenge.utils import make_verifier
+from zeply_python_challenge.utils import verify
+from zeply_python_challenge.wallets.cache import InMemoryCacheBackend
+from zeply_python_challenge.wallets.cache import RestoreCache
+from zeply_python_challenge.wallets.cache import get_restore_cache
+from zeply_python_challenge.wallets.cache import get_wallet_cache
+from zeply_python_challenge.wallets.exceptions import AccountNotDerivable
+from zeply_python_challenge.wallets.exceptions import InvalidMnemonic
 from zeply_python_challenge.wallets.exceptions import WalletEntryDoesNotExist
+from zeply_python_challenge.wallets.executor import get_derivation_executor
+from zeply_python_challenge.wallets.mnemonics import check_mnemonic
 from zeply_python_challenge.wallets.models import Wallet
+from zeply_python_challenge.wallets.models import WalletAddress
+from zeply_python_challenge.wallets.models import insert_wallet_addresses
+from zeply_python_challenge.wallets.pool import get_wallet_pool
+from zeply_python_challenge.wallets.serializers import render_fetched_wallet
+from zeply_python_challenge.wallets.utils import derive_addresses
+from zeply_python_challenge.wallets.utils import derive_from_entropy
+from zeply_python_challenge.wallets.utils import derive_from_mnemonic
+from zeply_python_challenge.wallets.utils import derive_from_seed
+from zeply_python_challenge.wallets.utils import derive_many_from_entropy
+from zeply_python_challenge.wallets.utils import derive_multi_from_entropy
+from zeply_python_challenge.wallets.utils import restore_many
+from zeply_python_challenge.wallets.writer import get_wallet_writer
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def wallet_row(symbol: str, wallet_data: dict[str, Any]) -> dict[str, Any]:
+    """Return column values of the wallet to be stored in the database."""
+    # for the simplicity we are using only one address
+    return dict(
+        addresses=wallet_data["addresses"],
+        currency=symbol,
+        mnemonic=make_blind_index(value=wallet_data["mnemonic"]),
+        seed=make_blind_index(value=wallet_data["seed"]),
+        seed_verifier=wallet_data.get("seed_verifier"),
+        account_xpublic_keys=wallet_data.get("account_xpublic_keys"),
+    )
 
 
 async def generate_wallet(
     sess: AsyncSession, *, symbol: str
 ) -> dict[str, Any]:
-    """Generate new wallet."""
-    entropy = generate_entropy(strength=settings.WALLET_ENTROPY_STRENGTH)
+    """Generate new wallet.
 
-    wallet = HDWallet(symbol=symbol)
-    wallet.from_entropy(
-        entropy=entropy, language=settings.WALLET_MNEMONIC_PHRASE_LANGUAGE
-    )
-    wallet_data = wallet.dumps()
-    # for the simplicity we are using only one address
-    wallet_in_db = Wallet()
-    wallet_in_db.addresses = wallet_data["addresses"]
-    wallet_in_db.currency = symbol
-    # TODO: find a better way to store wallet unified identity
-    #  tips: authorized users, sign with a master key, encrypt with better algo
-    #  than is used in the function below
-    wallet_in_db.mnemonic = make_hash(value=wallet_data["mnemonic"])
-    wallet_in_db.seed = make_hash(value=wallet_data["seed"])
+    A wallet derived in advance is taken from the wallet pool when it is
+    enabled and not empty. With write-behind enabled the wallet is
+    handed to the wallet writer instead of being stored in the session.
+    """
+    pool = get_wallet_pool()
+    wallet_data = pool.pop(symbol) if pool is not None else None
+    if wallet_data is None:
+        wallet_data = await get_derivation_executor().run(
+            derive_from_entropy,
+            symbol,
+            strength=settings.WALLET_ENTROPY_STRENGTH,
+            language=settings.WALLET_MNEMONIC_PHRASE_LANGUAGE,
+            accounts=settings.WALLET_DERIVATION_ACCOUNTS,
+        )
+    row = wallet_row(symbol, wallet_data)
+    writer = get_wallet_writer()
+    if writer is not None:
+        await writer.write(row)
+        return wallet_data
 
+    wallet_in_db = Wallet(**row)
     sess.add(wallet_in_db)
-    await sess.commit()
+    await _add_wallet_addresses(sess, [wallet_in_db])
+    with span("commit"):
+        await sess.commit()
     return wallet_data
 
 
+async def _add_wallet_addresses(
+    sess: AsyncSession, wallets: list[Wallet]
+) -> None:
+    """Flush the wallets, then insert their addresses in the session."""
+    await sess.flush()
+    stmt = insert_wallet_addresses(
+        {wallet.id: wallet.addresses for wallet in wallets}
+    )
+    if stmt is not None:
+        await sess.execute(stmt)
+
+
+async def generate_multi_currency_wallets(
+    sess: AsyncSession, *, symbols: list[str]
+) -> list[dict[str, Any]]:
+    """Generate wallets of all the currencies from a single seed.
+
+    The wallets are stored in one transaction, all or none, so they
+    bypass the wallet pool and the wallet writer.
+
+    Returns: wallet data of every currency, in the order of symbols
+    """
+    wallets = await get_derivation_executor().run(
+        derive_multi_from_entropy,
+        symbols,
+        strength=settings.WALLET_ENTROPY_STRENGTH,
+        language=settings.WALLET_MNEMONIC_PHRASE_LANGUAGE,
+        accounts=settings.WALLET_DERIVATION_ACCOUNTS,
+    )
+    wallets_in_db = [
+        Wallet(**wallet_row(symbol, wallet_data))
+        for symbol, wallet_data in zip(symbols, wallets)
+    ]
+    sess.add_all(wallets_in_db)
+    await _add_wallet_addresses(sess, wallets_in_db)
+    with span("commit"):
+        await sess.commit()
+    return wallets
+
+
+async def _store_wallets(
+    sess: AsyncSession, *, symbol: str, items: list[dict[str, Any]]
+) -> None:
+    """Store derived wallets of the items with a single INSERT.
+
+    Items get the id of their stored wallet, or an error when the INSERT
+    failed.
+    """
+    rows = {
+        i: wallet_row(symbol, item["wallet"])
+        for i, item in enumerate(items)
+        if "wallet" in item
+    }
+    if not rows:
+        return
+    stmt = (
+        insert(Wallet)
+        .values(list(rows.values()))
+        .returning(Wallet.id, Wallet.seed)
+    )
+    try:
+        res = await sess.execute(stmt)
+        # postgres does not promise the RETURNING order for multi-row
+        # inserts, so ids are matched by the (unique) seed hash
+        ids = {seed: wallet_id for wallet_id, seed in res.all()}
+        addresses_stmt = insert_wallet_addresses(
+            {ids[row["seed"]]: row["addresses"] for row in rows.values()}
+        )
+        if addresses_stmt is not None:
+            await sess.execute(addresses_stmt)
+        with span("commit"):
+            await sess.commit()
+    except SQLAlchemyError:
+        logger.exception("Failed to store %d wallets", len(rows))
+        await sess.rollback()
+        for i in rows:
+            del items[i]["wallet"]
+            items[i]["error"] = "Failed to store the wallet."
+        return
+    for i, row in rows.items():
+        items[i]["id"] = ids[row["seed"]]
+
+
+async def generate_wallets(
+    sess: AsyncSession, *, symbol: str, count: int
+) -> AsyncIterator[dict[str, Any]]:
+    """Generate count new wallets, yield them as they are stored.
+
+    Wallets are derived in chunks of WALLETS_BATCH_CHUNK_SIZE, one
+    derivation executor call each and at most one chunk per derivation
+    worker at a time, so derivations of other requests are not stuck
+    behind the whole batch. Every chunk is stored with a single INSERT
+    once it is derived. A wallet which failed to derive, e.g. because the
+    derivation pool is saturated, or to be stored is reported with an
+    error instead of aborting the whole batch.
+
+    Yields:
+        Dicts with the item index and either the wallet id and data or
+        an error message, in the index order.
+    """
+    executor = get_derivation_executor()
+    chunk_size = settings.WALLETS_BATCH_CHUNK_SIZE
+    sizes = [min(chunk_size, count - i) for i in range(0, count, chunk_size)]
+
+    def derive(size: int) -> Awaitable[Any]:
+        return executor.run(
+            derive_many_from_entropy,
+            symbol,
+            count=size,
+            strength=settings.WALLET_ENTROPY_STRENGTH,
+            language=settings.WALLET_MNEMONIC_PHRASE_LANGUAGE,
+            accounts=settings.WALLET_DERIVATION_ACCOUNTS,
+        )
+
+    index = 0
+    async with aclosing(_derive_in_order(derive, sizes)) as chunks:
+        async for size, chunk in chunks:
+            if isinstance(chunk, Exception):
+                chunk = [(None, str(chunk))] * size
+            items: list[dict[str, Any]] = []
+            for wallet_data, error in chunk:
+                item: dict[str, Any] = {"index": index}
+                if error is not None:
+                    item["error"] = error
+                else:
+                    item["wallet"] = wallet_data
+                items.append(item)
+                index += 1
+            await _store_wallets(sess, symbol=symbol, items=items)
+            for item in items:
+                yield item
+
+
+async def _derive_in_order(
+    derive: Callable[[T], Awaitable[Any]], chunks: Iterable[T]
+) -> AsyncIterator[tuple[T, Any]]:
+    """Derive chunks concurrently, yield (chunk, result) in chunk order.
+
+    At most one chunk per derivation worker is derived at a time, so
+    derivations of other requests are not stuck behind the whole batch.
+    A failed derivation yields its exception as the result.
+    """
+    chunks = iter(chunks)
+    pending = deque(
+        (chunk, asyncio.ensure_future(derive(chunk)))
+        for chunk in itertools.islice(
+            chunks, get_derivation_executor().max_workers
+        )
+    )
+    try:
+        while pending:
+            chunk, future = pending.popleft()
+            try:
+                result = await future
+            except Exception as e:
+                result = e
+            next_chunk = next(chunks, None)
+            if next_chunk is not None:
+                pending.append(
+                    (next_chunk, asyncio.ensure_future(derive(next_chunk)))
+                )
+            yield chunk, result
+    finally:
+        # the client went away, do not derive what nobody will receive
+        for _, future in pending:
+            future.cancel()
+
+
 async def get_all_wallets(
-    sess: AsyncSession, *, offset: int = 0, limit: int = 10
+    sess: AsyncSession,
+    *,
+    limit: int = 10,
+    offset: int | None = None,
+    after: tuple[datetime.datetime, int] | None = None,
+    created_from: datetime.datetime | None = None,
+    created_to: datetime.datetime | None = None,
 ) -> list[Wallet]:
-    stmt = select(Wallet).offset(offset).limit(limit)
+    """Return wallets ordered by (created_at, id).
+
+    Wallets are paged by keyset, i.e. the ones following the given
+    (created_at, id) pair are returned, unless an offset is given. Only
+    the partitions of wallets created from created_from (inclusive) to
+    created_to (exclusive) are scanned.
+    """
+    stmt = select(Wallet).order_by(Wallet.created_at, Wallet.id).limit(limit)
+    if offset is not None:
+        stmt = stmt.offset(offset)
+    elif after is not None:
+        stmt = stmt.where(
+            tuple_(Wallet.created_at, Wallet.id) > tuple_(*after),
+            # the row comparison does not prune partitions, this does
+            Wallet.created_at >= after[0],
+        )
+    if created_from is not None:
+        stmt = stmt.where(Wallet.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Wallet.created_at < created_to)
     res = await sess.execute(stmt)
     return res.scalars().all()
 
 
+async def stream_wallets(
+    sess: AsyncSession,
+    *,
+    currency: str | None = None,
+    created_from: datetime.datetime | None = None,
+    created_to: datetime.datetime | None = None,
+) -> AsyncIterator[Row[Any]]:
+    """Yield (id, currency, created_at, updated_at, addresses) rows.
+
+    Rows are read through a server side cursor, EXPORT_YIELD_PER at a
+    time, so memory use does not depend on the number of wallets.
+    """
+    stmt = (
+        select(
+            Wallet.id,
+            Wallet.currency,
+            Wallet.created_at,
+            Wallet.updated_at,
+            Wallet.addresses,
+        )
+        .order_by(Wallet.created_at, Wallet.id)
+        .execution_options(yield_per=settings.EXPORT_YIELD_PER)
+    )
+    if currency is not None:
+        stmt = stmt.where(Wallet.currency == currency)
+    if created_from is not None:
+        stmt = stmt.where(Wallet.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Wallet.created_at < created_to)
+    res = await sess.stream(stmt)
+    async for row in res:
+        yield row
+
+
 async def get_wallet_by_id(
     sess: AsyncSession, *, wallet_id: int
 ) -> Wallet | None:
@@ -53,41 +346,427 @@ async def get_wallet_by_id(
     return res.scalar()
 
 
-async def get_by_seed(sess: AsyncSession, *, seed: str) -> Wallet | None:
-    stmt = select(Wallet).where(Wallet.seed == seed)
+async def get_wallet_by_address(
+    sess: AsyncSession, *, address: str
+) -> Row | None:
+    """Return the wallet owning the address and the address type.
+
+    Returns: Row(Wallet, type) or None when no wallet has the address
+    """
+    stmt = (
+        select(Wallet, WalletAddress.type)
+        .join(WalletAddress, WalletAddress.wallet_id == Wallet.id)
+        .where(WalletAddress.address == address)
+    )
     res = await sess.execute(stmt)
-    return res.scalar()
+    return res.first()
 
 
-async def get_by_mnemonic(
-    sess: AsyncSession, *, mnemonic: str
-) -> Wallet | None:
-    stmt = select(Wallet).where(Wallet.mnemonic == mnemonic)
+async def get_rendered_wallet(
+    sess: AsyncSession, *, wallet_id: int
+) -> bytes | None:
+    """Return JSON of the wallet shaped as FetchedWalletInResponse.
+
+    Rendered wallets are kept in the wallet cache when it is enabled, a
+    cached one is returned without querying the database.
+    """
+    cache = get_wallet_cache()
+    if cache is not None:
+        body = cache.get(wallet_id)
+        if body is not None:
+            return body
+    wallet = await get_wallet_by_id(sess, wallet_id=wallet_id)
+    if wallet is None:
+        return None
+    body = render_fetched_wallet(wallet)
+    if cache is not None:
+        cache.set(wallet_id, body)
+    return body
+
+
+# wallets never change, so their account keys are cached without a TTL
+_account_keys_cache = InMemoryCacheBackend(
+    max_entries=settings.ACCOUNT_XPUBLIC_KEYS_CACHE_SIZE
+)
+
+
+async def get_account_xpublic_key(
+    sess: AsyncSession, *, wallet_id: int, account: int
+) -> tuple[str, str]:
+    """Return currency and xpublic key of the wallet account.
+
+    Raises:
+        WalletEntryDoesNotExist: when there is no such wallet
+        AccountNotDerivable: when the account key was not stored
+    """
+    cache_key = f"{wallet_id}:{account}"
+    cached = _account_keys_cache.get(cache_key)
+    if cached is not None:
+        symbol, xpub = cached.decode().split(":")
+        return symbol, xpub
+
+    stmt = select(Wallet.currency, Wallet.account_xpublic_keys).where(
+        Wallet.id == wallet_id
+    )
     res = await sess.execute(stmt)
-    return res.scalar()
+    row = res.first()
+    if row is None:
+        raise WalletEntryDoesNotExist("Wallet does not exist.")
+    symbol, keys = row
+    xpub = (keys or {}).get(str(account))
+    if xpub is None:
+        raise AccountNotDerivable("Account addresses can not be derived.")
+    _account_keys_cache.set(
+        cache_key, f"{symbol}:{xpub}".encode(), ttl=float("inf")
+    )
+    return symbol, xpub
+
+
+async def iter_account_addresses(
+    symbol: str,
+    *,
+    account_xpublic_key: str,
+    account: int,
+    change: int,
+    start: int,
+    count: int,
+) -> AsyncIterator[dict[str, Any]]:
+    """Yield count addresses of the account, from the start index on.
+
+    Addresses are derived on the derivation executor in chunks of
+    ADDRESSES_DERIVATION_CHUNK_SIZE, each chunk is yielded as soon as it
+    is ready.
+    """
+    executor = get_derivation_executor()
+    chunk_size = settings.ADDRESSES_DERIVATION_CHUNK_SIZE
+    for chunk_start in range(start, start + count, chunk_size):
+        addresses = await executor.run(
+            derive_addresses,
+            symbol,
+            account_xpublic_key=account_xpublic_key,
+            account=account,
+            change=change,
+            start=chunk_start,
+            count=min(chunk_size, start + count - chunk_start),
+        )
+        for address in addresses:
+            yield address
+
+
+async def find_by_seed(sess: AsyncSession, *, seed: str) -> Row[Any] | None:
+    """Return (id, seed_verifier) of the wallet with the seed blind index."""
+    stmt = select(Wallet.id, Wallet.seed_verifier).where(Wallet.seed == seed)
+    res = await sess.execute(stmt.limit(1))
+    return res.first()
+
+
+async def find_by_mnemonic(
+    sess: AsyncSession, *, mnemonic: str
+) -> Row[Any] | None:
+    """Return (id, seed_verifier) of the wallet with the mnemonic index."""
+    stmt = select(Wallet.id, Wallet.seed_verifier).where(
+        Wallet.mnemonic == mnemonic
+    )
+    res = await sess.execute(stmt.limit(1))
+    return res.first()
+
+
+async def _verify_seed(sess: AsyncSession, found: Row[Any], seed: str) -> None:
+    """Check the seed against the verifier of the found wallet.
+
+    Wallets stored before verifiers were introduced get one instead.
+
+    Raises:
+        WalletEntryDoesNotExist: when the seed does not match
+    """
+    wallet_id, seed_verifier = found
+    executor = get_derivation_executor()
+    if seed_verifier is None:
+        seed_verifier = await executor.run(make_verifier, value=seed)
+        await sess.execute(
+            update(Wallet)
+            .where(Wallet.id == wallet_id)
+            .values(seed_verifier=seed_verifier)
+        )
+        with span("commit"):
+            await sess.commit()
+        # updated_at of the wallet has changed
+        cache = get_wallet_cache()
+        if cache is not None:
+            cache.invalidate(wallet_id)
+    elif not await executor.run(verify, value=seed, verifier=seed_verifier):
+        raise WalletEntryDoesNotExist("Wallet does not exist.")
+
+
+def _restore_cache_key(kind: str, symbol: str, hashed_value: str) -> str:
+    symbol = getattr(symbol, "value", symbol)
+    return f"{kind}:{symbol}:{hashed_value}"
+
+
+async def _find_cached(
+    sess: AsyncSession,
+    cache: RestoreCache | None,
+    cache_key: str,
+    index: str,
+    kind: str,
+) -> Row[Any]:
+    """Return (id, seed_verifier) of the wallet with the blind index.
+
+    Run on cache hits too, the index lookup is cheap next to the verifier
+    and the derivation saved by the cache, but a cached wallet may have
+    been dropped with its partition or deleted since. Its entry is evicted
+    then.
+
+    Raises:
+        WalletEntryDoesNotExist: when no stored wallet has the index
+    """
+    if kind == "seed":
+        found = await find_by_seed(sess, seed=index)
+    else:
+        found = await find_by_mnemonic(sess, mnemonic=index)
+    if found is None:
+        if cache is not None:
+            cache.invalidate(cache_key)
+        raise WalletEntryDoesNotExist("Wallet does not exist.")
+    return found
 
 
 async def restore_from_seed(
     sess: AsyncSession, *, symbol: str, seed: str
 ) -> dict[str, Any]:
-    # check if that wallet exists in the database
-    hashed_seed = make_hash(value=seed)
-    wallet_in_db = await get_by_seed(sess, seed=hashed_seed)
-    if not wallet_in_db:
-        raise WalletEntryDoesNotExist("Wallet does not exist.")
+    """Restore the stored wallet from its seed.
+
+    The wallet is found by the blind index of the seed, and the seed is
+    checked against the verifier of that single wallet before deriving.
+    Cached wallets are returned only while they are still stored.
 
-    wallet = HDWallet(symbol=symbol).from_seed(seed)
-    return wallet.dumps()
+    Raises:
+        WalletEntryDoesNotExist: when no stored wallet has the seed
+    """
+    seed_index = make_blind_index(value=seed)
+    cache = get_restore_cache()
+    cache_key = _restore_cache_key("seed", symbol, seed_index)
+    found = await _find_cached(sess, cache, cache_key, seed_index, "seed")
+    if cache is not None:
+        wallet_data = cache.get(cache_key, secret=seed)
+        if wallet_data is not None:
+            return wallet_data
+
+    await _verify_seed(sess, found, seed)
+
+    wallet_data = await get_derivation_executor().run(
+        derive_from_seed, symbol, seed=seed
+    )
+    if cache is not None:
+        cache.set(cache_key, wallet_data, secret=seed)
+    return wallet_data
+
+
+def _check_mnemonic(mnemonic: str) -> str:
+    with span("mnemonic_check"):
+        return check_mnemonic(
+            mnemonic, language=settings.WALLET_MNEMONIC_PHRASE_LANGUAGE
+        )
 
 
 async def restore_from_mnemonic(
     sess: AsyncSession, *, symbol: str, mnemonic: str
 ) -> dict[str, Any]:
-    # check if that wallet exists in the database
-    hashed_mnemonic = make_hash(value=mnemonic)
-    wallet_in_db = await get_by_mnemonic(sess, mnemonic=hashed_mnemonic)
-    if not wallet_in_db:
-        raise WalletEntryDoesNotExist("Wallet does not exist.")
+    """Restore the stored wallet from its mnemonic.
+
+    The wallet is found by the blind index of the mnemonic, and the seed
+    derived from the mnemonic is checked against the verifier of that
+    single wallet.
+
+    The mnemonic is normalized and checked first, so malformed input
+    costs neither the hashing, the query nor the key stretching. Cached
+    wallets are returned only while they are still stored.
+
+    Raises:
+        InvalidMnemonic: when the mnemonic is not a valid BIP39 phrase
+        WalletEntryDoesNotExist: when no stored wallet has the mnemonic
+    """
+    mnemonic = _check_mnemonic(mnemonic)
+    mnemonic_index = make_blind_index(value=mnemonic)
+    cache = get_restore_cache()
+    cache_key = _restore_cache_key("mnemonic", symbol, mnemonic_index)
+    found = await _find_cached(
+        sess, cache, cache_key, mnemonic_index, "mnemonic"
+    )
+    if cache is not None:
+        wallet_data = cache.get(cache_key, secret=mnemonic)
+        if wallet_data is not None:
+            return wallet_data
+
+    wallet_data = await get_derivation_executor().run(
+        derive_from_mnemonic, symbol, mnemonic=mnemonic
+    )
+    await _verify_seed(sess, found, wallet_data["seed"])
+    if cache is not None:
+        cache.set(cache_key, wallet_data, secret=mnemonic)
+    return wallet_data
+
+
+async def _find_many(
+    sess: AsyncSession, *, seeds: list[str], mnemonics: list[str]
+) -> dict[tuple[str, str], Row[Any]]:
+    """Return (id, seed_verifier) of wallets by seed and mnemonic indexes.
+
+    All the blind indexes are resolved with a single query, the wallets
+    are keyed by ("seed", index) and ("mnemonic", index).
+    """
+    criteria = [
+        column == any_(bindparam(kind, values, type_=ARRAY(String)))
+        for kind, column, values in (
+            ("seeds", Wallet.seed, seeds),
+            ("mnemonics", Wallet.mnemonic, mnemonics),
+        )
+        if values
+    ]
+    if not criteria:
+        return {}
+    stmt = select(
+        Wallet.id, Wallet.seed, Wallet.mnemonic, Wallet.seed_verifier
+    ).where(or_(*criteria))
+    found: dict[tuple[str, str], Row[Any]] = {}
+    for row in await sess.execute(stmt):
+        # wallets derived from one seed share the indexes, any will do
+        found.setdefault(("seed", row.seed), row)
+        found.setdefault(("mnemonic", row.mnemonic), row)
+    return found
+
+
+async def _store_seed_verifiers(
+    sess: AsyncSession, verifiers: dict[int, str]
+) -> None:
+    """Store verifiers of wallets restored for the first time by id.
+
+    A failure is only logged, the wallets get verifiers on their next
+    restore.
+    """
+    stmt = (
+        update(Wallet.__table__)
+        .where(Wallet.id == bindparam("wallet_id"))
+        .values(seed_verifier=bindparam("seed_verifier"))
+    )
+    try:
+        await sess.execute(
+            stmt,
+            [
+                {"wallet_id": wallet_id, "seed_verifier": seed_verifier}
+                for wallet_id, seed_verifier in verifiers.items()
+            ],
+        )
+        with span("commit"):
+            await sess.commit()
+    except SQLAlchemyError:
+        logger.exception("Failed to store %d seed verifiers", len(verifiers))
+        await sess.rollback()
+        return
+    cache = get_wallet_cache()
+    if cache is not None:
+        for wallet_id in verifiers:
+            cache.invalidate(wallet_id)
+
+
+async def restore_wallets(
+    sess: AsyncSession, *, symbol: str, items: list[tuple[str, str]]
+) -> AsyncIterator[dict[str, Any]]:
+    """Restore stored wallets from their seeds or mnemonics.
+
+    Items are (kind, secret) with the kind being "seed" or "mnemonic".
+    Malformed mnemonics are rejected up front, see check_mnemonic.
+    Wallets of the other items are found with a single query, cached ones
+    included as they may not be stored anymore, then the uncached ones are
+    derived and checked against their seed verifiers in chunks of
+    WALLETS_BATCH_CHUNK_SIZE, like in generate_wallets. A wallet which
+    was not found or failed to derive is reported with an error instead
+    of aborting the whole batch.
+
+    Yields:
+        Dicts with the item index and either the wallet data or an error
+        message, in the index order.
+    """
+    not_found = "Wallet does not exist."
+    cache = get_restore_cache()
+    results: dict[int, dict[str, Any]] = {}
+    items = list(items)
+    for i, (kind, secret) in enumerate(items):
+        if kind != "mnemonic":
+            continue
+        try:
+            items[i] = (kind, _check_mnemonic(secret))
+        except InvalidMnemonic:
+            results[i] = {"index": i, "error": "Invalid mnemonic phrase."}
+    indexes = {
+        i: make_blind_index(value=secret)
+        for i, (_, secret) in enumerate(items)
+        if i not in results
+    }
+    found = await _find_many(
+        sess,
+        seeds=[indexes[i] for i in indexes if items[i][0] == "seed"],
+        mnemonics=[indexes[i] for i in indexes if items[i][0] == "mnemonic"],
+    )
+    to_restore = []
+    for i in indexes:
+        kind, secret = items[i]
+        cache_key = _restore_cache_key(kind, symbol, indexes[i])
+        row = found.get((kind, indexes[i]))
+        if row is None:
+            if cache is not None:
+                cache.invalidate(cache_key)
+            results[i] = {"index": i, "error": not_found}
+            continue
+        wallet_data = (
+            cache.get(cache_key, secret=secret) if cache is not None else None
+        )
+        if wallet_data is not None:
+            results[i] = {"index": i, "wallet": wallet_data}
+        else:
+            to_restore.append((i, row))
+
+    executor = get_derivation_executor()
+    chunk_size = settings.WALLETS_BATCH_CHUNK_SIZE
+    chunks = [
+        to_restore[i : i + chunk_size]
+        for i in range(0, len(to_restore), chunk_size)
+    ]
+
+    def derive(chunk: list[tuple[int, Row[Any]]]) -> Awaitable[Any]:
+        return executor.run(
+            restore_many,
+            symbol,
+            [(*items[i], row.seed_verifier) for i, row in chunk],
+        )
 
-    wallet = HDWallet(symbol=symbol).from_mnemonic(mnemonic)
-    return wallet.dumps()
+    next_index = 0
+    async with aclosing(_derive_in_order(derive, chunks)) as restored:
+        async for chunk, chunk_restored in restored:
+            if isinstance(chunk_restored, Exception):
+                error = str(chunk_restored)
+                chunk_restored = [(None, error, None)] * len(chunk)
+            verifiers = {}
+            for (i, row), (wallet_data, error, seed_verifier) in zip(
+                chunk, chunk_restored
+            ):
+                if error is not None:
+                    results[i] = {"index": i, "error": error}
+                    continue
+                results[i] = {"index": i, "wallet": wallet_data}
+                if seed_verifier is not None:
+                    verifiers[row.id] = seed_verifier
+                if cache is not None:
+                    kind, secret = items[i]
+                    cache.set(
+                        _restore_cache_key(kind, symbol, indexes[i]),
+                        wallet_data,
+                        secret=secret,
+                    )
+            if verifiers:
+                await _store_seed_verifiers(sess, verifiers)
+            while next_index in results:
+                yield results.pop(next_index)
+                next_index += 1
+    for i in range(next_index, len(items)):
+        yield results.pop(i)
@@ -0,0 +1,276 @@
+import base64
+import datetime
+import json
+from typing import TYPE_CHECKING
+from typing import Any
+
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.utils import make_verifier
+from zeply_python_challenge.utils import verify
+from zeply_python_challenge.wallets.derivation import derive_public_points
+from zeply_python_challenge.wallets.derivation import encode_addresses
+from zeply_python_challenge.wallets.derivation import generator_table
+from zeply_python_challenge.wallets.exceptions import InvalidCursor
+from zeply_python_challenge.wallets.mnemonics import mnemonic_to_entropy
+from zeply_python_challenge.wallets.mnemonics import mnemonic_to_seed
+from zeply_python_challenge.wallets.mnemonics import wordlist_index
+
+# hdwallet, with its crypto backends, is imported by the functions using
+# it rather than on the module import, which keeps it out of the app
+# import. warm_up loads it before the first request instead.
+if TYPE_CHECKING:
+    from hdwallet import HDWallet
+
+_warmed_up = False
+
+
+def warm_up() -> None:
+    """Load everything derivations need, once per process.
+
+    Imports hdwallet, checks the WALLET_CURRENCIES symbols and derives a
+    throwaway wallet, which loads the mnemonic wordlist, precomputes the
+    curve tables and sets up the argon2 backend of seed verifiers, then
+    builds the mnemonic wordlist index and the generator table of address
+    derivations. Runs on the app startup and in every process of a
+    process derivation pool, so the first requests do not pay for it.
+
+    Raises:
+        ValueError: when a WALLET_CURRENCIES symbol is unknown to hdwallet
+    """
+    global _warmed_up
+    if _warmed_up:
+        return
+    from hdwallet.cryptocurrencies import get_cryptocurrency
+
+    for symbol in settings.WALLET_CURRENCIES:
+        get_cryptocurrency(symbol=symbol)
+    derive_from_entropy(
+        settings.WALLET_CURRENCIES[0],
+        strength=settings.WALLET_ENTROPY_STRENGTH,
+        language=settings.WALLET_MNEMONIC_PHRASE_LANGUAGE,
+    )
+    wordlist_index(settings.WALLET_MNEMONIC_PHRASE_LANGUAGE)
+    generator_table()
+    _warmed_up = True
+
+
+def account_path(symbol: str, account: int) -> str:
+    """Return BIP44 derivation path of the account, i.e. m/44'/0'/0'."""
+    from hdwallet.cryptocurrencies import get_cryptocurrency
+
+    coin_type = get_cryptocurrency(symbol=symbol).COIN_TYPE
+    return f"m/44'/{coin_type}/{account}'"
+
+
+def derive_account_xpublic_keys(
+    wallet: "HDWallet", *, accounts: int
+) -> dict[str, str]:
+    """Return xpublic keys of the first BIP44 accounts of the wallet.
+
+    Addresses of an account are derived from its xpublic key with cheap
+    non-hardened steps only, see derive_addresses.
+    """
+    keys = {}
+    for account in range(accounts):
+        wallet.clean_derivation()
+        wallet.from_path(account_path(wallet.symbol(), account))
+        keys[str(account)] = wallet.xpublic_key()
+    wallet.clean_derivation()
+    return keys
+
+
+def derive_from_entropy(
+    symbol: str, *, strength: int, language: str, accounts: int = 1
+) -> dict[str, Any]:
+    """Return data of a new wallet derived from fresh random entropy.
+
+    Besides the HDWallet dump the data holds xpublic keys of the first
+    accounts under the "account_xpublic_keys" key and the verifier of the
+    seed under the "seed_verifier" key.
+    """
+    from hdwallet import HDWallet
+    from hdwallet.utils import generate_entropy
+
+    entropy = generate_entropy(strength=strength)
+    wallet = HDWallet(symbol=symbol)
+    wallet.from_entropy(entropy=entropy, language=language)
+    wallet_data = wallet.dumps()
+    wallet_data["account_xpublic_keys"] = derive_account_xpublic_keys(
+        wallet, accounts=accounts
+    )
+    wallet_data["seed_verifier"] = make_verifier(value=wallet_data["seed"])
+    return wallet_data
+
+
+# the fields HDWallet.from_seed leaves empty
+MNEMONIC_FIELDS = ("strength", "entropy", "mnemonic", "language")
+
+
+def derive_multi_from_entropy(
+    symbols: list[str], *, strength: int, language: str, accounts: int = 1
+) -> list[dict[str, Any]]:
+    """Return data of wallets of all the currencies sharing one seed.
+
+    The mnemonic is stretched into the seed and the seed verifier made
+    once, for the first currency. The others are derived from the seed,
+    their default BIP44 path and account keys differ by the coin type.
+    """
+    from hdwallet import HDWallet
+
+    first = derive_from_entropy(
+        symbols[0], strength=strength, language=language, accounts=accounts
+    )
+    wallets = [first]
+    for symbol in symbols[1:]:
+        wallet = HDWallet(symbol=symbol).from_seed(first["seed"])
+        wallet_data = wallet.dumps()
+        wallet_data.update({field: first[field] for field in MNEMONIC_FIELDS})
+        wallet_data["account_xpublic_keys"] = derive_account_xpublic_keys(
+            wallet, accounts=accounts
+        )
+        wallet_data["seed_verifier"] = first["seed_verifier"]
+        wallets.append(wallet_data)
+    return wallets
+
+
+def derive_many_from_entropy(
+    symbol: str,
+    *,
+    count: int,
+    strength: int,
+    language: str,
+    accounts: int = 1,
+) -> list[tuple[dict[str, Any] | None, str | None]]:
+    """Return data of count new wallets.
+
+    A failed derivation does not stop the others, its error message is
+    returned in place of the wallet data.
+    """
+    wallets: list[tuple[dict[str, Any] | None, str | None]] = []
+    for _ in range(count):
+        try:
+            wallet_data = derive_from_entropy(
+                symbol, strength=strength, language=language, accounts=accounts
+            )
+        except Exception as e:
+            wallets.append((None, str(e) or e.__class__.__name__))
+        else:
+            wallets.append((wallet_data, None))
+    return wallets
+
+
+def derive_from_seed(symbol: str, *, seed: str) -> dict[str, Any]:
+    """Return data of a wallet restored from the seed."""
+    from hdwallet import HDWallet
+
+    return HDWallet(symbol=symbol).from_seed(seed).dumps()
+
+
+def derive_from_mnemonic(symbol: str, *, mnemonic: str) -> dict[str, Any]:
+    """Return data of a wallet restored from the mnemonic phrase.
+
+    The mnemonic, normalized by check_mnemonic, is checked against the
+    wordlist index and stretched into the seed here; HDWallet would scan
+    the wordlists of every language instead.
+
+    Raises:
+        InvalidMnemonic: when the mnemonic is malformed
+    """
+    from hdwallet import HDWallet
+
+    language = settings.WALLET_MNEMONIC_PHRASE_LANGUAGE
+    entropy = mnemonic_to_entropy(mnemonic, language=language)
+    seed = mnemonic_to_seed(mnemonic)
+    wallet_data = HDWallet(symbol=symbol).from_seed(seed.hex()).dumps()
+    wallet_data.update(
+        strength=len(entropy) * 8,
+        entropy=entropy.hex(),
+        mnemonic=mnemonic,
+        language=language,
+    )
+    return wallet_data
+
+
+def restore_many(
+    symbol: str, items: list[tuple[str, str, str | None]]
+) -> list[tuple[dict[str, Any] | None, str | None, str | None]]:
+    """Return data of wallets restored from their secrets.
+
+    Items are (kind, secret, seed verifier) of stored wallets, the kind
+    being "seed" or "mnemonic". The restored seed is checked against the
+    verifier, a wallet without one gets a new verifier instead. A failed
+    restore does not stop the others.
+
+    Returns: (wallet data, error message, new seed verifier) per item
+    """
+    restored: list[tuple[dict[str, Any] | None, str | None, str | None]] = []
+    for kind, secret, seed_verifier in items:
+        try:
+            if kind == "seed":
+                wallet_data = derive_from_seed(symbol, seed=secret)
+            else:
+                wallet_data = derive_from_mnemonic(symbol, mnemonic=secret)
+        except Exception as e:
+            restored.append((None, str(e) or e.__class__.__name__, None))
+            continue
+        if seed_verifier is None:
+            new_verifier = make_verifier(value=wallet_data["seed"])
+            restored.append((wallet_data, None, new_verifier))
+        elif verify(value=wallet_data["seed"], verifier=seed_verifier):
+            restored.append((wallet_data, None, None))
+        else:
+            restored.append((None, "Wallet does not exist.", None))
+    return restored
+
+
+def derive_addresses(
+    symbol: str,
+    *,
+    account_xpublic_key: str,
+    account: int,
+    change: int,
+    start: int,
+    count: int,
+) -> list[dict[str, Any]]:
+    """Return addresses of the account from the start index on.
+
+    Keys and addresses of the whole range are derived in one batch, see
+    wallets.derivation, the output equals the HDWallet one.
+    """
+    points = derive_public_points(
+        account_xpublic_key,
+        path=(change,),
+        indexes=range(start, start + count),
+    )
+    prefix = f"{account_path(symbol, account)}/{change}"
+    return [
+        dict(
+            index=index,
+            path=f"{prefix}/{index}",
+            public_key=public_key,
+            addresses=addresses,
+        )
+        for index, (public_key, addresses) in enumerate(
+            encode_addresses(symbol, points), start
+        )
+    ]
+
+
+def encode_cursor(created_at: datetime.datetime, wallet_id: int) -> str:
+    """Return an opaque pagination cursor pointing after the given wallet."""
+    raw = json.dumps([created_at.isoformat(), wallet_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    """Return (created_at, id) of the wallet the cursor points after.
+
+    Raises:
+        InvalidCursor: when the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, wallet_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), int(wallet_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid pagination cursor.") from e
@@ -1,53 +1,249 @@
+import datetime
 from typing import Annotated
 from typing import Any
+from typing import AsyncIterator
 
 from fastapi import APIRouter
 from fastapi import Body
 from fastapi import Depends
+from fastapi import Header
 from fastapi import HTTPException
 from fastapi import Path
 from fastapi import Query
+from fastapi import Request
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from zeply_python_challenge.config import settings
 from zeply_python_challenge.database import create_async_session
+from zeply_python_challenge.instrumentation import InstrumentedRoute
 from zeply_python_challenge.response_schemas import ErrorResponseSchemas
+from zeply_python_challenge.wallets.cache import make_etag
 from zeply_python_challenge.wallets.constants import CurrencyThreeLetterSymbol
+from zeply_python_challenge.wallets.constants import ExportFormat
+from zeply_python_challenge.wallets.exceptions import AccountNotDerivable
+from zeply_python_challenge.wallets.exceptions import DerivationPoolSaturated
+from zeply_python_challenge.wallets.exceptions import InvalidCursor
+from zeply_python_challenge.wallets.exceptions import InvalidMnemonic
 from zeply_python_challenge.wallets.exceptions import WalletEntryDoesNotExist
+from zeply_python_challenge.wallets.exceptions import WalletJobDoesNotExist
+from zeply_python_challenge.wallets.jobs import cancel_job
+from zeply_python_challenge.wallets.jobs import check_job_token
+from zeply_python_challenge.wallets.jobs import create_job
+from zeply_python_challenge.wallets.jobs import get_job
+from zeply_python_challenge.wallets.jobs import stream_job_wallets
 from zeply_python_challenge.wallets.schemas import CreatedWalletInResponse
+from zeply_python_challenge.wallets.schemas import CreatedWalletJobInResponse
+from zeply_python_challenge.wallets.schemas import \
+    CreateWalletJobParametersInRequest
+from zeply_python_challenge.wallets.schemas import DerivedAddressInResponse
 from zeply_python_challenge.wallets.schemas import FetchedWalletInResponse
+from zeply_python_challenge.wallets.schemas import \
+    GeneratedWalletInBatchResponse
 from zeply_python_challenge.wallets.schemas import \
     GenerateWalletParametersInRequest
+from zeply_python_challenge.wallets.schemas import \
+    GenerateWalletsBatchParametersInRequest
+from zeply_python_challenge.wallets.schemas import \
+    RestoredWalletInBatchResponse
+from zeply_python_challenge.wallets.schemas import \
+    RestoreWalletsBatchParametersInRequest
+from zeply_python_challenge.wallets.schemas import WalletByAddressInResponse
+from zeply_python_challenge.wallets.schemas import WalletJobInResponse
+from zeply_python_challenge.wallets.schemas import WalletsPageInResponse
+from zeply_python_challenge.wallets.serializers import iter_csv
+from zeply_python_challenge.wallets.serializers import iter_ndjson
+from zeply_python_challenge.wallets.serializers import shape_created_wallet
+from zeply_python_challenge.wallets.serializers import shape_fetched_wallet
+from zeply_python_challenge.wallets.serializers import shape_wallets_page
+from zeply_python_challenge.wallets.service import \
+    generate_multi_currency_wallets
 from zeply_python_challenge.wallets.service import generate_wallet
+from zeply_python_challenge.wallets.service import generate_wallets
+from zeply_python_challenge.wallets.service import get_account_xpublic_key
 from zeply_python_challenge.wallets.service import get_all_wallets
-from zeply_python_challenge.wallets.service import get_wallet_by_id
+from zeply_python_challenge.wallets.service import get_rendered_wallet
+from zeply_python_challenge.wallets.service import get_wallet_by_address
+from zeply_python_challenge.wallets.service import iter_account_addresses
 from zeply_python_challenge.wallets.service import restore_from_mnemonic
 from zeply_python_challenge.wallets.service import restore_from_seed
+from zeply_python_challenge.wallets.service import restore_wallets
+from zeply_python_challenge.wallets.service import stream_wallets
+from zeply_python_challenge.wallets.utils import decode_cursor
+from zeply_python_challenge.wallets.utils import encode_cursor
+
+wallets_router = APIRouter(
+    prefix="/wallets", tags=["wallets"], route_class=InstrumentedRoute
+)
 
-wallets_router = APIRouter(prefix="/wallets", tags=["wallets"])
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Return whether If-None-Match of the request matches the ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison
+    tags = [
+        tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+    ]
+    return "*" in tags or etag in tags
 
 
 @wallets_router.get(
     "",
-    responses=ErrorResponseSchemas.NOT_FOUND,
-    response_model=list[FetchedWalletInResponse],
+    responses={
+        **ErrorResponseSchemas.BAD_REQUEST,
+        **ErrorResponseSchemas.NOT_FOUND,
+    },
+    response_model=WalletsPageInResponse,
 )
 async def get_generated_wallets(
+    request: Request,
     sess: AsyncSession = Depends(create_async_session),
     limit: Annotated[
-        int | None, Query(le=settings.MAX_ENTITIES_PER_PAGE)
+        int, Query(gt=0, le=settings.MAX_ENTITIES_PER_PAGE)
     ] = 10,
-    offset: int = 0,
+    cursor: str | None = None,
+    offset: Annotated[
+        int | None,
+        Query(ge=0, description="Deprecated, use cursor instead"),
+    ] = None,
+    created_from: datetime.datetime | None = None,
+    created_to: datetime.datetime | None = None,
 ) -> Any:
-    """Get all generated wallets."""
-    wallets = await get_all_wallets(sess, limit=limit, offset=offset)
+    """Get all generated wallets.
+
+    Wallets are ordered by creation time. Follow `next_url` (or pass
+    `next` as the `cursor`) to get the next page. The deprecated `offset`
+    can not be combined with a `cursor`. `created_from` is inclusive and
+    `created_to` is exclusive, a time window is faster to list than all
+    wallets.
+    """
+    if cursor is not None and offset is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either cursor or offset, not both",
+        )
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+    # one extra wallet tells whether there is a next page
+    wallets = await get_all_wallets(
+        sess,
+        limit=limit + 1,
+        offset=offset,
+        after=after,
+        created_from=created_from,
+        created_to=created_to,
+    )
     if len(wallets) == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Wallets were not found",
         )
-    return wallets
+
+    next_cursor = next_url = None
+    if len(wallets) > limit:
+        last = wallets[limit - 1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+        if offset is not None:
+            url = request.url.include_query_params(offset=offset + limit)
+        else:
+            url = request.url.include_query_params(cursor=next_cursor)
+        next_url = str(url)
+    # rendered once, the ETag is the hash of the bytes sent
+    body = ORJSONResponse(
+        shape_wallets_page(
+            wallets[:limit], next=next_cursor, next_url=next_url
+        )
+    ).body
+    # new wallets may show up on the page, clients have to revalidate
+    headers = {"etag": make_etag(body), "cache-control": "no-cache"}
+    if _etag_matches(request, headers["etag"]):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@wallets_router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"application/x-ndjson": {}, "text/csv": {}},
+            "description": "All wallets matching the filters",
+        }
+    },
+)
+async def export_wallets(
+    sess: AsyncSession = Depends(create_async_session),
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    currency: CurrencyThreeLetterSymbol | None = None,
+    created_from: datetime.datetime | None = None,
+    created_to: datetime.datetime | None = None,
+) -> Any:
+    """Stream all wallets as NDJSON or CSV, ordered by creation time.
+
+    `created_from` is inclusive and `created_to` is exclusive.
+    """
+    rows = stream_wallets(
+        sess,
+        currency=currency,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    if export_format == ExportFormat.CSV:
+        content, media_type = iter_csv(rows), "text/csv"
+    else:
+        content, media_type = iter_ndjson(rows), "application/x-ndjson"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename=wallets.{export_format.value}"
+            )
+        },
+    )
+
+
+@wallets_router.get(
+    "/by-address/{address}",
+    responses=ErrorResponseSchemas.NOT_FOUND,
+    response_model=WalletByAddressInResponse,
+)
+async def find_wallet_by_address(
+    sess: AsyncSession = Depends(create_async_session),
+    address: str = Path(..., max_length=128),
+) -> Any:
+    """Return the wallet owning the given address.
+
+    Every address stored with a wallet is indexed, the wallet is found
+    with a single index lookup.
+    """
+    found = await get_wallet_by_address(sess, address=address)
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Wallet was not found",
+        )
+    wallet, address_type = found
+    shaped = {
+        **shape_fetched_wallet(wallet),
+        "id": wallet.id,
+        "address_type": address_type,
+    }
+    if settings.FAST_JSON_RESPONSES:
+        return ORJSONResponse(shaped)
+    return shaped
 
 
 @wallets_router.get(
@@ -56,36 +252,304 @@ async def get_generated_wallets(
     response_model=FetchedWalletInResponse,
 )
 async def get_wallet(
+    request: Request,
     sess: AsyncSession = Depends(create_async_session),
     wallet_id: int = Path(...),
 ) -> Any:
-    """Return a wallet specified with the given wallet_id."""
-    wallet = await get_wallet_by_id(sess, wallet_id=wallet_id)
-    if wallet is None:
+    """Return a wallet specified with the given wallet_id.
+
+    Responses carry an ETag, a matching If-None-Match is answered with
+    304, without querying the database when the wallet is cached.
+    """
+    body = await get_rendered_wallet(sess, wallet_id=wallet_id)
+    if body is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Wallet was not found",
         )
-    return wallet
+    max_age = settings.WALLET_RESPONSE_MAX_AGE
+    headers = {
+        "etag": make_etag(body),
+        "cache-control": f"public, max-age={max_age}",
+    }
+    if _etag_matches(request, headers["etag"]):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@wallets_router.get(
+    "/{wallet_id}/addresses",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"application/x-ndjson": {}},
+            "description": "One DerivedAddressInResponse JSON per line",
+        },
+        **ErrorResponseSchemas.NOT_FOUND,
+    },
+)
+async def get_wallet_addresses(
+    sess: AsyncSession = Depends(create_async_session),
+    wallet_id: int = Path(...),
+    account: Annotated[int, Query(ge=0)] = 0,
+    change: Annotated[int, Query(ge=0, le=1)] = 0,
+    start: Annotated[int, Query(alias="from", ge=0, lt=2**31)] = 0,
+    count: Annotated[
+        int, Query(gt=0, le=settings.MAX_ADDRESSES_PER_REQUEST)
+    ] = 20,
+) -> Any:
+    """Derive addresses m/44'/coin'/account'/change/index of the wallet.
+
+    Addresses are streamed as newline delimited JSON, for indexes from
+    `from` to `from + count - 1`.
+    """
+    try:
+        symbol, xpub = await get_account_xpublic_key(
+            sess, wallet_id=wallet_id, account=account
+        )
+    except WalletEntryDoesNotExist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Wallet was not found",
+        )
+    except AccountNotDerivable:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Addresses of the account can not be derived",
+        )
+
+    async def stream() -> AsyncIterator[str]:
+        async for address in iter_account_addresses(
+            symbol,
+            account_xpublic_key=xpub,
+            account=account,
+            change=change,
+            start=start,
+            count=min(count, 2**31 - start),
+        ):
+            yield DerivedAddressInResponse(**address).json() + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
 @wallets_router.post(
     "",
     status_code=status.HTTP_201_CREATED,
-    response_model=CreatedWalletInResponse,
+    responses=ErrorResponseSchemas.SERVICE_UNAVAILABLE,
+    response_model=CreatedWalletInResponse | list[CreatedWalletInResponse],
 )
 async def generate_new_wallet(
     sess: AsyncSession = Depends(create_async_session),
     params: GenerateWalletParametersInRequest = Body(...),
 ) -> Any:
-    """Generate new wallet based on given params."""
-    wallet = await generate_wallet(sess, symbol=params.currency)
+    """Generate new wallet based on given params.
+
+    Given currencies instead of a currency, wallets of all of them are
+    derived from a single seed and returned as a list in the same order.
+    """
+    try:
+        if params.currencies is not None:
+            wallets = await generate_multi_currency_wallets(
+                sess, symbols=params.currencies
+            )
+        else:
+            wallet = await generate_wallet(sess, symbol=params.currency)
+    except DerivationPoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many wallets are being derived, try again later",
+        )
+    if params.currencies is not None:
+        if settings.FAST_JSON_RESPONSES:
+            return ORJSONResponse(
+                [shape_created_wallet(wallet) for wallet in wallets],
+                status_code=status.HTTP_201_CREATED,
+            )
+        return wallets
+    if settings.FAST_JSON_RESPONSES:
+        return ORJSONResponse(
+            shape_created_wallet(wallet), status_code=status.HTTP_201_CREATED
+        )
     return wallet
 
 
+@wallets_router.post(
+    "/batch",
+    status_code=status.HTTP_201_CREATED,
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_201_CREATED: {
+            "content": {"application/x-ndjson": {}},
+            "description": "One GeneratedWalletInBatchResponse JSON per line",
+        }
+    },
+)
+async def generate_new_wallets_batch(
+    sess: AsyncSession = Depends(create_async_session),
+    params: GenerateWalletsBatchParametersInRequest = Body(...),
+) -> Any:
+    """Generate a batch of new wallets.
+
+    Wallets are streamed back as newline delimited JSON, one item per
+    requested wallet, in the order they were generated. Items that failed
+    to generate carry an error instead of the wallet data. Wallets are
+    sent as soon as their chunk is stored, see WALLETS_BATCH_CHUNK_SIZE.
+    """
+    items = generate_wallets(sess, symbol=params.currency, count=params.count)
+
+    async def stream() -> AsyncIterator[str]:
+        async for item in items:
+            yield GeneratedWalletInBatchResponse(**item).json() + "\n"
+
+    return StreamingResponse(
+        stream(),
+        status_code=status.HTTP_201_CREATED,
+        media_type="application/x-ndjson",
+    )
+
+
+@wallets_router.post(
+    "/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=CreatedWalletJobInResponse,
+)
+async def create_wallet_job(
+    sess: AsyncSession = Depends(create_async_session),
+    params: CreateWalletJobParametersInRequest = Body(...),
+) -> Any:
+    """Order count new wallets, generated in the background.
+
+    Follow the progress with `GET /wallets/jobs/{job_id}` and read the
+    wallets with `GET /wallets/jobs/{job_id}/wallets`, passing the
+    returned `token` in the `X-Job-Token` header. The token is returned
+    only once.
+    """
+    return await create_job(sess, symbol=params.currency, count=params.count)
+
+
+@wallets_router.get(
+    "/jobs/{job_id}",
+    responses=ErrorResponseSchemas.NOT_FOUND,
+    response_model=WalletJobInResponse,
+)
+async def get_wallet_job(
+    sess: AsyncSession = Depends(create_async_session),
+    job_id: int = Path(...),
+) -> Any:
+    """Return the wallet job and its progress."""
+    try:
+        return await get_job(sess, job_id=job_id)
+    except WalletJobDoesNotExist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job was not found",
+        )
+
+
+@wallets_router.post(
+    "/jobs/{job_id}/cancel",
+    responses=ErrorResponseSchemas.NOT_FOUND,
+    response_model=WalletJobInResponse,
+)
+async def cancel_wallet_job(
+    sess: AsyncSession = Depends(create_async_session),
+    job_id: int = Path(...),
+) -> Any:
+    """Cancel the wallet job.
+
+    Wallets generated so far are kept, chunks being generated at the
+    moment are still stored.
+    """
+    try:
+        return await cancel_job(sess, job_id=job_id)
+    except WalletJobDoesNotExist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job was not found",
+        )
+
+
+@wallets_router.get(
+    "/jobs/{job_id}/wallets",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"application/x-ndjson": {}},
+            "description": "One GeneratedWalletInBatchResponse JSON per line",
+        },
+        **ErrorResponseSchemas.NOT_FOUND,
+    },
+)
+async def get_wallet_job_wallets(
+    sess: AsyncSession = Depends(create_async_session),
+    job_id: int = Path(...),
+    x_job_token: str = Header(...),
+) -> Any:
+    """Stream the wallets generated by the job so far.
+
+    Wallets are streamed as newline delimited JSON in the index order.
+    Wallets which are not generated yet are left out.
+    """
+    try:
+        await check_job_token(sess, job_id=job_id, token=x_job_token)
+    except WalletJobDoesNotExist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job was not found",
+        )
+    return StreamingResponse(
+        stream_job_wallets(sess, job_id=job_id),
+        media_type="application/x-ndjson",
+    )
+
+
+@wallets_router.post(
+    "/restore/batch",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"application/x-ndjson": {}},
+            "description": "One RestoredWalletInBatchResponse JSON per line",
+        }
+    },
+)
+async def restore_wallets_batch(
+    sess: AsyncSession = Depends(create_async_session),
+    params: RestoreWalletsBatchParametersInRequest = Body(...),
+) -> Any:
+    """Restore a batch of wallets by their seeds or mnemonics.
+
+    Secrets travel in the request body, so they do not end up in access
+    logs. Wallets are streamed back as newline delimited JSON, one item
+    per requested wallet in the request order. Items of wallets that do
+    not exist or failed to restore carry an error instead.
+    """
+    items = restore_wallets(
+        sess,
+        symbol=params.currency,
+        items=[
+            ("seed", item.seed)
+            if item.seed is not None
+            else ("mnemonic", item.mnemonic)
+            for item in params.items
+        ],
+    )
+
+    async def stream() -> AsyncIterator[str]:
+        async for item in items:
+            yield RestoredWalletInBatchResponse(**item).json() + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @wallets_router.get(
     "/restore-from-seed/",
-    responses=ErrorResponseSchemas.BAD_REQUEST,
+    responses={
+        **ErrorResponseSchemas.BAD_REQUEST,
+        **ErrorResponseSchemas.SERVICE_UNAVAILABLE,
+    },
     response_model=CreatedWalletInResponse,
 )
 async def restore_wallet_from_seed(
@@ -101,12 +565,22 @@ async def restore_wallet_from_seed(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid seed phrase",
         )
+    except DerivationPoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many wallets are being derived, try again later",
+        )
+    if settings.FAST_JSON_RESPONSES:
+        return ORJSONResponse(shape_created_wallet(wallet))
     return wallet
 
 
 @wallets_router.get(
     "/restore-from-mnemonic/",
-    responses=ErrorResponseSchemas.BAD_REQUEST,
+    responses={
+        **ErrorResponseSchemas.BAD_REQUEST,
+        **ErrorResponseSchemas.SERVICE_UNAVAILABLE,
+    },
     response_model=CreatedWalletInResponse,
 )
 async def restore_wallet_from_mnemonic(
@@ -119,9 +593,16 @@ async def restore_wallet_from_mnemonic(
         wallet = await restore_from_mnemonic(
             sess, symbol=currency, mnemonic=mnemonic
         )
-    except WalletEntryDoesNotExist:
+    except (InvalidMnemonic, WalletEntryDoesNotExist):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid mnemonic phrase",
         )
+    except DerivationPoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many wallets are being derived, try again later",
+        )
+    if settings.FAST_JSON_RESPONSES:
+        return ORJSONResponse(shape_created_wallet(wallet))
     return wallet
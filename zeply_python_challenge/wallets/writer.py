@@ -0,0 +1,416 @@
+import asyncio
+import fcntl
+import json
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import IO
+from typing import Any
+from typing import Callable
+from typing import Iterable
+
+from sqlalchemy.sql import insert
+from sqlalchemy.sql import select
+
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import primary_session_factory
+from zeply_python_challenge.wallets.models import Wallet
+from zeply_python_challenge.wallets.models import insert_wallet_addresses
+
+logger = logging.getLogger(__name__)
+
+
+class JournalSegment:
+    """An append-only file of wallet rows waiting to be flushed.
+
+    The file is locked for as long as the segment is open, so recovery
+    running in another process skips it.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.file: IO[str] = open(path, "a")
+        fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.written = 0
+        self.flushed = 0
+        self.closed = False
+
+    def append(self, row: dict[str, Any]) -> None:
+        self.file.write(json.dumps(row) + "\n")
+        # hand the line over to the OS, so it survives a process crash
+        self.file.flush()
+        self.written += 1
+
+    @property
+    def done(self) -> bool:
+        return self.closed and self.flushed == self.written
+
+    def remove(self) -> None:
+        self.file.close()
+        self.path.unlink(missing_ok=True)
+
+
+class WalletJournal:
+    """Journal of enqueued rows, split into segments of segment_size rows.
+
+    A segment is removed once it is full and all its rows were flushed.
+    Rows are written before they are enqueued, so whatever was enqueued
+    but not flushed when the process crashed is left in the directory
+    and replayed by the next process, see WalletWriter.recover.
+    """
+
+    def __init__(self, directory: str | Path, *, segment_size: int) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self._segments: list[JournalSegment] = []
+
+    def append(self, row: dict[str, Any]) -> JournalSegment:
+        """Write the row and return the segment it was written to."""
+        if not self._segments or self._segments[-1].closed:
+            path = self.directory / f"wallets-{uuid.uuid4().hex}.ndjson"
+            self._segments.append(JournalSegment(path))
+        segment = self._segments[-1]
+        segment.append(row)
+        if segment.written >= self.segment_size:
+            segment.closed = True
+        return segment
+
+    def mark_flushed(self, segments: Iterable[JournalSegment]) -> None:
+        """Account flushed rows, one segment per row."""
+        for segment in segments:
+            segment.flushed += 1
+        self.compact()
+
+    def compact(self, *, closing: bool = False) -> None:
+        """Remove segments whose rows were all flushed."""
+        kept = []
+        for segment in self._segments:
+            if closing:
+                segment.closed = True
+            if segment.done:
+                segment.remove()
+            else:
+                kept.append(segment)
+        self._segments = kept
+
+    def close(self) -> None:
+        """Close all segments, keeping the ones with unflushed rows."""
+        self.compact(closing=True)
+        for segment in self._segments:
+            segment.file.close()
+        self._segments = []
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+
+def claim_orphan_segments(directory: str | Path) -> list[tuple[Path, IO[str]]]:
+    """Lock and return segments left behind by processes that are gone."""
+    claimed = []
+    for path in sorted(Path(directory).glob("wallets-*.ndjson")):
+        file = open(path)
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # still written by a live process
+            file.close()
+            continue
+        claimed.append((path, file))
+    return claimed
+
+
+class WalletWriter:
+    """Store wallet rows in the background with multi-row inserts.
+
+    Rows are queued by ``write`` and flushed by a background task every
+    ``batch_size`` rows or ``flush_interval`` seconds, whichever comes
+    first. With ``ack="flush"`` a write returns the id of the stored
+    wallet once its batch is committed, with ``ack="enqueue"`` it returns
+    None right after the row was journaled and queued, and a failed
+    flush is only logged. Acknowledging on enqueue requires a journal,
+    otherwise a crash would lose wallets already handed out to clients.
+
+    A batch which failed ``max_retries`` times is dropped from memory but
+    its rows stay in the journal, if there is one, to be replayed on the
+    next start. ``stop`` flushes everything queued before returning.
+    """
+
+    # seconds before the first retry, doubled for every next one
+    retry_delay = 0.1
+
+    def __init__(
+        self,
+        *,
+        batch_size: int,
+        flush_interval: float,
+        ack: str,
+        max_pending: int,
+        max_retries: int = 3,
+        journal_dir: str | Path | None = None,
+        session_factory: Callable[[], Any] | None = None,
+    ) -> None:
+        if ack not in ("enqueue", "flush"):
+            raise ValueError(f"Unknown write-behind ack mode: {ack}")
+        if ack == "enqueue" and not journal_dir:
+            raise ValueError(
+                "Acknowledging on enqueue requires a journal directory"
+            )
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ack = ack
+        self.max_retries = max_retries
+        self.journal = (
+            WalletJournal(journal_dir, segment_size=batch_size)
+            if journal_dir
+            else None
+        )
+        self._session_factory = session_factory
+        self._queue: asyncio.Queue[
+            tuple[
+                dict[str, Any],
+                asyncio.Future[int] | None,
+                JournalSegment | None,
+            ]
+        ] = asyncio.Queue(max_pending)
+        self._task: asyncio.Task[None] | None = None
+        # set when rows are queued or the writer is stopped
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self.written = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.recovered = 0
+        self.flush_seconds_total = 0.0
+
+    def _session(self) -> Any:
+        factory = self._session_factory or primary_session_factory()
+        return factory()
+
+    @property
+    def pending(self) -> int:
+        """Return the number of rows waiting to be flushed."""
+        return self._queue.qsize()
+
+    async def write(self, row: dict[str, Any]) -> int | None:
+        """Queue the row, wait for its flush if acknowledged on flush.
+
+        Waits for room in the queue when max_pending rows are waiting.
+
+        Returns: the id of the stored wallet or None
+        """
+        if self._closed:
+            raise RuntimeError("Wallet writer is stopped.")
+        segment = (
+            self.journal.append(row) if self.journal is not None else None
+        )
+        future = (
+            asyncio.get_running_loop().create_future()
+            if self.ack == "flush"
+            else None
+        )
+        await self._queue.put((row, future, segment))
+        self._wakeup.set()
+        self.written += 1
+        return await future if future is not None else None
+
+    async def _insert(self, rows: list[dict[str, Any]]) -> dict[str, int]:
+        """Insert rows with one statement, return ids by seed hash.
+
+        Addresses of the wallets are inserted in the same transaction.
+        """
+        async with self._session() as sess:
+            res = await sess.execute(
+                insert(Wallet).values(rows).returning(Wallet.id, Wallet.seed)
+            )
+            ids = {seed: wallet_id for wallet_id, seed in res.all()}
+            stmt = insert_wallet_addresses(
+                {ids[row["seed"]]: row["addresses"] for row in rows}
+            )
+            if stmt is not None:
+                await sess.execute(stmt)
+            await sess.commit()
+        return ids
+
+    async def flush(self, batch: list[Any]) -> None:
+        """Store a batch of queued items, retrying failures with backoff."""
+        rows = [row for row, _, _ in batch]
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                ids = await self._insert(rows)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed += len(rows)
+                    logger.exception("Failed to store %d wallets", len(rows))
+                    for _, future, _ in batch:
+                        if future is not None and not future.done():
+                            future.set_exception(e)
+                    return
+                self.retries += 1
+                await asyncio.sleep(self.retry_delay * 2**attempt)
+
+        self.flush_seconds_total += time.perf_counter() - started
+        self.flushed += len(rows)
+        self.batches += 1
+        for row, future, _ in batch:
+            if future is not None and not future.done():
+                future.set_result(ids[row["seed"]])
+        if self.journal is not None:
+            self.journal.mark_flushed(segment for _, _, segment in batch)
+
+    async def _next_batch(self) -> list[Any]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - time.monotonic()
+            if self._closed or timeout <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.flush(batch)
+            except Exception as e:
+                # never let a batch stop the writer, nor leave writes hanging
+                logger.exception("Failed to flush %d wallets", len(batch))
+                for _, future, _ in batch:
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def recover(self) -> int:
+        """Store rows journaled by processes that crashed before a flush.
+
+        Rows already in the database, i.e. flushed right before the crash,
+        are skipped by their seed hash.
+
+        Returns: the number of stored rows
+        """
+        if self.journal is None:
+            return 0
+        recovered = 0
+        for path, file in claim_orphan_segments(self.journal.directory):
+            try:
+                rows = [json.loads(line) for line in file if line.strip()]
+                for i in range(0, len(rows), self.batch_size):
+                    chunk = rows[i : i + self.batch_size]
+                    async with self._session() as sess:
+                        existing = set(
+                            (
+                                await sess.scalars(
+                                    select(Wallet.seed).where(
+                                        Wallet.seed.in_(
+                                            [row["seed"] for row in chunk]
+                                        )
+                                    )
+                                )
+                            ).all()
+                        )
+                    missing = [
+                        row for row in chunk if row["seed"] not in existing
+                    ]
+                    if missing:
+                        await self._insert(missing)
+                        recovered += len(missing)
+                path.unlink()
+            finally:
+                file.close()
+        if recovered:
+            logger.warning("Recovered %d journaled wallets", recovered)
+        self.recovered += recovered
+        return recovered
+
+    def start(self) -> None:
+        """Start flushing queued rows in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop accepting rows, flush the queued ones and stop the task."""
+        self._closed = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.journal is not None:
+            self.journal.close()
+
+    def stats(self) -> dict[str, Any]:
+        """Return writer metrics."""
+        return {
+            "pending": self.pending,
+            "written": self.written,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "recovered": self.recovered,
+            "flush_seconds_total": self.flush_seconds_total,
+            "journal_segments": (
+                len(self.journal) if self.journal is not None else 0
+            ),
+        }
+
+
+_writer: WalletWriter | None = None
+
+
+def get_wallet_writer() -> WalletWriter | None:
+    """Return the process-wide wallet writer, None unless it is enabled."""
+    return _writer
+
+
+async def start_wallet_writer() -> None:
+    """Create the process-wide wallet writer if it is enabled.
+
+    Rows journaled by crashed processes are stored before it starts.
+    """
+    global _writer
+    if settings.WRITE_BEHIND_ENABLED and _writer is None:
+        writer = WalletWriter(
+            batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+            flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL,
+            ack=settings.WRITE_BEHIND_ACK,
+            max_pending=settings.WRITE_BEHIND_MAX_PENDING,
+            max_retries=settings.WRITE_BEHIND_MAX_RETRIES,
+            journal_dir=settings.WRITE_BEHIND_JOURNAL_DIR,
+        )
+        try:
+            await writer.recover()
+        except Exception:
+            # the segments are unlocked and left for the next start
+            logger.exception("Failed to recover journaled wallets")
+        writer.start()
+        _writer = writer
+
+
+async def stop_wallet_writer() -> None:
+    """Flush and stop the process-wide wallet writer if it was started."""
+    global _writer
+    if _writer is not None:
+        writer, _writer = _writer, None
+        await writer.stop()
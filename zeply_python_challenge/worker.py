@@ -0,0 +1,85 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+from multiprocessing.synchronize import Event
+from typing import Any
+
+from zeply_python_challenge.config import settings
+from zeply_python_challenge.database import sync_session_factory
+from zeply_python_challenge.wallets.jobs import process_next_chunk
+from zeply_python_challenge.wallets.utils import warm_up
+
+logger = logging.getLogger(__name__)
+
+# Worker processes generating the wallets of wallet jobs, see wallets.jobs.
+# Workers share nothing but the database, so they can run on any number of
+# machines, e.g. as many as there are cores to spare on this one:
+#
+#     $ python -m zeply_python_challenge.worker --processes 4
+#
+# SIGINT and SIGTERM stop the workers once their current chunks are
+# stored. A killed worker leaves its chunk to the others, nothing of it
+# is stored.
+
+
+def run_worker(stop: Event) -> None:
+    """Generate pending chunks of wallet jobs until stop is set."""
+    # the parent process handles the signals and sets stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    warm_up()
+    session_factory = sync_session_factory()
+    while not stop.is_set():
+        try:
+            with session_factory() as sess:
+                processed = process_next_chunk(sess)
+        except Exception:
+            # e.g. the database is unavailable, retried after a while
+            logger.exception("Failed to process wallet job chunks")
+            processed = False
+        if not processed:
+            stop.wait(settings.WALLET_JOB_POLL_INTERVAL)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the worker processes until SIGINT or SIGTERM."""
+    parser = argparse.ArgumentParser(description="Run wallet job workers.")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="worker processes, one per core by default",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    # spawned workers do not inherit database connections of the parent,
+    # nor its signal handlers, the ignored signals are inherited
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    workers = [
+        context.Process(
+            target=run_worker, args=(stop,), name=f"wallet-job-worker-{i}"
+        )
+        for i in range(args.processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    def request_stop(signum: int, frame: Any) -> None:
+        logger.info("Stopping after the current chunks")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    logger.info("Started %d wallet job workers", len(workers))
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()